@@ -0,0 +1,205 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Per-call overhead benchmarks for LangChainWrap.execute and aexecute.
+
+Run from the repository root:
+
+    python benchmarks/bench_execute.py                    # compare against the stored baseline
+    python benchmarks/bench_execute.py --update-baseline  # store a new baseline
+
+Every case executes a command whose run returns its result without calling a model, so the measured time is the
+client's own overhead: retries, timing, tracing setup and logging.  Cases are compared on their p50 latency relative
+to calling the command's run directly.  With tracing and debug logging off, the overhead must not grow with the
+size of the result; the debug_log cases show the cost of logging with results truncated.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+from interacticore import LangChainWrap, TraceSampler  # noqa: E402
+from interacticore.commands import ChatCommand  # noqa: E402
+
+import benchutils  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_execute.json')
+RESULT_SIZES = (1, 10_000)
+
+
+class _EchoCommand(ChatCommand):
+    """Command that returns its payload without calling a model."""
+
+    def run(self, client: LangChainWrap, **kwargs):
+        self.result = self.inputs['payload']
+        return self
+
+    async def arun(self, client: LangChainWrap, **kwargs):
+        return self.run(client, **kwargs)
+
+
+def _command(size: int) -> _EchoCommand:
+    return _EchoCommand(cmd_name='echo', sys_prompt='', user_prompt_tmpl='',
+                        inputs={'payload': {'utterances': ['Thanks a ton, you rock!'] * size}})
+
+
+def _debug_logging() -> Callable[[], None]:
+    logger = logging.getLogger('interacticore')
+    handler = logging.StreamHandler(open(os.devnull, 'w'))
+    previous = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+
+    def restore():
+        logger.removeHandler(handler)
+        logger.setLevel(previous)
+        handler.stream.close()
+    return restore
+
+
+def build_cases(sizes: tuple[int, ...]) -> list[tuple[str, int, Callable[[], Any], Callable[[], Any] | None]]:
+    """
+    Build the benchmark case matrix.
+    :param sizes: The result sizes, in list elements.
+    :return: A list of (name, size, function, setup) tuples, where setup returns a function that undoes it.
+    """
+    model = FakeListChatModel(responses=['{}'])
+    client = LangChainWrap(chat=model)
+    sampled_out = LangChainWrap(chat=model, trace_sampler=TraceSampler(rate=0.0))
+    loop = asyncio.new_event_loop()
+    cases = []
+    for size in sizes:
+        cmd = _command(size)
+        cases.append((f"run/direct/{size}", size, lambda cmd=cmd: cmd.run(client), None))
+        cases.append((f"execute/untraced/{size}", size, lambda cmd=cmd: client.execute(cmd), None))
+        cases.append((f"execute/sampled_out/{size}", size, lambda cmd=cmd: sampled_out.execute(cmd), None))
+        cases.append((f"aexecute/untraced/{size}", size,
+                      lambda cmd=cmd: loop.run_until_complete(client.aexecute(cmd)), None))
+        cases.append((f"execute/debug_log/{size}", size, lambda cmd=cmd: client.execute(cmd), _debug_logging))
+    return cases
+
+
+def run(sizes: tuple[int, ...],
+        *,
+        name_filter: str | None = None,
+        names: set[str] | None = None,
+        budget: float,
+        ) -> list[benchutils.BenchResult]:
+    """
+    Run the benchmark cases.
+    :param sizes: The result sizes, in list elements.
+    :param name_filter: Only run cases whose name contains this substring.
+    :param names: Only run cases with these exact names.
+    :param budget: The time budget per case in seconds.
+    :return: The benchmark results.
+    """
+    results = []
+    references: dict[int, float] = {}
+    for name, size, fn, setup in build_cases(sizes):
+        # The direct run of each size is always measured, since the other cases are relative to it.
+        direct = name.startswith('run/direct/')
+        selected = (not name_filter or name_filter in name) and (names is None or name in names)
+        if not selected and not direct:
+            continue
+        restore = setup() if setup is not None else None
+        try:
+            samples = benchutils.measure(fn, budget=budget)
+        finally:
+            if restore is not None:
+                restore()
+        if direct:
+            references[size] = benchutils.BenchResult(name=name, size=size, samples_ns=samples).p50_us * 1000
+        if selected:
+            results.append(benchutils.BenchResult(name=name, size=size, samples_ns=samples,
+                                                  reference_ns=references.get(size)))
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Command-line entry point.
+    :param argv: The command-line arguments.
+    :return: The process exit status.
+    """
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=list(RESULT_SIZES),
+                            help='result sizes in list elements')
+    arg_parser.add_argument('--filter', dest='name_filter', help='only run cases whose name contains this')
+    arg_parser.add_argument('--budget', type=float, default=0.5, help='time budget per case in seconds')
+    arg_parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file path')
+    arg_parser.add_argument('--update-baseline', action='store_true', help='store the results as the baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='allowed slowdown before failing, as a fraction')
+    arg_parser.add_argument('--confirm', type=int, default=2,
+                            help='times to re-measure a regressed case before reporting it')
+    arg_parser.add_argument('--metric', choices=('relative', 'p50_us', 'p99_us'), default='p50_us',
+                            help='result field compared against the baseline')
+    args = arg_parser.parse_args(argv)
+
+    # Keep the benchmark from posting runs to LangSmith whatever the environment says.
+    os.environ['LANGCHAIN_TRACING_V2'] = 'false'
+    sizes = tuple(args.sizes)
+    results = run(sizes, name_filter=args.name_filter, budget=args.budget)
+    if args.update_baseline:
+        benchutils.print_results(results)
+        benchutils.save_baseline(args.baseline, results)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    baseline = benchutils.load_baseline(args.baseline)
+    if baseline is None:
+        benchutils.print_results(results)
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    for _ in range(args.confirm):
+        names = benchutils.regressed_names(results, baseline, tolerance=args.tolerance, metric=args.metric)
+        if not names:
+            break
+        rerun = {result.name: result for result in run(sizes, names=names, budget=args.budget * 2)}
+        results = [
+            rerun[result.name]
+            if result.name in rerun and rerun[result.name].to_dict()[args.metric] < result.to_dict()[args.metric]
+            else result
+            for result in results
+        ]
+
+    benchutils.print_results(results, baseline, metric=args.metric)
+    regressions = benchutils.find_regressions(results, baseline, tolerance=args.tolerance, metric=args.metric)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print('\nNo regressions.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
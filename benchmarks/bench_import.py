@@ -0,0 +1,145 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Cold-start import benchmarks for interacticore.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py                    # compare against the stored baseline
+    python benchmarks/bench_import.py --update-baseline  # store a new baseline
+
+Every sample runs the case's import statement in a fresh interpreter with `python -X importtime` and sums the
+cumulative time of the modules it loaded, leaving out what the interpreter imports at startup.  The size column is
+the number of top-level modules the statement loaded.  Cases are compared on their p50 import time in microseconds.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import benchutils
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_import.json')
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+CASES = {
+    'import/interacticore': 'import interacticore',
+    'import/interacticore.parsers': 'import interacticore.parsers',
+    'import/ParseCache': 'from interacticore.parsers import ParseCache',
+    'import/BrokenJsonOutputParser': 'from interacticore.parsers import BrokenJsonOutputParser',
+    'import/LangChainWrap': 'from interacticore import LangChainWrap',
+    'import/ChatCommand': 'from interacticore.commands import ChatCommand',
+}
+
+
+def _importtime(statement: str) -> list[tuple[int, str]]:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [SRC_DIR, env.get('PYTHONPATH')]))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                               env=env, capture_output=True, text=True, check=True)
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Only top-level entries: their cumulative time already includes the modules they imported.
+        if not name.startswith('  '):
+            entries.append((int(cumulative), name.strip()))
+    return entries
+
+
+def sample(statement: str, startup: set[str]) -> tuple[int, int]:
+    """
+    Import a statement in a fresh interpreter.
+    :param statement: The import statement.
+    :param startup: The top-level modules the interpreter imports before running any statement.
+    :return: The import time in nanoseconds and the number of top-level modules loaded.
+    """
+    entries = [(cumulative, name) for cumulative, name in _importtime(statement) if name not in startup]
+    return sum(cumulative for cumulative, _ in entries) * 1000, len(entries)
+
+
+def run(*, name_filter: str | None = None, repeat: int) -> list[benchutils.BenchResult]:
+    """
+    Run the benchmark cases.
+    :param name_filter: Only run cases whose name contains this substring.
+    :param repeat: The number of fresh interpreters per case.
+    :return: The benchmark results.
+    """
+    startup = {name for _, name in _importtime('pass')}
+    results = []
+    for name, statement in CASES.items():
+        if name_filter and name_filter not in name:
+            continue
+        samples = []
+        modules = 0
+        for _ in range(repeat):
+            elapsed_ns, modules = sample(statement, startup)
+            samples.append(elapsed_ns)
+        results.append(benchutils.BenchResult(name=name, size=modules, samples_ns=samples))
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Command-line entry point.
+    :param argv: The command-line arguments.
+    :return: The process exit status.
+    """
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--filter', dest='name_filter', help='only run cases whose name contains this')
+    arg_parser.add_argument('--repeat', type=int, default=15, help='fresh interpreters per case')
+    arg_parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file path')
+    arg_parser.add_argument('--update-baseline', action='store_true', help='store the results as the baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='allowed slowdown before failing, as a fraction')
+    arg_parser.add_argument('--metric', choices=('p50_us', 'p99_us'), default='p50_us',
+                            help='result field compared against the baseline')
+    args = arg_parser.parse_args(argv)
+
+    results = run(name_filter=args.name_filter, repeat=args.repeat)
+    if args.update_baseline:
+        benchutils.print_results(results)
+        benchutils.save_baseline(args.baseline, results)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    baseline = benchutils.load_baseline(args.baseline)
+    if baseline is None:
+        benchutils.print_results(results)
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    benchutils.print_results(results, baseline, metric=args.metric)
+    regressions = benchutils.find_regressions(results, baseline, tolerance=args.tolerance, metric=args.metric)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print('\nNo regressions.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Memory benchmarks for completed commands.
+
+Run from the repository root:
+
+    python benchmarks/bench_memory.py                    # compare against the stored baseline
+    python benchmarks/bench_memory.py --update-baseline  # store a new baseline
+
+Every case executes a batch of commands through LangChainWrap and keeps the completed commands, the way generation
+jobs hold them before flushing, and reports the bytes traced by tracemalloc per completed command.  Each command
+formats its own copy of the prompts and carries its own inputs.  The unslotted case keeps attributes in an instance `__dict__`
+and prompts unshared, as commands were before they were slotted; the release_inputs case releases inputs and
+prompts once each command completes.  The distinct_prompts case also releases them, but formats a different system
+prompt for every command, so a prompt that stayed alive after its command released it would show up there.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from typing import Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+from interacticore import LangChainWrap  # noqa: E402
+from interacticore.commands import ChatCommand  # noqa: E402
+
+import benchutils  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_memory.json')
+SYS_PROMPT = 'You are a helpful assistant that writes {count} short thank-you utterances for a chat bot. ' * 8
+USER_PROMPT_TMPL = 'Write {count} utterances thanking the bot for help with {topic}.'
+
+
+class _EchoCommand(ChatCommand):
+    """Command that returns a small result without calling a model."""
+    __slots__ = ()
+
+    def run(self, client: LangChainWrap, **kwargs):
+        self.result = {'utterances': [f"Thanks for the help with {self.inputs['topic']}!"]}
+        return self
+
+
+class _UnslottedEchoCommand(_EchoCommand):
+    """Echo command laid out as commands were before they were slotted: attributes in an instance __dict__, prompts
+    not shared."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Put the caller's own strings back, as they were before prompts were shared.
+        self.cmd_name = kwargs['cmd_name']
+        self.sys_prompt = kwargs['sys_prompt']
+        self.user_prompt_tmpl = kwargs['user_prompt_tmpl']
+
+
+# Shadow the inherited slot descriptors with plain class attributes, so every attribute is stored in the instance
+# __dict__ instead.  The empty slots still take one pointer each.
+for _cls in _EchoCommand.__mro__:
+    for _name in getattr(_cls, '__slots__', ()):
+        setattr(_UnslottedEchoCommand, _name, None)
+del _cls, _name
+
+
+def _command(cls: type, index: int, release_inputs: bool, count: int = 3) -> ChatCommand:
+    return cls(cmd_name='thanks', sys_prompt=SYS_PROMPT.format(count=count), user_prompt_tmpl=USER_PROMPT_TMPL,
+               inputs={'count': count, 'topic': f"order {index}"}, use_cache=False, release_inputs=release_inputs)
+
+
+CASES: dict[str, Callable[[int], ChatCommand]] = {
+    'completed/unslotted': lambda index: _command(_UnslottedEchoCommand, index, False),
+    'completed/slotted': lambda index: _command(_EchoCommand, index, False),
+    'completed/release_inputs': lambda index: _command(_EchoCommand, index, True),
+    'completed/distinct_prompts': lambda index: _command(_EchoCommand, index, True, count=index),
+}
+
+
+def measure(build: Callable[[int], ChatCommand], count: int) -> float:
+    """
+    Execute and keep a batch of commands.
+    :param build: Builds the command with an index.
+    :param count: The number of commands.
+    :return: The traced bytes per completed command.
+    """
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{}']))
+    # Warm up caches and lazy imports before tracing.
+    client.execute(build(-1))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        completed = [client.execute(build(index)) for index in range(count)]
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del completed
+    return (after - before) / count
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Command-line entry point.
+    :param argv: The command-line arguments.
+    :return: The process exit status.
+    """
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--filter', dest='name_filter', help='only run cases whose name contains this')
+    arg_parser.add_argument('--count', type=int, default=5000, help='completed commands per case')
+    arg_parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file path')
+    arg_parser.add_argument('--update-baseline', action='store_true', help='store the results as the baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.1,
+                            help='allowed growth before failing, as a fraction')
+    args = arg_parser.parse_args(argv)
+
+    results = {name: measure(build, args.count) for name, build in CASES.items()
+               if not args.name_filter or args.name_filter in name}
+    baseline = None if args.update_baseline else benchutils.load_baseline(args.baseline)
+    cases = (baseline or {}).get('cases', {})
+
+    header = f"{'case':<44} {'bytes/cmd':>11} {'change':>8}"
+    print(header)
+    print('-' * len(header))
+    regressions = []
+    for name, per_command in results.items():
+        change = ''
+        previous = cases.get(name, {}).get('bytes_per_command')
+        if previous:
+            change = f"{(per_command / previous - 1) * 100:+.1f}%"
+            if per_command > previous * (1 + args.tolerance):
+                regressions.append(f"{name}: {per_command:.0f} bytes vs baseline {previous:.0f} "
+                                   f"({change}, tolerance {args.tolerance * 100:.0f}%)")
+        print(f"{name:<44} {per_command:>11.0f} {change:>8}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            cases = {name: {'bytes_per_command': round(per_command)} for name, per_command in results.items()}
+            json.dump({'environment': benchutils.environment(), 'cases': cases}, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print('\nNo regressions.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
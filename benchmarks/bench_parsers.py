@@ -0,0 +1,234 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Parser benchmarks for parse_json_markdown, parse_partial_json and BrokenJsonOutputParser.
+
+Run from the repository root:
+
+    python benchmarks/bench_parsers.py                    # compare against the stored baseline
+    python benchmarks/bench_parsers.py --update-baseline   # add cases missing from the baseline
+    python benchmarks/bench_parsers.py --replace-baseline  # re-measure every case in the baseline
+    python benchmarks/bench_parsers.py --quick --filter stream
+
+The process exits with status 1 when any case regresses past the tolerance.  By default cases
+are compared on their latency relative to json.loads of the equivalent valid payload, timed in alternating
+calls with the case so both see the same machine state, and taken as the median ratio of those pairs, which keeps
+the baseline meaningful across machines and runs; use --metric p50_us to compare absolute latency.  Cases of
+--large-size bytes and up fit only a few calls in the time budget, so they are held to --large-tolerance instead.  Cases whose p50 latency grew by less than --noise-floor
+microseconds are never reported, since that is within the run-to-run jitter of the smallest payloads.
+
+--update-baseline leaves the stored cases alone, so a change is measured against the numbers recorded before it;
+use --replace-baseline only when the cases or the measurement method change.  Both store the median of three runs.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from langchain_core.outputs import Generation  # noqa: E402
+
+from interacticore.parsers.brokenjsonparser import (  # noqa: E402
+    BrokenJsonOutputParser,
+    parse_json_markdown,
+    parse_partial_json,
+)
+from interacticore.parsers.parsecache import ParseCache  # noqa: E402
+
+import benchutils  # noqa: E402
+import corpus  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_parsers.json')
+
+
+def _consume(parser: BrokenJsonOutputParser, chunks: list[str]) -> Any:
+    last = None
+    for last in parser.transform(iter(chunks)):
+        pass
+    return last
+
+
+def build_cases(sizes: tuple[int, ...]) -> list[tuple[str, int, Callable[[], Any], str]]:
+    """
+    Build the benchmark case matrix.
+    :param sizes: The payload sizes in bytes.
+    :return: A list of (name, size, function, reference payload) tuples.
+    """
+    parser = BrokenJsonOutputParser()
+    diff_parser = BrokenJsonOutputParser(diff=True)
+    events_parser = BrokenJsonOutputParser(element_events=True)
+    cases = []
+    for size in sizes:
+        reference = corpus.valid(size)
+        for kind, generate in corpus.KINDS.items():
+            text = generate(size)
+            cases.append((f"parse_json_markdown/{kind}/{size}", len(text),
+                          lambda text=text: parse_json_markdown(text), reference))
+        for kind in ('fenced', 'truncated'):
+            data = corpus.KINDS[kind](size).encode('utf-8')
+            cases.append((f"parse_json_markdown_bytes/{kind}/{size}", len(data),
+                          lambda data=data: parse_json_markdown(data), reference))
+
+        text = corpus.truncated(size)
+        cases.append((f"parse_partial_json/truncated/{size}", len(text),
+                      lambda text=text: parse_partial_json(text), reference))
+        cache = ParseCache()
+        cases.append((f"parse_json_markdown/truncated_cached/{size}", len(text),
+                      lambda text=text, cache=cache: parse_json_markdown(text, cache=cache), reference))
+
+        text = corpus.fenced(size)
+        generations = [Generation(text=text)]
+        cases.append((f"parse_result/fenced/{size}", len(text),
+                      lambda generations=generations: parser.parse_result(generations), reference))
+
+        chunks = corpus.chunks(text)
+        cases.append((f"stream/fenced/{size}", len(text),
+                      lambda chunks=chunks: _consume(parser, chunks), reference))
+        cases.append((f"stream_diff/fenced/{size}", len(text),
+                      lambda chunks=chunks: _consume(diff_parser, chunks), reference))
+        cases.append((f"stream_element_events/fenced/{size}", len(text),
+                      lambda chunks=chunks: _consume(events_parser, chunks), reference))
+    return cases
+
+
+def run(sizes: tuple[int, ...],
+        *,
+        name_filter: str | None = None,
+        names: set[str] | None = None,
+        budget: float,
+        ) -> list[benchutils.BenchResult]:
+    """
+    Run the benchmark cases.
+    :param sizes: The payload sizes in bytes.
+    :param name_filter: Only run cases whose name contains this substring.
+    :param names: Only run cases with these exact names.
+    :param budget: The time budget per case in seconds.
+    :return: The benchmark results.
+    """
+    results = []
+    for name, size, fn, reference in build_cases(sizes):
+        if name_filter and name_filter not in name:
+            continue
+        if names is not None and name not in names:
+            continue
+        samples, reference_samples = benchutils.measure_interleaved(
+            fn, lambda reference=reference: json.loads(reference), budget=budget)
+        results.append(benchutils.BenchResult(name=name, size=size, samples_ns=samples,
+                                              reference_samples_ns=reference_samples))
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Command-line entry point.
+    :param argv: The command-line arguments.
+    :return: The process exit status.
+    """
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=list(corpus.SIZES),
+                            help='payload sizes in bytes')
+    arg_parser.add_argument('--quick', action='store_true',
+                            help='shorter time budget, sizes up to 100 KB')
+    arg_parser.add_argument('--filter', dest='name_filter', help='only run cases whose name contains this')
+    arg_parser.add_argument('--budget', type=float, default=0.5, help='time budget per case in seconds')
+    arg_parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file path')
+    arg_parser.add_argument('--update-baseline', action='store_true', help='add cases missing from the baseline')
+    arg_parser.add_argument('--replace-baseline', action='store_true', help='store all results as the baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='allowed slowdown before failing, as a fraction')
+    arg_parser.add_argument('--large-tolerance', type=float, default=0.5,
+                            help='allowed slowdown of cases of --large-size bytes and up, as a fraction')
+    arg_parser.add_argument('--large-size', type=int, default=50_000,
+                            help='payload size in bytes from which --large-tolerance applies')
+    arg_parser.add_argument('--noise-floor', type=float, default=5.0,
+                            help='p50 latency growth in microseconds below which no case counts as regressed')
+    arg_parser.add_argument('--confirm', type=int, default=2,
+                            help='times to re-measure a regressed case before reporting it')
+    arg_parser.add_argument('--metric', choices=('relative', 'p50_us', 'p99_us'), default='relative',
+                            help='result field compared against the baseline')
+    args = arg_parser.parse_args(argv)
+
+    sizes = tuple(args.sizes)
+    budget = args.budget
+    if args.quick:
+        sizes = tuple(size for size in sizes if size <= 100_000)
+        budget = min(budget, 0.25)
+
+    baseline = benchutils.load_baseline(args.baseline)
+    if args.update_baseline or args.replace_baseline:
+        keep = None if args.replace_baseline else baseline
+        names = None
+        if keep is not None:
+            names = {name for name, *_ in build_cases(sizes) if name not in keep['cases']}
+            if not names:
+                print(f"No new cases; {args.baseline} is unchanged.")
+                return 0
+        # A baseline from one lucky run makes every later run look slower, so store the median of a few.
+        runs = [run(sizes, name_filter=args.name_filter, names=names, budget=budget) for _ in range(3)]
+        results = [sorted(case, key=lambda result: result.to_dict()[args.metric])[1] for case in zip(*runs)]
+        benchutils.print_results(results)
+        benchutils.save_baseline(args.baseline, results, keep=keep)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    results = run(sizes, name_filter=args.name_filter, budget=budget)
+    if baseline is None:
+        benchutils.print_results(results)
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    # The budget only fits a handful of calls of the largest cases, so their medians move further between runs.
+    tolerances = {result.name: max(args.tolerance, args.large_tolerance)
+                  for result in results if result.size >= args.large_size}
+
+    # Re-measure regressed cases with a longer budget and keep the best run, so a noisy
+    # neighbour or a frequency dip does not fail the gate on its own.
+    for _ in range(args.confirm):
+        names = benchutils.regressed_names(results, baseline, tolerance=args.tolerance, metric=args.metric,
+                                           noise_floor_us=args.noise_floor, tolerances=tolerances)
+        if not names:
+            break
+        rerun = {result.name: result for result in run(sizes, names=names, budget=budget * 2)}
+        results = [
+            rerun[result.name]
+            if result.name in rerun and rerun[result.name].to_dict()[args.metric] < result.to_dict()[args.metric]
+            else result
+            for result in results
+        ]
+
+    benchutils.print_results(results, baseline, metric=args.metric)
+    regressions = benchutils.find_regressions(results, baseline, tolerance=args.tolerance, metric=args.metric,
+                                              noise_floor_us=args.noise_floor, tolerances=tolerances)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print('\nNo regressions.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,304 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+
+class BenchResult:
+    """
+    Latency and throughput summary for one benchmark case.
+    """
+    def __init__(self,
+                 *,
+                 name: str,
+                 size: int,
+                 samples_ns: list[int],
+                 reference_ns: float | None = None,
+                 reference_samples_ns: list[int] | None = None,
+                 ):
+        """
+        Construct a new instance.
+        :param name: The case name.
+        :param size: The payload size in bytes.
+        :param samples_ns: The per-call latencies in nanoseconds.
+        :param reference_ns: The p50 latency of the reference workload for the same payload, if any.
+        :param reference_samples_ns: The latencies of the reference workload timed in alternating calls with the
+            case, one per sample, if any.  The relative latency is then the median ratio of each pair.
+        """
+        ordered = sorted(samples_ns)
+        self.name: str = name
+        self.size: int = size
+        self.samples: int = len(ordered)
+        self.p50_us: float = _percentile(ordered, 0.50) / 1000
+        self.p99_us: float = _percentile(ordered, 0.99) / 1000
+        self.mean_us: float = statistics.fmean(ordered) / 1000
+        self.mb_per_s: float = (size / 1_000_000) / (self.mean_us / 1_000_000) if self.mean_us else 0.0
+        self.relative: float | None = None
+        if reference_samples_ns:
+            # Each pair ran back to back, so a clock or load change during the run moves both alike.  The ratio of
+            # the two medians would mix calls made under different conditions.
+            self.relative = statistics.median(sample / reference
+                                              for sample, reference in zip(samples_ns, reference_samples_ns))
+        elif reference_ns:
+            self.relative = (self.p50_us * 1000) / reference_ns
+
+    def to_dict(self) -> dict:
+        """
+        Get the result as a JSON-serializable dict.
+        :return: The result dict.
+        """
+        return {
+            'size': self.size,
+            'samples': self.samples,
+            'p50_us': round(self.p50_us, 3),
+            'p99_us': round(self.p99_us, 3),
+            'mean_us': round(self.mean_us, 3),
+            'mb_per_s': round(self.mb_per_s, 3),
+            'relative': None if self.relative is None else round(self.relative, 3),
+        }
+
+
+def _percentile(ordered: list[int], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return float(ordered[index])
+
+
+def measure(fn: Callable[[], Any],
+            *,
+            budget: float = 0.5,
+            min_samples: int = 5,
+            max_samples: int = 5000,
+            ) -> list[int]:
+    """
+    Time individual calls of a function until the time budget or sample limit is reached.
+    :param fn: The function to call.
+    :param budget: The time budget in seconds.
+    :param min_samples: The minimum number of samples, regardless of the budget.
+    :param max_samples: The maximum number of samples.
+    :return: The per-call latencies in nanoseconds.
+    """
+    # Warm up caches, compiled regexes and lazy imports before sampling.
+    fn()
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        deadline = time.perf_counter() + budget
+        while len(samples) < max_samples:
+            start = time.perf_counter_ns()
+            fn()
+            samples.append(time.perf_counter_ns() - start)
+            if len(samples) >= min_samples and time.perf_counter() > deadline:
+                break
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+
+def measure_interleaved(fn: Callable[[], Any],
+                        reference: Callable[[], Any],
+                        *,
+                        budget: float = 0.5,
+                        min_samples: int = 5,
+                        max_samples: int = 200_000,
+                        ) -> tuple[list[int], list[int]]:
+    """
+    Time a function and its reference workload in alternating calls until the time budget or sample limit is
+    reached.  Both see the same clock speed and background load, so their ratio holds up on a noisy machine even
+    when each latency on its own does not.
+    :param fn: The function to call.
+    :param reference: The reference function to call.
+    :param budget: The time budget in seconds, shared by both.
+    :param min_samples: The minimum number of samples of each, regardless of the budget.
+    :param max_samples: The maximum number of samples of each.
+    :return: The per-call latencies of the function and of the reference in nanoseconds.
+    """
+    fn()
+    reference()
+
+    samples = []
+    reference_samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        deadline = time.perf_counter() + budget
+        while len(samples) < max_samples:
+            start = time.perf_counter_ns()
+            reference()
+            middle = time.perf_counter_ns()
+            fn()
+            samples.append(time.perf_counter_ns() - middle)
+            reference_samples.append(middle - start)
+            if len(samples) >= min_samples and time.perf_counter() > deadline:
+                break
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples, reference_samples
+
+
+def environment() -> dict:
+    """
+    Describe the interpreter and platform the benchmarks ran on.
+    :return: The environment dict.
+    """
+    return {
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def load_baseline(path: str) -> dict | None:
+    """
+    Load a stored baseline.
+    :param path: The baseline file path.
+    :return: The baseline dict, or None if the file does not exist.
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path: str, results: list[BenchResult], *, keep: dict | None = None) -> None:
+    """
+    Store results as the new baseline.
+    :param path: The baseline file path.
+    :param results: The benchmark results.
+    :param keep: An earlier baseline whose cases are stored unchanged alongside the results.
+    """
+    cases = dict((keep or {}).get('cases', {}))
+    cases.update((result.name, result.to_dict()) for result in results)
+    baseline = {
+        'environment': (keep or {}).get('environment') or environment(),
+        'cases': cases,
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def find_regressions(results: list[BenchResult],
+                     baseline: dict,
+                     *,
+                     tolerance: float,
+                     metric: str = 'relative',
+                     noise_floor_us: float = 0.0,
+                     tolerances: dict[str, float] | None = None,
+                     ) -> list[str]:
+    """
+    Compare results against a baseline.
+    :param results: The benchmark results.
+    :param baseline: The stored baseline.
+    :param tolerance: The allowed slowdown as a fraction, e.g. 0.25 for 25%.
+    :param metric: The result field to compare, either 'relative' or 'p50_us'.
+    :param noise_floor_us: The p50 latency growth in microseconds below which no case counts as regressed.
+    :param tolerances: The allowed slowdown of particular cases by name, in place of `tolerance`.
+    :return: A description of every case that regressed.
+    """
+    return [regression for _, regression in _regressions(results, baseline, tolerance=tolerance, metric=metric,
+                                                         noise_floor_us=noise_floor_us, tolerances=tolerances)]
+
+
+def regressed_names(results: list[BenchResult],
+                    baseline: dict,
+                    *,
+                    tolerance: float,
+                    metric: str = 'relative',
+                    noise_floor_us: float = 0.0,
+                    tolerances: dict[str, float] | None = None,
+                    ) -> set[str]:
+    """
+    Get the names of the cases that regressed against a baseline.
+    :param results: The benchmark results.
+    :param baseline: The stored baseline.
+    :param tolerance: The allowed slowdown as a fraction, e.g. 0.25 for 25%.
+    :param metric: The result field to compare, either 'relative' or 'p50_us'.
+    :param noise_floor_us: The p50 latency growth in microseconds below which no case counts as regressed.
+    :param tolerances: The allowed slowdown of particular cases by name, in place of `tolerance`.
+    :return: The regressed case names.
+    """
+    return {name for name, _ in _regressions(results, baseline, tolerance=tolerance, metric=metric,
+                                             noise_floor_us=noise_floor_us, tolerances=tolerances)}
+
+
+def _regressions(results: list[BenchResult],
+                 baseline: dict,
+                 *,
+                 tolerance: float,
+                 metric: str,
+                 noise_floor_us: float,
+                 tolerances: dict[str, float] | None,
+                 ) -> list[tuple[str, str]]:
+    regressions = []
+    cases = baseline.get('cases', {})
+    for result in results:
+        allowed = (tolerances or {}).get(result.name, tolerance)
+        previous = cases.get(result.name, {}).get(metric)
+        current = result.to_dict().get(metric)
+        if previous is None or current is None or previous <= 0:
+            continue
+        # Microsecond-scale cases swing by more than the tolerance between runs of the same code.
+        previous_p50 = cases[result.name].get('p50_us')
+        if previous_p50 is not None and result.p50_us - previous_p50 < noise_floor_us:
+            continue
+        if current > previous * (1 + allowed):
+            regressions.append((result.name,
+                f"{result.name}: {metric} {current:.3f} vs baseline {previous:.3f} "
+                f"({(current / previous - 1) * 100:+.1f}%, tolerance {allowed * 100:.0f}%)"
+            ))
+    return regressions
+
+
+def print_results(results: list[BenchResult], baseline: dict | None = None, *, metric: str = 'relative') -> None:
+    """
+    Print results as a table, with the change against the baseline when there is one.
+    :param results: The benchmark results.
+    :param baseline: The stored baseline.
+    :param metric: The result field to compare against the baseline.
+    """
+    cases = (baseline or {}).get('cases', {})
+    header = f"{'case':<44} {'size':>9} {'p50 us':>11} {'p99 us':>11} {'MB/s':>9} {'rel':>8} {'change':>8}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        change = ''
+        previous = cases.get(result.name, {}).get(metric)
+        current = result.to_dict().get(metric)
+        if previous and current is not None:
+            change = f"{(current / previous - 1) * 100:+.1f}%"
+        relative = '' if result.relative is None else f"{result.relative:.2f}"
+        print(f"{result.name:<44} {result.size:>9} {result.p50_us:>11.1f} {result.p99_us:>11.1f} "
+              f"{result.mb_per_s:>9.2f} {relative:>8} {change:>8}")
@@ -0,0 +1,136 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import random
+
+SIZES = (100, 1_000, 10_000, 100_000, 1_000_000)
+"""Target payload sizes in bytes."""
+
+STREAM_CHUNKS = 200
+"""Number of chunks a streamed payload is split into."""
+
+_PHRASES = (
+    "I'd like to check the status of my order",
+    "Can you reset my password please",
+    "What's your return policy for opened items",
+    "I want to speak to an agent",
+    "My package says delivered but it isn't here",
+    "Please cancel my subscription effective today",
+    "How do I update the card on file",
+    "Is there a store near 10001",
+    "The app keeps crashing when I log in",
+    "Book a table for two at 7pm",
+    "Where's my refund, it's been two weeks",
+    "Change my delivery address to 42 Main St.",
+)
+
+_HEADER = "Here is the response formatted as the specified JSON schema:\n\n"
+
+
+def _utterances(size: int, seed: int) -> list[str]:
+    """
+    Build a deterministic list of utterances whose JSON encoding is roughly the target size.
+    :param size: The target size in bytes.
+    :param seed: The random seed.
+    :return: The utterance list.
+    """
+    rng = random.Random(seed)
+    utterances = []
+    length = len('{"utterances": []}')
+    while True:
+        utterance = f"{rng.choice(_PHRASES)} #{rng.randrange(10_000)}"
+        length += len(utterance) + 4
+        if length > size and utterances:
+            return utterances
+        utterances.append(utterance)
+
+
+def valid(size: int) -> str:
+    """
+    Valid JSON, as returned by a well-behaved model.
+    :param size: The target size in bytes.
+    :return: The payload.
+    """
+    return json.dumps({'utterances': _utterances(size, seed=size)})
+
+
+def fenced(size: int) -> str:
+    """
+    Valid JSON inside a Markdown code fence.
+    :param size: The target size in bytes.
+    :return: The payload.
+    """
+    return f"```json\n{valid(size)}\n```"
+
+
+def header(size: int) -> str:
+    """
+    Valid JSON preceded by a conversational header.
+    :param size: The target size in bytes.
+    :return: The payload.
+    """
+    return _HEADER + valid(size)
+
+
+def single_quoted(size: int) -> str:
+    """
+    An array of single-quoted strings with embedded apostrophes.
+    :param size: The target size in bytes.
+    :return: The payload.
+    """
+    utterances = _utterances(size, seed=size)
+    body = ', '.join(f"'{utterance}'" for utterance in utterances)
+    return f"```json\n{{\"utterances\": [{body}]}}\n```"
+
+
+def truncated(size: int) -> str:
+    """
+    Valid JSON cut off inside a string, as returned when a model hits its token limit.
+    :param size: The target size in bytes.
+    :return: The payload.
+    """
+    text = valid(size)
+    closing = text.rfind('"')
+    opening = text.rfind('"', 0, closing)
+    return text[:opening + 1 + (closing - opening) // 2]
+
+
+def chunks(text: str, count: int = STREAM_CHUNKS) -> list[str]:
+    """
+    Split a payload into a chunk sequence, as delivered by a streaming model.
+    :param text: The payload.
+    :param count: The number of chunks.
+    :return: The chunks.
+    """
+    step = max(1, -(-len(text) // count))
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+KINDS = {
+    'valid': valid,
+    'fenced': fenced,
+    'header': header,
+    'single_quoted': single_quoted,
+    'truncated': truncated,
+}
+"""Payload generators by kind."""
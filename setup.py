@@ -55,5 +55,6 @@ setup(
     # in the Python standard library or available on PyPI.
     extras_require={
         'dev': ['pytest>=8.1.1', 'pytest-cov>=4.1.0'],
+        'fast': ['orjson>=3.9,<4'],
     },
 )
@@ -20,6 +20,99 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from .interacticore import LangChainWrap, LangChainWrapProxy, LangChainCommand
-from interacticore.parsers import *
-from interacticore.commands import *
+"""
+Public names are loaded on first access, so `import interacticore` stays cheap for callers that only need the
+parsers or a few helpers.  `LangChainWrap`, the commands and the parser pull in langchain_core when first touched.
+"""
+import importlib
+from typing import Any
+
+_LAZY = {
+    'CommandOutcome': '.interacticore',
+    'LangChainWrap': '.interacticore',
+    'LangChainWrapProxy': '.interacticore',
+    'LangChainCommand': '.interacticore',
+    'ChainCache': '.chaincache',
+    'get_chain_cache': '.chaincache',
+    'set_chain_cache': '.chaincache',
+    'HedgePolicy': '.hedging',
+    'HedgeStats': '.hedging',
+    'CallbackMetricsSink': '.metrics',
+    'CommandMetrics': '.metrics',
+    'Histogram': '.metrics',
+    'HistogramMetricsSink': '.metrics',
+    'MetricsSink': '.metrics',
+    'ModelPool': '.modelpool',
+    'ModelStats': '.modelpool',
+    'PooledModel': '.modelpool',
+    'RateLimiter': '.ratelimit',
+    'RateLimitError': '.ratelimit',
+    'MemoryResponseCache': '.responsecache',
+    'ResponseCache': '.responsecache',
+    'SQLiteResponseCache': '.responsecache',
+    'ErrorClass': '.retry',
+    'RetryBudget': '.retry',
+    'RetryError': '.retry',
+    'RetryPolicy': '.retry',
+    'classify_by_types': '.retry',
+    'classify_error': '.retry',
+    'get_retry_budget': '.retry',
+    'set_retry_budget': '.retry',
+    'SingleFlight': '.singleflight',
+    'TraceSampler': '.tracing',
+    'BudgetExceededError': '.usage',
+    'ModelPrice': '.usage',
+    'Usage': '.usage',
+    'UsageBudget': '.usage',
+    'UsageLedger': '.usage',
+    'BrokenJsonOutputParser': '.parsers.brokenjsonparser',
+    'get_json_backend': '.parsers.jsonbackend',
+    'set_json_backend': '.parsers.jsonbackend',
+    'JsonElementEvent': '.parsers.jsonevents',
+    'FrozenDict': '.parsers.parsecache',
+    'FrozenList': '.parsers.parsecache',
+    'ParseCache': '.parsers.parsecache',
+    'ChatCommand': '.commands.chatcommand',
+    'LlmCommand': '.commands.llmcommand',
+}
+
+# Submodules of the subpackages, which star imports of them used to bring into this namespace.
+_SUBMODULES = {
+    'appendonlypatch': '.parsers.appendonlypatch',
+    'brokenjsonparser': '.parsers.brokenjsonparser',
+    'compiledschema': '.parsers.compiledschema',
+    'jsonbackend': '.parsers.jsonbackend',
+    'jsonevents': '.parsers.jsonevents',
+    'parsecache': '.parsers.parsecache',
+    'partialjsonscanner': '.parsers.partialjsonscanner',
+    'chatcommand': '.commands.chatcommand',
+    'llmcommand': '.commands.llmcommand',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module(module, __name__), name)
+    elif not name.startswith('_'):
+        value = _import_submodule(__name__ + _SUBMODULES.get(name, '.' + name), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def _import_submodule(module: str, name: str) -> Any:
+    # Submodules stay reachable as attributes of the package, as they were when it imported them eagerly.
+    try:
+        return importlib.import_module(module)
+    except ModuleNotFoundError as e:
+        if e.name != module:
+            raise
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,121 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from langchain_core.runnables import Runnable
+
+_MISSING = object()
+
+
+class ChainCache:
+    """
+    Bounded, thread-safe LRU cache of composed `prompt | model | parser` runnables.
+
+    Runnables hold no per-call state, so one composed chain is safely shared by every command, client and thread
+    that would otherwise build an identical one.  Keys refer to models and parsers by identity, which is stable
+    because each cached chain keeps its model and parser alive.
+    """
+
+    def __init__(self, *, max_entries: int = 256):
+        """
+        Construct a new instance.
+        :param max_entries: The maximum number of cached chains.
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive: {max_entries}")
+        self.max_entries: int = max_entries
+        self._entries: OrderedDict[Hashable, Runnable] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups that were served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Runnable]) -> Runnable:
+        """
+        Get the cached chain for a key, building and caching it on a miss.
+        :param key: The chain key.
+        :param build: The function that composes the chain.
+        :return: The chain.
+        """
+        with self._lock:
+            chain = self._entries.get(key, _MISSING)
+            if chain is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return chain
+            self.misses += 1
+
+        # Build outside the lock, so parsing a template does not block hits on other threads.
+        chain = build()
+
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = chain
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return chain
+
+    def clear(self) -> None:
+        """
+        Remove every cached chain and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+_chain_cache: ChainCache | None = ChainCache()
+
+
+def get_chain_cache() -> ChainCache | None:
+    """
+    Get the cache commands compose their chains through.
+    :return: The chain cache, or None if chains are composed on every run.
+    """
+    return _chain_cache
+
+
+def set_chain_cache(cache: ChainCache | None) -> ChainCache | None:
+    """
+    Set the cache commands compose their chains through.
+    :param cache: The chain cache, or None to compose chains on every run.
+    :return: The chain cache now in use.
+    """
+    global _chain_cache
+    _chain_cache = cache
+    return _chain_cache
@@ -20,5 +20,41 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from .chatcommand import ChatCommand
-from .llmcommand import LlmCommand
+"""
+Command classes are loaded on first access, together with `LangChainWrap` and langchain_core.
+"""
+import importlib
+from typing import Any
+
+_LAZY = {
+    'ChatCommand': '.chatcommand',
+    'LlmCommand': '.llmcommand',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module(module, __name__), name)
+    elif not name.startswith('_'):
+        value = _import_submodule(__name__ + '.' + name, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def _import_submodule(module: str, name: str) -> Any:
+    # Submodules stay reachable as attributes of the package, as they were when it imported them eagerly.
+    try:
+        return importlib.import_module(module)
+    except ModuleNotFoundError as e:
+        if e.name != module:
+            raise
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -22,7 +22,7 @@
 
 from langchain_core.prompts import PromptTemplate, HumanMessagePromptTemplate
 from langchain_core.messages import SystemMessage
-from interacticore import LangChainWrap, LangChainCommand
+from interacticore import LangChainWrap, LangChainCommand, RetryPolicy
 from langchain_core.output_parsers.transform import BaseCumulativeTransformOutputParser
 
 
@@ -30,6 +30,9 @@ class LlmCommand(LangChainCommand):
     """
     Command object for LLM Model chain invocations.
     """
+    __slots__ = ('inputs',)
+
+    model_role = 'llm'
 
     def __init__(self,
                  *,
@@ -39,6 +42,9 @@ class LlmCommand(LangChainCommand):
                  user_prompt_tmpl: str = None,
                  output_parser: BaseCumulativeTransformOutputParser = None,
                  inputs: dict = None,
+                 retry_policy: RetryPolicy = None,
+                 use_cache: bool = True,
+                 release_inputs: bool = False,
                  ):
         """
         Construct a new instance.
@@ -47,6 +53,11 @@ class LlmCommand(LangChainCommand):
         :param sys_prompt: The system prompt.
         :param user_prompt_tmpl: The user prompt template.
         :param output_parser: The output parser.
+        :param inputs: The prompt template inputs.
+        :param retry_policy: The retry policy for this command, overriding the client's.
+        :param use_cache: Whether results may be served from and stored in the client's response cache, and shared
+            with identical commands in flight.
+        :param release_inputs: Whether the client releases the inputs and prompts once the command completes.
         """
         super().__init__(
             session_id=session_id,
@@ -54,9 +65,16 @@ class LlmCommand(LangChainCommand):
             sys_prompt=sys_prompt,
             user_prompt_tmpl=user_prompt_tmpl,
             output_parser=output_parser,
+            retry_policy=retry_policy,
+            use_cache=use_cache,
+            release_inputs=release_inputs,
         )
         self.inputs: dict = inputs
 
+    def release(self) -> None:
+        super().release()
+        self.inputs = None
+
     def get_prompt_template(self):
         return PromptTemplate.from_messages(
             [
@@ -66,7 +84,7 @@ class LlmCommand(LangChainCommand):
         )
 
     def run(self, client: LangChainWrap, **kwargs) -> LangChainCommand:
-        base_chain = self.get_prompt_template() | client.llm | self.output_parser
+        base_chain = self.get_chain(client.llm)
 
         base_chain_result = base_chain.invoke({
             **self.inputs,
@@ -75,6 +93,16 @@ class LlmCommand(LangChainCommand):
         self.result = base_chain_result
         return self
 
+    async def arun(self, client: LangChainWrap, **kwargs) -> LangChainCommand:
+        base_chain = self.get_chain(client.llm)
+
+        base_chain_result = await base_chain.ainvoke({
+            **self.inputs,
+            **kwargs,
+        })
+        self.result = base_chain_result
+        return self
+
     def __str__(self):
         return (f"LlmCommand(super={super().__str__()}" +
                 # f", field={self.field}" +
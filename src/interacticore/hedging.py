@@ -0,0 +1,177 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import math
+import threading
+from collections import deque
+
+
+class HedgeStats:
+    """
+    Counters of hedged execution.
+    """
+
+    __slots__ = ('calls', 'hedges', 'wins')
+
+    def __init__(self):
+        """
+        Construct a new instance.
+        """
+        self.calls: int = 0
+        self.hedges: int = 0
+        self.wins: int = 0
+
+    @property
+    def hedge_rate(self) -> float:
+        """The fraction of calls that fired a hedge."""
+        return self.hedges / self.calls if self.calls else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        """The fraction of hedges that returned before the original request."""
+        return self.wins / self.hedges if self.hedges else 0.0
+
+    def __str__(self):
+        return (f"HedgeStats(calls={self.calls}" +
+                f", hedges={self.hedges}" +
+                f", wins={self.wins}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class HedgePolicy:
+    """
+    Opt-in hedging of slow calls.
+
+    Each command name keeps a window of its recent call latencies, timed from the start of the original request
+    whether or not a hedge beat it.  Once a call has run longer than the `percentile` of that window, a duplicate
+    request is issued, to `secondary` if given, and the first successful result wins.
+    Every call earns `max_hedge_rate` of a hedge and every hedge spends one, so hedges never exceed that fraction of
+    calls over time, however slow the provider gets.  At most a window's worth of earned hedges is saved up.
+    """
+
+    def __init__(self,
+                 *,
+                 percentile: float = 0.95,
+                 max_hedge_rate: float = 0.05,
+                 min_samples: int = 20,
+                 window: int = 200,
+                 min_delay: float = 0.0,
+                 secondary=None,
+                 max_workers: int = 64,
+                 ):
+        """
+        Construct a new instance.
+        :param percentile: The latency percentile, between 0 and 1, past which a call is hedged.
+        :param max_hedge_rate: The maximum fraction of calls that are hedged.
+        :param min_samples: The number of latencies a command name needs before its calls are hedged.
+        :param window: The number of recent latencies kept per command name.
+        :param min_delay: The shortest time a call runs before it is hedged, in seconds.
+        :param secondary: The LangChainWrap client hedges are sent to, or None to send them to the same client.
+        :param max_workers: The maximum number of threads running hedged sync calls.
+        """
+        if not 0 < percentile < 1:
+            raise ValueError(f"percentile must be between 0 and 1: {percentile}")
+        if not 0 <= max_hedge_rate <= 1:
+            raise ValueError(f"max_hedge_rate must be between 0 and 1: {max_hedge_rate}")
+        self.percentile: float = percentile
+        self.max_hedge_rate: float = max_hedge_rate
+        self.min_samples: int = max(1, min_samples)
+        self.window: int = window
+        self.min_delay: float = min_delay
+        self.secondary = secondary
+        self.max_workers: int = max_workers
+        self.stats: HedgeStats = HedgeStats()
+        self._stats: dict[str, HedgeStats] = {}
+        self._latencies: dict[str, deque[float]] = {}
+        self._allowance: float = 0.0
+        self._max_allowance: float = max(1.0, max_hedge_rate * window)
+        self._lock = threading.Lock()
+
+    def stats_for(self, cmd_name: str) -> HedgeStats:
+        """
+        Get the hedging counters of a command name.
+        :param cmd_name: The command name.
+        :return: The counters.
+        """
+        with self._lock:
+            return self._stats_locked(cmd_name)
+
+    def delay_for(self, cmd_name: str) -> float | None:
+        """
+        Count a call and get how long it may run before it is hedged.
+        :param cmd_name: The command name.
+        :return: The hedge delay in seconds, or None if there are too few latencies to hedge on.
+        """
+        with self._lock:
+            self.stats.calls += 1
+            self._stats_locked(cmd_name).calls += 1
+            self._allowance = min(self._max_allowance, self._allowance + self.max_hedge_rate)
+            latencies = self._latencies.get(cmd_name)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            ordered = sorted(latencies)
+        index = min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)
+        return max(self.min_delay, ordered[index])
+
+    def try_hedge(self, cmd_name: str) -> bool:
+        """
+        Spend one hedge from the allowance.
+        :param cmd_name: The command name.
+        :return: True if the hedge may be fired, otherwise False.
+        """
+        with self._lock:
+            if self._allowance < 1:
+                return False
+            self._allowance -= 1
+            self.stats.hedges += 1
+            self._stats_locked(cmd_name).hedges += 1
+            return True
+
+    def record(self, cmd_name: str, latency: float) -> None:
+        """
+        Record the latency of a successful call, or how long a request had run when it was cancelled.
+        :param cmd_name: The command name.
+        :param latency: The latency in seconds.
+        """
+        with self._lock:
+            latencies = self._latencies.get(cmd_name)
+            if latencies is None:
+                latencies = self._latencies[cmd_name] = deque(maxlen=self.window)
+            latencies.append(latency)
+
+    def record_win(self, cmd_name: str) -> None:
+        """
+        Record that a hedge returned before the original request.
+        :param cmd_name: The command name.
+        """
+        with self._lock:
+            self.stats.wins += 1
+            self._stats_locked(cmd_name).wins += 1
+
+    def _stats_locked(self, cmd_name: str) -> HedgeStats:
+        stats = self._stats.get(cmd_name)
+        if stats is None:
+            stats = self._stats[cmd_name] = HedgeStats()
+        return stats
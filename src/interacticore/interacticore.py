@@ -21,22 +21,102 @@
 # SOFTWARE.
 
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Hashable, Iterable, Iterator
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.exceptions import OutputParserException
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.language_models.llms import BaseLLM
 from langchain_core.output_parsers.transform import BaseCumulativeTransformOutputParser
 from langchain_core.prompts.base import BasePromptTemplate
-from langchain_core.tracers.context import tracing_v2_enabled
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.tracers.context import register_configure_hook, tracing_v2_enabled
 
-import random
+import asyncio
+import contextvars
+import copy
+import hashlib
+import json
+import threading
 import time
 import logging
+import reprlib
+import sys
 
+from .chaincache import get_chain_cache
+from .hedging import HedgePolicy
+from .metrics import CommandMetrics, MetricsSink
+from .modelpool import ModelPool, PooledModel
+from .ratelimit import RateLimiter, RateLimitError
+from .responsecache import ResponseCache
+from .retry import ErrorClass, RetryPolicy, classify_by_types
+from .singleflight import SingleFlight
+from .tracing import TraceSampler
+from .usage import BudgetExceededError, UsageLedger, token_usage
 from .utils import Utils
 
 # Create a logger with the module name
 log = logging.getLogger(__name__)
 
+# The maximum number of threads running sync calls to a model pool with a timeout.
+_TIMEOUT_WORKERS = 64
+
+# Shared by calls that are not rate limited or traced, so they do not build a context manager each.
+_NULL_CONTEXT = nullcontext()
+
+# Bounds the size of results in debug logs.
+_LOG_REPR = reprlib.Repr()
+_LOG_REPR.maxlevel = 4
+_LOG_REPR.maxdict = _LOG_REPR.maxlist = _LOG_REPR.maxtuple = _LOG_REPR.maxset = 16
+_LOG_REPR.maxstring = _LOG_REPR.maxother = 256
+
+
+class _LogCommand:
+    """
+    Debug log argument that describes a command, with its result truncated, only if the record is emitted.
+    """
+
+    __slots__ = ('cmd',)
+
+    def __init__(self, cmd):
+        self.cmd = cmd
+
+    def __str__(self):
+        cmd = self.cmd
+        return (f"{type(cmd).__name__}(session_id={cmd.session_id}" +
+                f", cmd_name={cmd.cmd_name}" +
+                f", exec_time={cmd.exec_time}" +
+                f", result={_LOG_REPR.repr(cmd.result)}" +
+                ")")
+
+
+# The number of distinct prompts shared per command name.
+_SHARED_PROMPTS = 8
+_shared_prompts: dict[str, OrderedDict[str, str]] = {}
+_shared_prompts_lock = threading.Lock()
+
+
+def _share_prompt(cmd_name: str, prompt):
+    # Commands of one kind are usually built with equal prompts, often formatted anew for each command.  The recent
+    # prompts of each command name are kept in a small LRU table rather than interned, so a prompt that is no longer
+    # used, e.g. one formatted with per-command values, can still be freed.
+    if type(prompt) is not str:
+        return prompt
+    with _shared_prompts_lock:
+        prompts = _shared_prompts.get(cmd_name)
+        if prompts is None:
+            prompts = _shared_prompts[cmd_name] = OrderedDict()
+        shared = prompts.get(prompt)
+        if shared is not None:
+            prompts.move_to_end(prompt)
+            return shared
+        prompts[prompt] = prompt
+        if len(prompts) > _SHARED_PROMPTS:
+            prompts.popitem(last=False)
+    return prompt
+
 
 def retry_with_exponential_backoff(
         func,
@@ -44,36 +124,58 @@ def retry_with_exponential_backoff(
         exponential_base: float = 2,
         jitter: bool = True,
         max_retries: int = 3,
-        errors: tuple = (OutputParserException,),
+        errors: tuple = (OutputParserException, RateLimitError),
 ):
     """
-    Retry a function with exponential backoff.
-    :param func:
-    :param initial_delay:
-    :param exponential_base:
-    :param jitter:
-    :param max_retries:
-    :param errors:
-    :return:
-    """
-    def wrapper(*args, **kwargs):
-        num_retries = 0
-        delay = initial_delay
-        while True:
-            try:
-                return func(*args, **kwargs)
-            except errors as e:
-                log.error(f"Caught exception: {e}")
-                num_retries += 1
-                if num_retries > max_retries:
-                    raise Exception(
-                        f"Maximum number of retries ({max_retries}) exceeded."
-                    )
-                delay *= exponential_base * (1 + jitter * random.random())
-                time.sleep(delay)
-            except Exception as e:
-                raise e
-    return wrapper
+    Retry a function with exponential backoff.  Kept for compatibility; use `RetryPolicy` for new code.
+    :param func: The function.
+    :param initial_delay: The delay before the first retry, in seconds.
+    :param exponential_base: The factor the delay grows by on each retry.
+    :param jitter: Whether to randomize each delay.
+    :param max_retries: The maximum number of retries.
+    :param errors: The exception types that are retried.
+    :return: The wrapped function.
+    """
+    return _legacy_policy(initial_delay, exponential_base, jitter, max_retries, errors)(func)
+
+
+def async_retry_with_exponential_backoff(
+        func,
+        initial_delay: float = 1,
+        exponential_base: float = 2,
+        jitter: bool = True,
+        max_retries: int = 3,
+        errors: tuple = (OutputParserException, RateLimitError),
+):
+    """
+    Retry a coroutine function with exponential backoff, waiting with asyncio.sleep so the event loop is not blocked.
+    Kept for compatibility; use `RetryPolicy` for new code.
+    :param func: The coroutine function.
+    :param initial_delay: The delay before the first retry, in seconds.
+    :param exponential_base: The factor the delay grows by on each retry.
+    :param jitter: Whether to randomize each delay.
+    :param max_retries: The maximum number of retries.
+    :param errors: The exception types that are retried.
+    :return: The wrapped coroutine function.
+    """
+    return _legacy_policy(initial_delay, exponential_base, jitter, max_retries, errors)(func)
+
+
+def _legacy_policy(initial_delay: float,
+                   exponential_base: float,
+                   jitter: bool,
+                   max_retries: int,
+                   errors: tuple,
+                   ) -> RetryPolicy:
+    return RetryPolicy(
+        max_retries=max_retries,
+        initial_delay=initial_delay,
+        max_delay=float('inf'),
+        multiplier=exponential_base,
+        jitter='full' if jitter else 'none',
+        classify=classify_by_types(errors),
+        budget=False,
+    )
 
 
 class LangChainWrapProxy(ABC):
@@ -85,11 +187,24 @@ class LangChainWrapProxy(ABC):
         """Submit a command for execution."""
         pass
 
+    async def aexecute(self, **kwargs):
+        """Submit a command for execution without blocking the event loop."""
+        return await asyncio.to_thread(self.execute, **kwargs)
+
 
 class LangChainCommand(ABC):
     """
-    Abstract command object for implementing LangChainWrap commands.
+    Abstract command object for implementing LangChainWrap commands.  Commands are slotted, so that jobs holding many
+    completed commands stay small; subclasses that declare no `__slots__` get an instance `__dict__` as usual.
     """
+    __slots__ = ('session_id', 'cmd_name', 'exec_time', 'sys_prompt', 'user_prompt_tmpl', 'output_parser',
+                 'retry_policy', 'use_cache', 'release_inputs', 'cache_hit', 'time_to_first_token',
+                 'time_to_first_result', 'timings', 'attempts', 'model_name', 'prompt_tokens', 'completion_tokens',
+                 'cost', 'downgraded', 'result')
+
+    model_role: str | None = None
+    """The LangChainWrap model the command runs on, 'chat' or 'llm', which selects its rate limiter."""
+
     def __init__(self,
                  *,
                  session_id: str = None,
@@ -97,14 +212,23 @@ class LangChainCommand(ABC):
                  sys_prompt: str = None,
                  user_prompt_tmpl: str = None,
                  output_parser: BaseCumulativeTransformOutputParser = None,
+                 retry_policy: RetryPolicy = None,
+                 use_cache: bool = True,
+                 release_inputs: bool = False,
                  ):
         """
-        Construct a new instance.
+        Construct a new instance.  The command name is interned, and commands of one name built with one of its
+        recent prompts share one copy of it.
         :param session_id: The session_id.
         :param cmd_name: The command name.
         :param sys_prompt: The system prompt.  This is not a prompt template.
         :param user_prompt_tmpl: The user prompt template.
         :param output_parser: The specified endpoint output parser.
+        :param retry_policy: The retry policy for this command, overriding the client's.
+        :param use_cache: Whether results may be served from and stored in the client's response cache, and shared
+            with identical commands in flight.
+        :param release_inputs: Whether the client releases the command's inputs and prompts once it completes
+            successfully, keeping only the result and statistics.
         """
 
         if session_id is None:
@@ -114,11 +238,24 @@ class LangChainCommand(ABC):
             raise Exception('cmd_name is required')
 
         self.session_id: str = session_id
-        self.cmd_name: str = cmd_name
+        self.cmd_name: str = sys.intern(cmd_name) if type(cmd_name) is str else cmd_name
         self.exec_time: float | None = None
-        self.sys_prompt: str = sys_prompt
-        self.user_prompt_tmpl: str = user_prompt_tmpl
+        self.sys_prompt: str = _share_prompt(self.cmd_name, sys_prompt)
+        self.user_prompt_tmpl: str = _share_prompt(self.cmd_name, user_prompt_tmpl)
         self.output_parser: BaseCumulativeTransformOutputParser = output_parser
+        self.retry_policy: RetryPolicy | None = retry_policy
+        self.use_cache: bool = use_cache
+        self.release_inputs: bool = release_inputs
+        self.cache_hit: bool = False
+        self.time_to_first_token: float | None = None
+        self.time_to_first_result: float | None = None
+        self.timings: dict[str, float] = {}
+        self.attempts: int = 0
+        self.model_name: str | None = None
+        self.prompt_tokens: int = 0
+        self.completion_tokens: int = 0
+        self.cost: float = 0.0
+        self.downgraded: bool = False
         self.result = None
 
     @abstractmethod
@@ -130,6 +267,46 @@ class LangChainCommand(ABC):
         """
         pass
 
+    async def arun(self, client: LangChainWrapProxy, **kwargs):
+        """
+        Execute command logic without blocking the event loop.  Runs `run` in a worker thread unless overridden.
+        :param client: The LangChainWrap client.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        """
+        return await asyncio.to_thread(self.run, client, **kwargs)
+
+    def stream(self, client: LangChainWrapProxy, *, config: RunnableConfig = None, **kwargs) -> Iterator[Any]:
+        """
+        Execute command logic, yielding partial results as the output parser produces them.  Streams the chain of
+        the command's model, or yields the result of `run` for commands without a `model_role`.
+        :param client: The LangChainWrap client.
+        :param config: The runnable config for the chain.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        :return: An iterator of partial results.
+        """
+        if self.model_role is None:
+            yield self.run(client, **kwargs).result
+            return
+        chain = self.get_chain(getattr(client, self.model_role))
+        yield from chain.stream(self.prompt_inputs(**kwargs), config=config)
+
+    async def astream(self, client: LangChainWrapProxy, *, config: RunnableConfig = None, **kwargs) -> AsyncIterator[Any]:
+        """
+        Execute command logic without blocking the event loop, yielding partial results as the output parser
+        produces them.  Streams the chain of the command's model, or yields the result of `arun` for commands without
+        a `model_role`.
+        :param client: The LangChainWrap client.
+        :param config: The runnable config for the chain.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        :return: An async iterator of partial results.
+        """
+        if self.model_role is None:
+            yield (await self.arun(client, **kwargs)).result
+            return
+        chain = self.get_chain(getattr(client, self.model_role))
+        async for output in chain.astream(self.prompt_inputs(**kwargs), config=config):
+            yield output
+
     @abstractmethod
     def get_prompt_template(self) -> BasePromptTemplate:
         """
@@ -138,6 +315,72 @@ class LangChainCommand(ABC):
         """
         pass
 
+    def prompt_inputs(self, **kwargs) -> dict:
+        """
+        Get the prompt template inputs of a run.
+        :param kwargs: Additional prompt inputs for the run.
+        :return: The command inputs, updated with the additional inputs.
+        """
+        return {**(getattr(self, 'inputs', None) or {}), **kwargs}
+
+    def estimate_tokens(self, **kwargs) -> int:
+        """
+        Roughly estimate the prompt tokens of a run, at about four characters per token, for rate limiting.
+        :param kwargs: Additional prompt inputs for the run.
+        :return: The estimated number of prompt tokens.
+        """
+        chars = len(self.sys_prompt or '') + len(self.user_prompt_tmpl or '')
+        chars += sum(len(str(value)) for value in self.prompt_inputs(**kwargs).values())
+        return chars // 4 + 1
+
+    def response_cache_key(self, model, **kwargs) -> str:
+        """
+        Get the key a run's result is cached by: a digest of the rendered prompt, the model class and parameters,
+        and the output parser class and configuration.
+        :param model: The LangChain chat or llm model.
+        :param kwargs: Additional prompt inputs for the run.
+        :return: The response cache key.
+        """
+        prompt = self.get_prompt_template().format_prompt(**self.prompt_inputs(**kwargs))
+        parser = self.output_parser
+        key = json.dumps({
+            'prompt': [[message.type, message.content] for message in prompt.to_messages()],
+            'model': f"{type(model).__module__}.{type(model).__qualname__}",
+            'params': getattr(model, '_identifying_params', None),
+            'parser': None if parser is None else f"{type(parser).__module__}.{type(parser).__qualname__}",
+            'parser_params': parser.dict() if callable(getattr(parser, 'dict', None)) else None,
+        }, sort_keys=True, default=repr)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def chain_key(self, model) -> Hashable:
+        """
+        Get the key the composed chain for a model is cached by.  Commands with equal keys must compose equivalent
+        chains, so subclasses whose prompt template depends on more than the prompts must extend the key.
+        :param model: The LangChain chat or llm model.
+        :return: The chain key.
+        """
+        return type(self), self.sys_prompt, self.user_prompt_tmpl, id(model), id(self.output_parser)
+
+    def get_chain(self, model) -> Runnable:
+        """
+        Get the `prompt | model | parser` chain for a model, reusing the chain of any command with the same key.
+        :param model: The LangChain chat or llm model.
+        :return: The composed chain.
+        """
+        def build() -> Runnable:
+            return self.get_prompt_template() | model | self.output_parser
+
+        cache = get_chain_cache()
+        if cache is None:
+            return build()
+        return cache.get_or_build(self.chain_key(model), build)
+
+    def release(self) -> None:
+        """
+        Release the prompts and inputs of a completed command.  The command can no longer be run or streamed.
+        """
+        self.sys_prompt = self.user_prompt_tmpl = None
+
     def output_key(self):
         """
         Get the command output_key for base class for quick debugging.
@@ -147,6 +390,16 @@ class LangChainCommand(ABC):
             'session_id': self.session_id,
             'cmd_name': self.cmd_name,
             'exec_time': self.exec_time,
+            'cache_hit': self.cache_hit,
+            'time_to_first_token': self.time_to_first_token,
+            'time_to_first_result': self.time_to_first_result,
+            'model_name': self.model_name,
+            'attempts': self.attempts,
+            'timings': self.timings,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cost': self.cost,
+            'downgraded': self.downgraded,
             # 'result': self.result,
         }
 
@@ -169,45 +422,959 @@ class LangChainCommand(ABC):
                 ")")
 
 
+class _FirstTokenTimer(BaseCallbackHandler):
+    """
+    Callback handler that records when the model produced its first token.
+    """
+    run_inline = True
+
+    def __init__(self, start_time: float):
+        self.start_time: float = start_time
+        self.time_to_first_token: float | None = None
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.start_time
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        # Models that do not stream deliver their first token with the whole response.
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.start_time
+
+
+class _CallRecorder(BaseCallbackHandler):
+    """
+    Callback handler that adds the time spent rendering prompts, calling models and parsing output to a command's
+    timings, and the tokens its model calls report to its usage.  While streaming, parsing overlaps the model call.
+    """
+    run_inline = True
+
+    _CHAIN_PHASES = {'prompt': 'prompt', 'parser': 'parse'}
+
+    def __init__(self, cmd: LangChainCommand, ledger: UsageLedger | None):
+        self.cmd: LangChainCommand = cmd
+        self.ledger: UsageLedger | None = ledger
+        self._spans: dict[Any, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: Any, **kwargs: Any) -> None:
+        phase = self._CHAIN_PHASES.get(kwargs.get('run_type'))
+        if phase is not None:
+            self._start(run_id, phase)
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self._start(run_id, 'model')
+
+    def on_llm_start(self, serialized: Any, prompts: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self._start(run_id, 'model')
+
+    def on_chain_end(self, outputs: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_llm_end(self, response: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self._end(run_id)
+        tokens = token_usage(response)
+        if tokens is None:
+            return
+        cmd = self.cmd
+        cmd.prompt_tokens += tokens[0]
+        cmd.completion_tokens += tokens[1]
+        if self.ledger is not None:
+            cmd.cost += self.ledger.record(cmd.session_id, cmd.cmd_name, cmd.model_name, *tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def _start(self, run_id: Any, phase: str) -> None:
+        with self._lock:
+            self._spans[run_id] = (phase, time.perf_counter())
+
+    def _end(self, run_id: Any) -> None:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+            if span is not None:
+                _add_timing(self.cmd.timings, span[0], time.perf_counter() - span[1])
+
+
+# Chains invoked by a command's run pick up the recorder of the call from this context variable.
+_call_recorder: contextvars.ContextVar[_CallRecorder | None] = contextvars.ContextVar('interacticore_call_recorder',
+                                                                                      default=None)
+register_configure_hook(_call_recorder, True)
+
+
+def _add_timing(timings: dict[str, float], phase: str, seconds: float) -> None:
+    timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+class CommandOutcome:
+    """
+    Outcome of one command in a bulk execution.
+    """
+
+    __slots__ = ('index', 'cmd', 'error')
+
+    def __init__(self, index: int, cmd: LangChainCommand, error: BaseException | None = None):
+        """
+        Construct a new instance.
+        :param index: The position of the command in the submitted commands.
+        :param cmd: The command instance, completed if the execution succeeded.
+        :param error: The exception the execution raised, if any.
+        """
+        self.index: int = index
+        self.cmd: LangChainCommand = cmd
+        self.error: BaseException | None = error
+
+    @property
+    def ok(self) -> bool:
+        """
+        Whether the command completed without an exception.
+        """
+        return self.error is None
+
+    @property
+    def result(self):
+        """
+        The command result, or None if the execution failed.
+        """
+        return self.cmd.result if self.error is None else None
+
+    def __str__(self):
+        return (f"CommandOutcome(index={self.index}" +
+                f", cmd_name={self.cmd.cmd_name}" +
+                f", error={self.error}" +
+                ")")
+
+    def __repr__(self):
+        return (f"CommandOutcome(index={self.index!r}" +
+                f", cmd={self.cmd!r}" +
+                f", error={self.error!r}" +
+                ")")
+
+
 class LangChainWrap(LangChainWrapProxy):
     """
     Client for abstracting boilerplate for supporting multiple models with LangChain.
     """
     def __init__(self,
                  *,
-                 chat: BaseChatModel = None,
-                 llm: BaseLLM = None,
+                 chat: BaseChatModel | ModelPool = None,
+                 llm: BaseLLM | ModelPool = None,
+                 rate_limiters: dict[str, RateLimiter] = None,
+                 retry_policy: RetryPolicy = None,
+                 hedge_policy: HedgePolicy = None,
+                 response_cache: ResponseCache = None,
+                 single_flight: SingleFlight = None,
+                 metrics_sink: MetricsSink = None,
+                 trace_sampler: TraceSampler = None,
+                 usage_ledger: UsageLedger = None,
                  ):
         """
         Construct a new instance.
 
-        :param chat: The LangChain chat model.
-        :param llm: The LangChain llm model.
+        :param chat: The LangChain chat model, or a pool of equivalent chat models to route calls across.
+        :param llm: The LangChain llm model, or a pool of equivalent llm models to route calls across.
+        :param rate_limiters: Rate limiters by model, 'chat' or 'llm'.  Share a limiter between clients that call the
+            same provider model so they draw from one budget.
+        :param retry_policy: The retry policy for commands that do not set their own.
+        :param hedge_policy: The hedging policy for slow calls, or None to never hedge.
+        :param response_cache: The cache of command results, or None to always call the model.
+        :param single_flight: Coalesces identical commands in flight into one call, or None to call the model for
+            each.  Commands that opt out of the response cache also opt out of coalescing.
+        :param metrics_sink: The receiver of each command's phase timings, or None to not report them.
+        :param trace_sampler: Samples the calls traced to LangSmith, or None to trace only the calls that name a
+            project with `lc_project`.
+        :param usage_ledger: Accounts the tokens and cost of each session and enforces session budgets, or None to
+            only count tokens on the commands.
         """
         if chat is None and llm is None:
             raise ValueError('either chat or llm is required')
 
         self.chat = chat
         self.llm = llm
+        self.rate_limiters: dict[str, RateLimiter] = rate_limiters or {}
+        self.retry_policy: RetryPolicy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.hedge_policy: HedgePolicy | None = hedge_policy
+        self.response_cache: ResponseCache | None = response_cache
+        self.single_flight: SingleFlight | None = single_flight
+        self.metrics_sink: MetricsSink | None = metrics_sink
+        self.trace_sampler: TraceSampler | None = trace_sampler
+        self.usage_ledger: UsageLedger | None = usage_ledger
+        self._hedge_executor: ThreadPoolExecutor | None = None
+        self._timeout_executor: ThreadPoolExecutor | None = None
+        self._model_names: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def rate_limiter(self, cmd: LangChainCommand) -> RateLimiter | None:
+        """
+        Get the rate limiter for the model a command runs on.
+        :param cmd: the command instance.
+        :return: The rate limiter, or None if the model is not rate limited.
+        """
+        return self.rate_limiters.get(cmd.model_role)
+
+    def retry_policy_for(self, cmd: LangChainCommand) -> RetryPolicy:
+        """
+        Get the retry policy for a command.
+        :param cmd: the command instance.
+        :return: The command's retry policy, or the client's if the command has none.
+        """
+        return cmd.retry_policy if cmd.retry_policy is not None else self.retry_policy
 
-    @retry_with_exponential_backoff
     def execute(self, cmd: LangChainCommand, **kwargs) -> LangChainCommand:
         """
-        Submit a command for execution.
+        Submit a command for execution, retrying failed attempts under its retry policy.  An identical command
+        already in flight is joined rather than repeated when the client coalesces commands.
         :param cmd: the command instance.
         :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
         :return: The completed command instance.
         """
-        log.debug(f"{cmd.session_id} | {cmd.cmd_name} | Request: {cmd}")
+        start_time = time.perf_counter()
+        self._reset_stats(cmd)
+        outcome, error = 'error', None
+        try:
+            cmd_result, outcome = self._execute(cmd, **kwargs)
+            if cmd_result.release_inputs:
+                cmd_result.release()
+            return cmd_result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            cmd.timings['total'] = time.perf_counter() - start_time
+            self._record_metrics(cmd, outcome, error)
+
+    def _execute(self, cmd: LangChainCommand, **kwargs) -> tuple[LangChainCommand, str]:
+        request_key = self._request_key(cmd, kwargs)
+        if request_key is not None and self.response_cache is not None:
+            start_time = time.perf_counter()
+            hit, result = self.response_cache.lookup(request_key)
+            if hit:
+                return self._cache_hit(cmd, result, start_time), 'cache_hit'
+
+        if request_key is None or self.single_flight is None or self._over_budget(cmd):
+            return self._execute_uncached(cmd, request_key, **kwargs), 'ok'
+        cmd_result, shared = self.single_flight.do(request_key,
+                                                   lambda: self._execute_uncached(cmd, request_key, **kwargs))
+        if shared and cmd_result.downgraded:
+            # The leader's session went over budget while it ran; its downgraded result is not shared.
+            return self._execute_uncached(cmd, request_key, **kwargs), 'ok'
+        return (self._coalesced(cmd, cmd_result), 'coalesced') if shared else (cmd_result, 'ok')
+
+    async def aexecute(self, cmd: LangChainCommand, **kwargs) -> LangChainCommand:
+        """
+        Submit a command for execution on the running event loop, retrying failed attempts under its retry policy.
+        An identical command already in flight is joined rather than repeated when the client coalesces commands.
+        :param cmd: the command instance.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        :return: The completed command instance.
+        """
+        start_time = time.perf_counter()
+        self._reset_stats(cmd)
+        outcome, error = 'error', None
+        try:
+            cmd_result, outcome = await self._aexecute(cmd, **kwargs)
+            if cmd_result.release_inputs:
+                cmd_result.release()
+            return cmd_result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            cmd.timings['total'] = time.perf_counter() - start_time
+            self._record_metrics(cmd, outcome, error)
+
+    async def _aexecute(self, cmd: LangChainCommand, **kwargs) -> tuple[LangChainCommand, str]:
+        request_key = self._request_key(cmd, kwargs)
+        if request_key is not None and self.response_cache is not None:
+            start_time = time.perf_counter()
+            hit, result = await self.response_cache.alookup(request_key)
+            if hit:
+                return self._cache_hit(cmd, result, start_time), 'cache_hit'
+
+        if request_key is None or self.single_flight is None or self._over_budget(cmd):
+            return await self._aexecute_uncached(cmd, request_key, **kwargs), 'ok'
+        cmd_result, shared = await self.single_flight.ado(request_key,
+                                                          lambda: self._aexecute_uncached(cmd, request_key, **kwargs))
+        if shared and cmd_result.downgraded:
+            # The leader's session went over budget while it ran; its downgraded result is not shared.
+            return await self._aexecute_uncached(cmd, request_key, **kwargs), 'ok'
+        return (self._coalesced(cmd, cmd_result), 'coalesced') if shared else (cmd_result, 'ok')
+
+    def _execute_uncached(self, cmd: LangChainCommand, request_key: str | None, **kwargs) -> LangChainCommand:
+        run_attempt = self._execute_once if self.hedge_policy is None else self._execute_hedged
+        attempt_end = None
+
+        def attempt(attempt_cmd: LangChainCommand, **attempt_kwargs) -> LangChainCommand:
+            nonlocal attempt_end
+            if attempt_end is not None:
+                _add_timing(cmd.timings, 'backoff', time.perf_counter() - attempt_end)
+            cmd.attempts += 1
+            try:
+                return run_attempt(attempt_cmd, **attempt_kwargs)
+            finally:
+                attempt_end = time.perf_counter()
+
+        cmd_result = self.retry_policy_for(cmd).call(attempt, cmd, **kwargs)
+        if request_key is not None and self.response_cache is not None and not cmd_result.downgraded:
+            self.response_cache.store(request_key, cmd_result.result)
+        return cmd_result
+
+    async def _aexecute_uncached(self, cmd: LangChainCommand, request_key: str | None, **kwargs) -> LangChainCommand:
+        run_attempt = self._aexecute_once if self.hedge_policy is None else self._aexecute_hedged
+        attempt_end = None
+
+        async def attempt(attempt_cmd: LangChainCommand, **attempt_kwargs) -> LangChainCommand:
+            nonlocal attempt_end
+            if attempt_end is not None:
+                _add_timing(cmd.timings, 'backoff', time.perf_counter() - attempt_end)
+            cmd.attempts += 1
+            try:
+                return await run_attempt(attempt_cmd, **attempt_kwargs)
+            finally:
+                attempt_end = time.perf_counter()
+
+        cmd_result = await self.retry_policy_for(cmd).acall(attempt, cmd, **kwargs)
+        if request_key is not None and self.response_cache is not None and not cmd_result.downgraded:
+            await self.response_cache.astore(request_key, cmd_result.result)
+        return cmd_result
+
+    @staticmethod
+    def _coalesced(cmd: LangChainCommand, leader: LangChainCommand) -> LangChainCommand:
+        # Each caller gets its own copy of the result, as it would from the response cache.
+        cmd.result = copy.deepcopy(leader.result)
+        cmd.exec_time = leader.exec_time
+        cmd.model_name = leader.model_name
+        cmd.downgraded = leader.downgraded
+        log.debug("%s | %s | Coalesced: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd))
+        return cmd
+
+    def stream(self, cmd: LangChainCommand, **kwargs) -> Iterator[Any]:
+        """
+        Submit a command for execution, yielding partial results as they arrive.  The command records its time to
+        first token, time to first result and total exec_time, and holds the last result when the stream ends.
+        Streams are not retried, hedged or failed over, because partial results have already been delivered when a
+        call fails.
+        :param cmd: the command instance.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        :return: An iterator of partial results.
+        """
+        stream_start = time.perf_counter()
+        self._reset_stats(cmd)
+        cache_key = self._response_cache_key(cmd, kwargs)
+        if cache_key is not None:
+            hit, result = self.response_cache.lookup(cache_key)
+            if hit:
+                self._cache_hit(cmd, result, stream_start)
+                cmd.timings['total'] = time.perf_counter() - stream_start
+                self._record_metrics(cmd, 'cache_hit', None)
+                if cmd.release_inputs:
+                    cmd.release()
+                yield cmd.result
+                return
+
+        log.debug("%s | %s | Request: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd))
+
+        lc_project: str | None = kwargs.pop('lc_project', None)
+        pool, member, pool_start = None, None, None
+        failed, error = None, None
+        try:
+            # Routing, the budget check and the rate limiter can fail too, and are reported like any other failure.
+            client, pool, member = self._route(cmd)
+            client = client._budgeted_client(cmd)
+            cmd.model_name = client._model_name(cmd)
+            limiter = client.rate_limiter(cmd)
+            limit = limiter.limit(cmd.estimate_tokens(**kwargs)) if limiter is not None else _NULL_CONTEXT
+            pool_start = pool.acquire(member) if pool is not None else None
+            queued = time.perf_counter()
+            with self._tracing(cmd, lc_project), limit:
+                cmd.time_to_first_token = cmd.time_to_first_result = None
+                start_time = time.perf_counter()
+                _add_timing(cmd.timings, 'queue', start_time - queued)
+                cmd.attempts = 1
+                timer = _FirstTokenTimer(start_time)
+                callbacks = [timer, _CallRecorder(cmd, self.usage_ledger)]
+                for output in cmd.stream(client, config={'callbacks': callbacks}, **kwargs):
+                    self._stream_output(cmd, output, start_time, timer)
+                    yield output
+                cmd.exec_time = time.perf_counter() - start_time
+                cmd.time_to_first_token = timer.time_to_first_token
+            failed = False
+        except Exception as e:
+            failed, error = self._counts_against_model(cmd, e), e
+            raise
+        finally:
+            if pool_start is not None:
+                pool.release(member, pool_start, failed)
+            self._record_stream_metrics(cmd, stream_start, failed, error)
+
+        log.debug("%s | %s | Response: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd))
+        if cache_key is not None and not cmd.downgraded:
+            self.response_cache.store(cache_key, cmd.result)
+        if cmd.release_inputs:
+            cmd.release()
+
+    async def astream(self, cmd: LangChainCommand, **kwargs) -> AsyncIterator[Any]:
+        """
+        Submit a command for execution on the running event loop, yielding partial results as they arrive.  The
+        command records its time to first token, time to first result and total exec_time, and holds the last result
+        when the stream ends.  Streams are not retried, hedged or failed over, because partial results have already been
+        delivered when a call fails.
+        :param cmd: the command instance.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        :return: An async iterator of partial results.
+        """
+        stream_start = time.perf_counter()
+        self._reset_stats(cmd)
+        cache_key = self._response_cache_key(cmd, kwargs)
+        if cache_key is not None:
+            hit, result = await self.response_cache.alookup(cache_key)
+            if hit:
+                self._cache_hit(cmd, result, stream_start)
+                cmd.timings['total'] = time.perf_counter() - stream_start
+                self._record_metrics(cmd, 'cache_hit', None)
+                if cmd.release_inputs:
+                    cmd.release()
+                yield cmd.result
+                return
+
+        log.debug("%s | %s | Request: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd))
+
+        lc_project: str | None = kwargs.pop('lc_project', None)
+        pool, member, pool_start = None, None, None
+        failed, error = None, None
+        try:
+            # Routing, the budget check and the rate limiter can fail too, and are reported like any other failure.
+            client, pool, member = self._route(cmd)
+            client = client._budgeted_client(cmd)
+            cmd.model_name = client._model_name(cmd)
+            limiter = client.rate_limiter(cmd)
+            limit = limiter.alimit(cmd.estimate_tokens(**kwargs)) if limiter is not None else _NULL_CONTEXT
+            pool_start = pool.acquire(member) if pool is not None else None
+            queued = time.perf_counter()
+            with self._tracing(cmd, lc_project):
+                async with limit:
+                    cmd.time_to_first_token = cmd.time_to_first_result = None
+                    start_time = time.perf_counter()
+                    _add_timing(cmd.timings, 'queue', start_time - queued)
+                    cmd.attempts = 1
+                    timer = _FirstTokenTimer(start_time)
+                    callbacks = [timer, _CallRecorder(cmd, self.usage_ledger)]
+                    async for output in cmd.astream(client, config={'callbacks': callbacks}, **kwargs):
+                        self._stream_output(cmd, output, start_time, timer)
+                        yield output
+                    cmd.exec_time = time.perf_counter() - start_time
+                    cmd.time_to_first_token = timer.time_to_first_token
+            failed = False
+        except Exception as e:
+            failed, error = self._counts_against_model(cmd, e), e
+            raise
+        finally:
+            if pool_start is not None:
+                pool.release(member, pool_start, failed)
+            self._record_stream_metrics(cmd, stream_start, failed, error)
+
+        log.debug("%s | %s | Response: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd))
+        if cache_key is not None and not cmd.downgraded:
+            await self.response_cache.astore(cache_key, cmd.result)
+        if cmd.release_inputs:
+            cmd.release()
+
+    @staticmethod
+    def _stream_output(cmd: LangChainCommand, output, start_time: float, timer: _FirstTokenTimer) -> None:
+        if cmd.time_to_first_result is None:
+            cmd.time_to_first_result = time.perf_counter() - start_time
+        cmd.time_to_first_token = timer.time_to_first_token
+        cmd.result = output
+
+    def _record_stream_metrics(self,
+                               cmd: LangChainCommand,
+                               start_time: float,
+                               failed: bool | None,
+                               error: BaseException | None,
+                               ) -> None:
+        # A stream the caller stopped consuming has no outcome to report.
+        if failed is None and error is None:
+            return
+        cmd.timings['total'] = time.perf_counter() - start_time
+        self._record_metrics(cmd, 'ok' if error is None else 'error', error)
+
+    def _record_metrics(self, cmd: LangChainCommand, outcome: str, error: BaseException | None) -> None:
+        if self.metrics_sink is None:
+            return
+        try:
+            self.metrics_sink.record(CommandMetrics(cmd.cmd_name, cmd.model_name, cmd.session_id, outcome,
+                                                    dict(cmd.timings), cmd.attempts, error))
+        except Exception:
+            # Reporting metrics must never fail a command.
+            log.exception("%s | %s | Metrics sink failed", cmd.session_id, cmd.cmd_name)
+
+    def _model_name(self, cmd: LangChainCommand) -> str | None:
+        if cmd.model_role is None:
+            return None
+        model = getattr(self, cmd.model_role, None)
+        if model is None:
+            return None
+        # Probing a pydantic model for attributes it lacks is slow, so names are worked out once per model.
+        name = self._model_names.get(id(model))
+        if name is None:
+            name = type(model).__name__
+            for attr in ('model_name', 'model'):
+                value = getattr(model, attr, None)
+                if isinstance(value, str) and value:
+                    name = value
+                    break
+            self._model_names[id(model)] = name
+        return name
+
+    def _response_cache_key(self, cmd: LangChainCommand, kwargs: dict) -> str | None:
+        if self.response_cache is None:
+            return None
+        return self._request_key(cmd, kwargs)
+
+    def _request_key(self, cmd: LangChainCommand, kwargs: dict) -> str | None:
+        # Identifies a request for the response cache and for coalescing, when either is in use.
+        if (self.response_cache is None and self.single_flight is None) or not cmd.use_cache or cmd.model_role is None:
+            return None
+        model = getattr(self, cmd.model_role, None)
+        if model is None:
+            return None
+        return cmd.response_cache_key(model, **{key: value for key, value in kwargs.items() if key != 'lc_project'})
+
+    @staticmethod
+    def _cache_hit(cmd: LangChainCommand, result, start_time: float) -> LangChainCommand:
+        cmd.result = result
+        cmd.cache_hit = True
+        cmd.exec_time = time.perf_counter() - start_time
+        log.debug("%s | %s | Cache hit: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd))
+        return cmd
+
+    def _tracing(self, cmd: LangChainCommand, lc_project: str | None):
+        sampler = self.trace_sampler
+        if sampler is None:
+            return _NULL_CONTEXT if lc_project is None else tracing_v2_enabled(lc_project)
+        if not sampler.sampled(cmd.session_id, cmd.cmd_name):
+            return _NULL_CONTEXT
+        return tracing_v2_enabled(lc_project or sampler.project)
+
+    def _over_budget(self, cmd: LangChainCommand) -> bool:
+        # Over-budget sessions may run on a downgrade model, so their calls are not coalesced with other sessions'.
+        return self.usage_ledger is not None and self.usage_ledger.over_budget(cmd.session_id) is not None
+
+    def _budgeted_client(self, cmd: LangChainCommand) -> 'LangChainWrap':
+        # This client while the command's session is within budget, a copy of it on the downgrade model once the
+        # session is over, or a BudgetExceededError if the budget has no downgrade for the command's model.
+        ledger = self.usage_ledger
+        if ledger is None:
+            return self
+        budget = ledger.over_budget(cmd.session_id)
+        if budget is None:
+            return self
+        model = budget.downgrade.get(cmd.model_role) if cmd.model_role is not None else None
+        if model is None:
+            raise BudgetExceededError(f"Session {cmd.session_id} is over budget.", session_id=cmd.session_id,
+                                      usage=ledger.usage(cmd.session_id), budget=budget)
+        log.debug("%s | %s | Over budget, downgrading", cmd.session_id, cmd.cmd_name)
+        cmd.downgraded = True
+        client = copy.copy(self)
+        setattr(client, cmd.model_role, model)
+        return client
+
+    def _model_pool(self, cmd: LangChainCommand) -> ModelPool | None:
+        if cmd.model_role is None:
+            return None
+        model = getattr(self, cmd.model_role, None)
+        return model if isinstance(model, ModelPool) else None
+
+    def _member_client(self, cmd: LangChainCommand, member: PooledModel) -> 'LangChainWrap':
+        # A shallow copy that runs the command on one model of the pool, sharing everything else with this client.
+        client = copy.copy(self)
+        setattr(client, cmd.model_role, member.model)
+        # Pooled models are reported under their names in the pool.
+        self._model_names[id(member.model)] = member.name
+        if member.rate_limiter is not None:
+            client.rate_limiters = {**self.rate_limiters, cmd.model_role: member.rate_limiter}
+        return client
+
+    def _route(self, cmd: LangChainCommand) -> tuple['LangChainWrap', ModelPool | None, PooledModel | None]:
+        pool = self._model_pool(cmd)
+        if pool is None:
+            return self, None, None
+        member = pool.candidates()[0]
+        return self._member_client(cmd, member), pool, member
+
+    def _counts_against_model(self, cmd: LangChainCommand, error: BaseException) -> bool | None:
+        # Errors the retry policy treats as fatal come from the command rather than the model, so they neither
+        # fail over nor count against the model's error rate.
+        return None if self.retry_policy_for(cmd).classify(error) is ErrorClass.FATAL else True
+
+    def _execute_once(self, cmd: LangChainCommand, **kwargs) -> LangChainCommand:
+        pool = self._model_pool(cmd)
+        if pool is None:
+            return self._execute_on_model(cmd, **kwargs)
+
+        error = None
+        for member in pool.candidates():
+            if error is not None:
+                log.warning("%s | %s | Failing over to %s: %r", cmd.session_id, cmd.cmd_name, member.name, error)
+            start_time = pool.acquire(member)
+            failed = None
+            try:
+                client = self._member_client(cmd, member)
+                if pool.timeout is None:
+                    cmd_result = client._execute_on_model(cmd, **kwargs)
+                else:
+                    cmd_result = self._execute_with_timeout(client, cmd, pool.timeout, **kwargs)
+                failed = False
+                return cmd_result
+            except Exception as e:
+                failed = self._counts_against_model(cmd, e)
+                if failed is None:
+                    raise
+                error = e
+            finally:
+                pool.release(member, start_time, failed)
+        raise error
+
+    def _execute_with_timeout(self,
+                              client: 'LangChainWrap',
+                              cmd: LangChainCommand,
+                              timeout: float,
+                              **kwargs,
+                              ) -> LangChainCommand:
+        # A sync call cannot be interrupted, so it runs on its own copy of the command on a worker thread, and is
+        # abandoned to finish if it takes longer than the timeout, so that a late finish cannot overwrite the result.
+        future = self._get_timeout_executor().submit(contextvars.copy_context().run, client._execute_on_model,
+                                                     self._request_copy(cmd), **kwargs)
+        try:
+            attempt = future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"{cmd.cmd_name} timed out after {timeout}s") from None
+        self._adopt_request(cmd, attempt)
+        cmd.exec_time = attempt.exec_time
+        return cmd
+
+    async def _aexecute_once(self, cmd: LangChainCommand, **kwargs) -> LangChainCommand:
+        pool = self._model_pool(cmd)
+        if pool is None:
+            return await self._aexecute_on_model(cmd, **kwargs)
+
+        error = None
+        for member in pool.candidates():
+            if error is not None:
+                log.warning("%s | %s | Failing over to %s: %r", cmd.session_id, cmd.cmd_name, member.name, error)
+            start_time = pool.acquire(member)
+            failed = None
+            try:
+                attempt = self._member_client(cmd, member)._aexecute_on_model(cmd, **kwargs)
+                if pool.timeout is not None:
+                    attempt = asyncio.wait_for(attempt, pool.timeout)
+                cmd_result = await attempt
+                failed = False
+                return cmd_result
+            except Exception as e:
+                failed = self._counts_against_model(cmd, e)
+                if failed is None:
+                    raise
+                error = e
+            finally:
+                pool.release(member, start_time, failed)
+        raise error
+
+    def _execute_on_model(self, cmd: LangChainCommand, **kwargs) -> LangChainCommand:
+        log.debug("%s | %s | Request: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd))
 
         lc_project: str | None = kwargs.pop('lc_project', None)
-        with tracing_v2_enabled(lc_project):
-            start_time = time.time()
-            cmd_result: LangChainCommand = cmd.run(self, **kwargs)
-            end_time = time.time()
+        client = self._budgeted_client(cmd)
+        cmd.model_name = client._model_name(cmd)
+        limiter = client.rate_limiter(cmd)
+        limit = limiter.limit(cmd.estimate_tokens(**kwargs)) if limiter is not None else _NULL_CONTEXT
+        queued = time.perf_counter()
+        with self._tracing(cmd, lc_project), limit:
+            start_time = time.perf_counter()
+            _add_timing(cmd.timings, 'queue', start_time - queued)
+            token = _call_recorder.set(_CallRecorder(cmd, self.usage_ledger))
+            try:
+                cmd_result: LangChainCommand = cmd.run(client, **kwargs)
+            finally:
+                _call_recorder.reset(token)
+            end_time = time.perf_counter()
             exec_time = end_time - start_time
             cmd_result.exec_time = exec_time
 
-        log.debug(f"{cmd.session_id} | {cmd.cmd_name} | Response: {cmd_result}")
+        log.debug("%s | %s | Response: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd_result))
 
         return cmd_result
+
+    async def _aexecute_on_model(self, cmd: LangChainCommand, **kwargs) -> LangChainCommand:
+        log.debug("%s | %s | Request: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd))
+
+        lc_project: str | None = kwargs.pop('lc_project', None)
+        client = self._budgeted_client(cmd)
+        cmd.model_name = client._model_name(cmd)
+        limiter = client.rate_limiter(cmd)
+        limit = limiter.alimit(cmd.estimate_tokens(**kwargs)) if limiter is not None else _NULL_CONTEXT
+        queued = time.perf_counter()
+        with self._tracing(cmd, lc_project):
+            async with limit:
+                start_time = time.perf_counter()
+                _add_timing(cmd.timings, 'queue', start_time - queued)
+                token = _call_recorder.set(_CallRecorder(cmd, self.usage_ledger))
+                try:
+                    cmd_result: LangChainCommand = await cmd.arun(client, **kwargs)
+                finally:
+                    _call_recorder.reset(token)
+                end_time = time.perf_counter()
+            exec_time = end_time - start_time
+            cmd_result.exec_time = exec_time
+
+        log.debug("%s | %s | Response: %s", cmd.session_id, cmd.cmd_name, _LogCommand(cmd_result))
+
+        return cmd_result
+
+    def _execute_hedged(self, cmd: LangChainCommand, **kwargs) -> LangChainCommand:
+        policy = self.hedge_policy
+        delay = policy.delay_for(cmd.cmd_name)
+        if delay is None:
+            cmd_result = self._execute_once(cmd, **kwargs)
+            policy.record(cmd.cmd_name, cmd_result.exec_time)
+            return cmd_result
+
+        # Each request runs on its own copy of the command, so a request that loses and finishes late cannot
+        # overwrite the result.  A sync request cannot be interrupted, so the loser is abandoned to finish.
+        executor = self._get_hedge_executor()
+        start_time = time.perf_counter()
+        primary = executor.submit(contextvars.copy_context().run, self._execute_once, self._request_copy(cmd), **kwargs)
+        primary.add_done_callback(self._primary_recorder(cmd.cmd_name, start_time))
+        hedged = {primary: False}
+        done, _ = wait([primary], timeout=delay)
+        if not done and policy.try_hedge(cmd.cmd_name):
+            log.debug("%s | %s | Hedging after %.3fs", cmd.session_id, cmd.cmd_name, delay)
+            client = policy.secondary if policy.secondary is not None else self
+            hedge = executor.submit(contextvars.copy_context().run, client._execute_once, self._request_copy(cmd),
+                                    **kwargs)
+            hedged[hedge] = True
+
+        error = None
+        pending = set(hedged)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    return self._adopt_hedge_winner(cmd, future.result(), hedged[future], start_time)
+                error = error or future.exception()
+        raise error
+
+    async def _aexecute_hedged(self, cmd: LangChainCommand, **kwargs) -> LangChainCommand:
+        policy = self.hedge_policy
+        delay = policy.delay_for(cmd.cmd_name)
+        if delay is None:
+            cmd_result = await self._aexecute_once(cmd, **kwargs)
+            policy.record(cmd.cmd_name, cmd_result.exec_time)
+            return cmd_result
+
+        start_time = time.perf_counter()
+        primary = asyncio.ensure_future(self._aexecute_once(self._request_copy(cmd), **kwargs))
+        primary.add_done_callback(self._primary_recorder(cmd.cmd_name, start_time))
+        hedged = {primary: False}
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if not done and policy.try_hedge(cmd.cmd_name):
+                log.debug("%s | %s | Hedging after %.3fs", cmd.session_id, cmd.cmd_name, delay)
+                client = policy.secondary if policy.secondary is not None else self
+                hedged[asyncio.ensure_future(client._aexecute_once(self._request_copy(cmd), **kwargs))] = True
+
+            error = None
+            pending = set(hedged)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return self._adopt_hedge_winner(cmd, task.result(), hedged[task], start_time)
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in hedged:
+                task.cancel()
+
+    def _primary_recorder(self, cmd_name: str, start_time: float) -> Callable[[Any], None]:
+        # The hedge delay is a percentile of how long calls take when they are not hedged, so the primary request
+        # is recorded whether it wins or loses.  An abandoned primary is recorded when it finishes, and a cancelled
+        # one with how long it had run, which is a lower bound.  Hedges are not recorded.
+        policy = self.hedge_policy
+
+        def record(request) -> None:
+            if request.cancelled() or request.exception() is None:
+                policy.record(cmd_name, time.perf_counter() - start_time)
+
+        return record
+
+    def _adopt_hedge_winner(self,
+                            cmd: LangChainCommand,
+                            winner: LangChainCommand,
+                            hedge: bool,
+                            start_time: float,
+                            ) -> LangChainCommand:
+        if hedge:
+            self.hedge_policy.record_win(cmd.cmd_name)
+        self._adopt_request(cmd, winner)
+        cmd.exec_time = time.perf_counter() - start_time
+        return cmd
+
+    @staticmethod
+    def _adopt_request(cmd: LangChainCommand, request: LangChainCommand) -> None:
+        cmd.result = request.result
+        cmd.model_name = request.model_name
+        cmd.downgraded = request.downgraded
+        for phase, seconds in request.timings.items():
+            _add_timing(cmd.timings, phase, seconds)
+        cmd.prompt_tokens += request.prompt_tokens
+        cmd.completion_tokens += request.completion_tokens
+        cmd.cost += request.cost
+
+    @staticmethod
+    def _request_copy(cmd: LangChainCommand) -> LangChainCommand:
+        # Each request of a hedged or timed call times its phases and counts its tokens apart, and only those of the
+        # request whose result is kept are added to the command.  The usage ledger counts the tokens of every request.
+        hedge_cmd = copy.copy(cmd)
+        hedge_cmd.timings = {}
+        hedge_cmd.prompt_tokens = hedge_cmd.completion_tokens = 0
+        hedge_cmd.cost = 0.0
+        return hedge_cmd
+
+    @staticmethod
+    def _reset_stats(cmd: LangChainCommand) -> None:
+        cmd.timings = {}
+        cmd.attempts = 0
+        cmd.prompt_tokens = cmd.completion_tokens = 0
+        cmd.cost = 0.0
+        cmd.downgraded = False
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self.hedge_policy.max_workers,
+                                                          thread_name_prefix='interacticore-hedge')
+            return self._hedge_executor
+
+    def _get_timeout_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._timeout_executor is None:
+                self._timeout_executor = ThreadPoolExecutor(max_workers=_TIMEOUT_WORKERS,
+                                                            thread_name_prefix='interacticore-timeout')
+            return self._timeout_executor
+
+    def execute_many(self,
+                     cmds: Iterable[LangChainCommand],
+                     *,
+                     max_concurrency: int = 8,
+                     **kwargs,
+                     ) -> list[CommandOutcome]:
+        """
+        Execute commands in parallel on a thread pool.  A failed command does not stop the others.
+        :param cmds: The command instances.
+        :param max_concurrency: The maximum number of commands executing at once.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        :return: The outcome of each command, in the order the commands were given.
+        """
+        return sorted(self.execute_as_completed(cmds, max_concurrency=max_concurrency, **kwargs),
+                      key=lambda outcome: outcome.index)
+
+    def execute_as_completed(self,
+                             cmds: Iterable[LangChainCommand],
+                             *,
+                             max_concurrency: int = 8,
+                             **kwargs,
+                             ) -> Iterator[CommandOutcome]:
+        """
+        Execute commands in parallel on a thread pool, yielding each outcome as soon as its command completes.
+        Commands are taken from `cmds` only as execution slots free up.
+        :param cmds: The command instances.
+        :param max_concurrency: The maximum number of commands executing at once.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        :return: An iterator of outcomes in completion order.
+        """
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1')
+
+        commands = enumerate(cmds)
+        pending: dict[Future, tuple[int, LangChainCommand]] = {}
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            try:
+                while True:
+                    for index, cmd in commands:
+                        pending[executor.submit(self.execute, cmd, **kwargs)] = (index, cmd)
+                        if len(pending) >= max_concurrency:
+                            break
+                    if not pending:
+                        return
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, cmd = pending.pop(future)
+                        error = future.exception()
+                        yield CommandOutcome(index, cmd if error is not None else future.result(), error)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    async def aexecute_many(self,
+                            cmds: Iterable[LangChainCommand],
+                            *,
+                            max_concurrency: int = 8,
+                            **kwargs,
+                            ) -> list[CommandOutcome]:
+        """
+        Execute commands concurrently on the running event loop.  A failed command does not stop the others.
+        :param cmds: The command instances.
+        :param max_concurrency: The maximum number of commands executing at once.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        :return: The outcome of each command, in the order the commands were given.
+        """
+        outcomes = [outcome async for outcome in self.aexecute_as_completed(cmds,
+                                                                            max_concurrency=max_concurrency,
+                                                                            **kwargs)]
+        outcomes.sort(key=lambda outcome: outcome.index)
+        return outcomes
+
+    async def aexecute_as_completed(self,
+                                    cmds: Iterable[LangChainCommand],
+                                    *,
+                                    max_concurrency: int = 8,
+                                    **kwargs,
+                                    ) -> AsyncIterator[CommandOutcome]:
+        """
+        Execute commands concurrently on the running event loop, yielding each outcome as soon as its command
+        completes.  Commands are taken from `cmds` only as execution slots free up.
+        :param cmds: The command instances.
+        :param max_concurrency: The maximum number of commands executing at once.
+        :param kwargs: Additional parameters for underlying models, endpoints, and frameworks.
+        :return: An async iterator of outcomes in completion order.
+        """
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1')
+
+        commands = enumerate(cmds)
+        pending: dict[asyncio.Task, tuple[int, LangChainCommand]] = {}
+        try:
+            while True:
+                for index, cmd in commands:
+                    pending[asyncio.ensure_future(self.aexecute(cmd, **kwargs))] = (index, cmd)
+                    if len(pending) >= max_concurrency:
+                        break
+                if not pending:
+                    return
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, cmd = pending.pop(task)
+                    error = task.exception()
+                    yield CommandOutcome(index, cmd if error is not None else task.result(), error)
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,272 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import bisect
+import copy
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable
+
+PHASES = ('queue', 'prompt', 'model', 'parse', 'backoff', 'total')
+"""The phases of command execution that are timed, in seconds."""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+"""The default upper bounds of histogram buckets, in seconds."""
+
+
+class CommandMetrics:
+    """
+    Timings of one command execution, as delivered to a metrics sink.
+    """
+
+    __slots__ = ('cmd_name', 'model', 'session_id', 'outcome', 'timings', 'attempts', 'error')
+
+    def __init__(self,
+                 cmd_name: str,
+                 model: str | None,
+                 session_id: str,
+                 outcome: str,
+                 timings: dict[str, float],
+                 attempts: int,
+                 error: BaseException | None = None,
+                 ):
+        """
+        Construct a new instance.
+        :param cmd_name: The command name.
+        :param model: The name of the model that served the command, or None if no model was called.
+        :param session_id: The session ID.
+        :param outcome: 'ok', 'error', 'cache_hit' or 'coalesced'.
+        :param timings: The seconds spent in each phase, by phase name.
+        :param attempts: The number of attempts made, including retries.
+        :param error: The exception the command failed with, if it failed.
+        """
+        self.cmd_name: str = cmd_name
+        self.model: str | None = model
+        self.session_id: str = session_id
+        self.outcome: str = outcome
+        self.timings: dict[str, float] = timings
+        self.attempts: int = attempts
+        self.error: BaseException | None = error
+
+    def __str__(self):
+        return (f"CommandMetrics(cmd_name={self.cmd_name}" +
+                f", model={self.model}" +
+                f", outcome={self.outcome}" +
+                f", timings={self.timings}" +
+                f", attempts={self.attempts}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class MetricsSink(ABC):
+    """
+    Receiver of command execution metrics.  Sinks are called on the executing thread, so they must be thread-safe
+    and quick.
+    """
+
+    @abstractmethod
+    def record(self, metrics: CommandMetrics) -> None:
+        """
+        Record the metrics of one command execution.
+        :param metrics: The command metrics.
+        """
+        pass
+
+
+class CallbackMetricsSink(MetricsSink):
+    """
+    Metrics sink that hands every command's metrics to a function, for forwarding to an external metrics system.
+    """
+
+    def __init__(self, callback: Callable[[CommandMetrics], Any]):
+        """
+        Construct a new instance.
+        :param callback: The function called with each command's metrics.
+        """
+        self.callback: Callable[[CommandMetrics], Any] = callback
+
+    def record(self, metrics: CommandMetrics) -> None:
+        self.callback(metrics)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed durations.
+    """
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Construct a new instance.
+        :param buckets: The ascending upper bounds of the buckets, in seconds.
+        """
+        self.buckets: tuple[float, ...] = buckets
+        self.counts: list[int] = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Add an observation.
+        :param value: The duration in seconds.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Estimate a quantile by interpolating within its bucket, as Prometheus does.
+        :param q: The quantile, between 0 and 1.
+        :return: The estimated duration in seconds, or None if nothing was observed.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def __str__(self):
+        return (f"Histogram(count={self.count}" +
+                f", sum={self.sum}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class HistogramMetricsSink(MetricsSink):
+    """
+    Metrics sink that aggregates phase timings into histograms labelled by command name, model and phase, and
+    counts commands by outcome, for in-process monitoring or Prometheus-style scraping.
+    """
+
+    def __init__(self, *, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Construct a new instance.
+        :param buckets: The ascending upper bounds of the histogram buckets, in seconds.
+        """
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        self._histograms: dict[tuple[str, str, str], Histogram] = {}
+        self._commands: dict[tuple[str, str, str], int] = {}
+        self._attempts: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, metrics: CommandMetrics) -> None:
+        model = metrics.model or ''
+        with self._lock:
+            for phase, seconds in metrics.timings.items():
+                key = (metrics.cmd_name, model, phase)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(self.buckets)
+                histogram.observe(seconds)
+            key = (metrics.cmd_name, model, metrics.outcome)
+            self._commands[key] = self._commands.get(key, 0) + 1
+            key = (metrics.cmd_name, model)
+            self._attempts[key] = self._attempts.get(key, 0) + metrics.attempts
+
+    def histogram(self, cmd_name: str, model: str | None, phase: str) -> Histogram | None:
+        """
+        Get a snapshot of the histogram of a phase.
+        :param cmd_name: The command name.
+        :param model: The model name.
+        :param phase: The phase name.
+        :return: The histogram, or None if the phase was never observed.
+        """
+        with self._lock:
+            histogram = self._histograms.get((cmd_name, model or '', phase))
+            return copy.deepcopy(histogram)
+
+    def commands(self, cmd_name: str, model: str | None, outcome: str = 'ok') -> int:
+        """
+        Get the number of commands recorded with an outcome.
+        :param cmd_name: The command name.
+        :param model: The model name.
+        :param outcome: 'ok', 'error', 'cache_hit' or 'coalesced'.
+        :return: The number of commands.
+        """
+        with self._lock:
+            return self._commands.get((cmd_name, model or '', outcome), 0)
+
+    def attempts(self, cmd_name: str, model: str | None) -> int:
+        """
+        Get the number of attempts made, including retries.
+        :param cmd_name: The command name.
+        :param model: The model name.
+        :return: The number of attempts.
+        """
+        with self._lock:
+            return self._attempts.get((cmd_name, model or ''), 0)
+
+    def exposition(self, namespace: str = 'interacticore') -> str:
+        """
+        Render the aggregated metrics in the Prometheus text exposition format.
+        :param namespace: The prefix of the metric names.
+        :return: The exposition text.
+        """
+        with self._lock:
+            histograms = sorted((key, copy.deepcopy(histogram)) for key, histogram in self._histograms.items())
+            commands = sorted(self._commands.items())
+            attempts = sorted(self._attempts.items())
+
+        lines = [f"# HELP {namespace}_phase_seconds Time spent in each phase of command execution.",
+                 f"# TYPE {namespace}_phase_seconds histogram"]
+        for (cmd_name, model, phase), histogram in histograms:
+            labels = f'cmd_name="{_escape(cmd_name)}",model="{_escape(model)}",phase="{_escape(phase)}"'
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                cumulative += count
+                lines.append(f'{namespace}_phase_seconds_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f"{namespace}_phase_seconds_sum{{{labels}}} {histogram.sum!r}")
+            lines.append(f"{namespace}_phase_seconds_count{{{labels}}} {histogram.count}")
+
+        lines += [f"# HELP {namespace}_commands_total Commands executed, by outcome.",
+                  f"# TYPE {namespace}_commands_total counter"]
+        for (cmd_name, model, outcome), count in commands:
+            lines.append(f'{namespace}_commands_total{{cmd_name="{_escape(cmd_name)}",model="{_escape(model)}"'
+                         f',outcome="{_escape(outcome)}"}} {count}')
+
+        lines += [f"# HELP {namespace}_attempts_total Attempts made, including retries.",
+                  f"# TYPE {namespace}_attempts_total counter"]
+        for (cmd_name, model), count in attempts:
+            lines.append(f'{namespace}_attempts_total{{cmd_name="{_escape(cmd_name)}",model="{_escape(model)}"}}'
+                         f' {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
@@ -0,0 +1,265 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import copy
+import random
+import threading
+import time
+from typing import Any
+
+from .ratelimit import RateLimiter
+
+
+class ModelStats:
+    """
+    Recent behaviour of a pooled model.
+    """
+
+    __slots__ = ('weight', 'calls', 'errors', 'in_flight', 'latency', 'error_rate', 'updated')
+
+    def __init__(self, weight: float):
+        """
+        Construct a new instance.
+        :param weight: The routing weight of the model.
+        """
+        self.weight: float = weight
+        self.calls: int = 0
+        self.errors: int = 0
+        self.in_flight: int = 0
+        self.latency: float | None = None
+        self.error_rate: float = 0.0
+        self.updated: float = 0.0
+
+    def __str__(self):
+        return (f"ModelStats(weight={self.weight}" +
+                f", calls={self.calls}" +
+                f", errors={self.errors}" +
+                f", in_flight={self.in_flight}" +
+                f", latency={self.latency}" +
+                f", error_rate={self.error_rate}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class PooledModel:
+    """
+    A model in a ModelPool.
+    """
+
+    __slots__ = ('name', 'model', 'rate_limiter', 'stats')
+
+    def __init__(self, name: str, model, *, weight: float = 1.0, rate_limiter: RateLimiter = None):
+        """
+        Construct a new instance.
+        :param name: The name the model is reported under.
+        :param model: The LangChain chat or llm model.
+        :param weight: The routing weight of the model.
+        :param rate_limiter: The rate limiter of the model, or None to use the client's limiter for the pool.
+        """
+        self.name: str = name
+        self.model = model
+        self.rate_limiter: RateLimiter | None = rate_limiter
+        self.stats: ModelStats = ModelStats(weight)
+
+    def __str__(self):
+        return (f"PooledModel(name={self.name}" +
+                f", stats={self.stats}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class ModelPool:
+    """
+    Pool of equivalent models that a LangChainWrap routes each call across, in place of a single chat or llm model.
+
+    Each model keeps a moving average of its latency and error rate.  A call draws two models at random in proportion
+    to their weights and goes to the one with the lower expected time to a successful response, its latency scaled by
+    its calls in flight and its error rate, so a slow or failing model sheds traffic without being starved of the
+    probes that show it has recovered.  The error rate of an idle model decays by half every `recovery` seconds.  A
+    call that fails or times out fails over to the remaining models, best first.  Lower a model's weight to shift
+    traffic away from it gradually, and set it to zero to drain it.
+    """
+
+    def __init__(self,
+                 models: dict[str, Any],
+                 *,
+                 weights: dict[str, float] = None,
+                 rate_limiters: dict[str, RateLimiter] = None,
+                 decay: float = 0.2,
+                 recovery: float = 30.0,
+                 timeout: float = None,
+                 ):
+        """
+        Construct a new instance.
+        :param models: The LangChain chat or llm models by name.
+        :param weights: The routing weights by model name.  Models without a weight have a weight of 1.
+        :param rate_limiters: Rate limiters by model name.  Models without a limiter use the client's limiter.
+        :param decay: The weight of the newest call in the moving averages, between 0 and 1.
+        :param recovery: The half-life of an idle model's error rate, in seconds.
+        :param timeout: The time a call may take before it fails over to the next model, in seconds, or None to wait
+            indefinitely.  A sync call cannot be interrupted, so it runs on a worker thread and is abandoned to
+            finish when it times out.
+        """
+        if not models:
+            raise ValueError('models must not be empty')
+        if not 0 < decay <= 1:
+            raise ValueError(f"decay must be between 0 and 1: {decay}")
+        weights = weights or {}
+        rate_limiters = rate_limiters or {}
+        unknown = (set(weights) | set(rate_limiters)) - set(models)
+        if unknown:
+            raise ValueError(f"unknown models: {sorted(unknown)}")
+
+        self.members: list[PooledModel] = []
+        for name, model in models.items():
+            weight = weights.get(name, 1.0)
+            if weight < 0:
+                raise ValueError(f"weight must not be negative: {name}={weight}")
+            self.members.append(PooledModel(name, model, weight=weight, rate_limiter=rate_limiters.get(name)))
+        self.decay: float = decay
+        self.recovery: float = recovery
+        self.timeout: float | None = timeout
+        self._by_name: dict[str, PooledModel] = {member.name: member for member in self.members}
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        # The response cache keys a pool's results by its models, so equivalent pools share cached results.
+        return {member.name: getattr(member.model, '_identifying_params', None) for member in self.members}
+
+    def set_weight(self, name: str, weight: float) -> None:
+        """
+        Change the routing weight of a model.
+        :param name: The model name.
+        :param weight: The new weight, or 0 to stop routing calls to the model.
+        """
+        if weight < 0:
+            raise ValueError(f"weight must not be negative: {name}={weight}")
+        with self._lock:
+            self._member(name).stats.weight = weight
+
+    def stats(self) -> dict[str, ModelStats]:
+        """
+        Get a snapshot of the statistics of every model, for monitoring.
+        :return: The statistics by model name.
+        """
+        with self._lock:
+            return {member.name: copy.copy(member.stats) for member in self.members}
+
+    def stats_for(self, name: str) -> ModelStats:
+        """
+        Get a snapshot of the statistics of a model.
+        :param name: The model name.
+        :return: The statistics.
+        """
+        with self._lock:
+            return copy.copy(self._member(name).stats)
+
+    def candidates(self) -> list[PooledModel]:
+        """
+        Get the models to try for a call, in order: the routed model first, then the failover models, best first.
+        :return: The models with a positive weight.
+        """
+        with self._lock:
+            now = time.monotonic()
+            eligible = [member for member in self.members if member.stats.weight > 0]
+            if not eligible:
+                raise RuntimeError('no model in the pool has a positive weight')
+            known = [member.stats.latency for member in eligible if member.stats.latency is not None]
+            default_latency = sum(known) / len(known) if known else 1.0
+            scores = {member.name: self._score(member.stats, default_latency, now) for member in eligible}
+            first = eligible[0]
+            if len(eligible) > 1:
+                weights = [member.stats.weight for member in eligible]
+                a, b = self._random.choices(eligible, weights=weights, k=2)
+                first = a if scores[a.name] <= scores[b.name] else b
+        rest = sorted((member for member in eligible if member is not first), key=lambda member: scores[member.name])
+        return [first] + rest
+
+    def acquire(self, member: PooledModel) -> float:
+        """
+        Count a call in flight on a model.
+        :param member: The model.
+        :return: The start time of the call, to pass to release.
+        """
+        with self._lock:
+            member.stats.in_flight += 1
+        return time.monotonic()
+
+    def release(self, member: PooledModel, start_time: float, failed: bool | None) -> None:
+        """
+        Record the end of a call on a model.
+        :param member: The model.
+        :param start_time: The start time returned by acquire.
+        :param failed: Whether the call failed, or None if its outcome says nothing about the model, such as a
+            cancelled call or a fatal error in the command.
+        """
+        now = time.monotonic()
+        with self._lock:
+            stats = member.stats
+            stats.in_flight -= 1
+            if failed is None:
+                return
+            stats.calls += 1
+            stats.error_rate = self._error_rate(stats, now)
+            if failed:
+                stats.errors += 1
+                stats.error_rate += self.decay * (1.0 - stats.error_rate)
+            else:
+                latency = now - start_time
+                if stats.latency is None:
+                    stats.latency = latency
+                else:
+                    stats.latency += self.decay * (latency - stats.latency)
+                stats.error_rate -= self.decay * stats.error_rate
+            stats.updated = now
+
+    def _error_rate(self, stats: ModelStats, now: float) -> float:
+        if not stats.error_rate or self.recovery <= 0:
+            return stats.error_rate
+        return stats.error_rate * 0.5 ** ((now - stats.updated) / self.recovery)
+
+    def _score(self, stats: ModelStats, default_latency: float, now: float) -> float:
+        # The expected time to a successful response: untried models score zero so that they are explored.
+        if stats.calls == 0 and stats.in_flight == 0:
+            return 0.0
+        latency = stats.latency if stats.latency is not None else default_latency
+        return latency * (1 + stats.in_flight) / max(1e-3, 1.0 - self._error_rate(stats, now))
+
+    def _member(self, name: str) -> PooledModel:
+        member = self._by_name.get(name)
+        if member is None:
+            raise KeyError(name)
+        return member
+
+    def __str__(self):
+        return (f"ModelPool(members={self.members}" +
+                f", timeout={self.timeout}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
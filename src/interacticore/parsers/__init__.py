@@ -20,4 +20,46 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from .brokenjsonparser import BrokenJsonOutputParser
+"""
+Public names are loaded on first access; only `BrokenJsonOutputParser` imports langchain_core.
+"""
+import importlib
+from typing import Any
+
+_LAZY = {
+    'BrokenJsonOutputParser': '.brokenjsonparser',
+    'get_json_backend': '.jsonbackend',
+    'set_json_backend': '.jsonbackend',
+    'JsonElementEvent': '.jsonevents',
+    'FrozenDict': '.parsecache',
+    'FrozenList': '.parsecache',
+    'ParseCache': '.parsecache',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module(module, __name__), name)
+    elif not name.startswith('_'):
+        value = _import_submodule(__name__ + '.' + name, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def _import_submodule(module: str, name: str) -> Any:
+    # Submodules stay reachable as attributes of the package, as they were when it imported them eagerly.
+    try:
+        return importlib.import_module(module)
+    except ModuleNotFoundError as e:
+        if e.name != module:
+            raise
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,88 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from itertools import islice
+from typing import Any
+
+from .jsonevents import escape_pointer_token
+
+
+def make_append_only_patch(prev: Any, next: Any) -> list[dict] | None:
+    """
+    Build the RFC 6902 JSON Patch from one partial parse of a streamed JSON document to the next.
+
+    While a document is streamed, every member of a container except the last one is complete, so between two
+    parses only the last member of each container can change, and new members can only follow it.  The last path is
+    patched: a grown string or changed scalar becomes a "replace", and each new member an "add".  A repeated object
+    key is the one exception, as it replaces the value of an earlier member in place, so parses of a document that
+    repeats a key between them must not be patched this way; `PartialJsonMarkdownStream` marks them as not
+    incremental.
+    :param prev: The previous parse, or None.
+    :param next: The current parse.
+    :return: The patch operations, empty if nothing changed, or None if next does not extend prev.
+    """
+    if prev is None:
+        return [{'op': 'replace', 'path': '', 'value': next}]
+    ops = []
+    if not _extend(prev, next, '', ops):
+        return None
+    return ops
+
+
+def _extend(prev: Any, curr: Any, pointer: str, ops: list[dict]) -> bool:
+    kind = type(curr)
+    if type(prev) is not kind:
+        ops.append({'op': 'replace', 'path': pointer, 'value': curr})
+        return True
+
+    if kind is dict:
+        count = len(prev)
+        added = len(curr) - count
+        if added < 0:
+            return False
+        if count:
+            # The members from the previous last one onward, read from the end of the dict.
+            tail = list(islice(reversed(curr.items()), added + 1))
+            key, value = tail.pop()
+            prev_key, prev_value = next(reversed(prev.items()))
+            if key != prev_key or not _extend(prev_value, value, pointer + '/' + escape_pointer_token(key), ops):
+                return False
+            tail.reverse()
+        else:
+            tail = curr.items()
+        for key, value in tail:
+            ops.append({'op': 'add', 'path': pointer + '/' + escape_pointer_token(key), 'value': value})
+        return True
+
+    if kind is list:
+        count = len(prev)
+        if len(curr) < count:
+            return False
+        if count and not _extend(prev[-1], curr[count - 1], f"{pointer}/{count - 1}", ops):
+            return False
+        for index in range(count, len(curr)):
+            ops.append({'op': 'add', 'path': f"{pointer}/{index}", 'value': curr[index]})
+        return True
+
+    if prev != curr:
+        ops.append({'op': 'replace', 'path': pointer, 'value': curr})
+    return True
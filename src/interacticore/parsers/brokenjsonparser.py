@@ -2,18 +2,27 @@
 # MIT License
 from __future__ import annotations
 
+import codecs
 import json
 import re
+from functools import partial
 from json import JSONDecodeError
-from typing import Any, Callable, List, Optional, Type
-
-import jsonpatch  # type: ignore[import]
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Type, Union
 
 from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import BaseMessage, BaseMessageChunk
 from langchain_core.output_parsers.format_instructions import JSON_FORMAT_INSTRUCTIONS
 from langchain_core.output_parsers.transform import BaseCumulativeTransformOutputParser
-from langchain_core.outputs import Generation
-from langchain_core.pydantic_v1 import BaseModel
+from langchain_core.outputs import ChatGenerationChunk, Generation, GenerationChunk
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.runnables import RunnableConfig
+
+from . import jsonbackend
+from .appendonlypatch import make_append_only_patch
+from .compiledschema import CompiledSchema, compile_schema
+from .jsonevents import JsonElementTracker
+from .parsecache import ParseCache
+from .partialjsonscanner import PartialJsonScanner
 
 
 def _replace_new_line(match: re.Match[str]) -> str:
@@ -76,119 +85,199 @@ def fix_remove_output_header(multiline_string: str) -> str:
     return new_str
 
 
+def _markdown_bounds(json_string: str) -> tuple[int, int]:
+    """
+    Locate the JSON content of a Markdown string without copying it.
+    :param json_string: The Markdown string.
+    :return: The start and end offsets of the content.
+    """
+    # Find the content after the opening triple backticks, if any.
+    start = json_string.find("```")
+    if start == -1:
+        start = 0
+    else:
+        start += 3
+        if json_string.startswith("json", start):
+            start += 4
+
+    # Skip whitespace and newlines, then backticks, at the start and end.
+    end = len(json_string)
+    while start < end and json_string[start].isspace():
+        start += 1
+    while start < end and json_string[start] == "`":
+        start += 1
+    while end > start and json_string[end - 1].isspace():
+        end -= 1
+    while end > start and json_string[end - 1] == "`":
+        end -= 1
+
+    return start, end
+
+
+_BUFFER_TYPES = (bytes, bytearray, memoryview)
+_FENCE_BYTES = re.compile(rb"```")
+# The ASCII characters for which str.isspace() is true.
+_ASCII_WHITESPACE = frozenset(b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f")
+
+
+def _as_byte_view(buffer: Union[bytes, bytearray, memoryview]) -> memoryview:
+    view = memoryview(buffer)
+    if view.ndim != 1 or view.itemsize != 1:
+        view = view.cast("B")
+    return view
+
+
+def _markdown_bounds_buffer(buffer: memoryview) -> Optional[tuple[int, int]]:
+    """
+    Locate the JSON content of a UTF-8 encoded Markdown buffer without decoding it.
+    :param buffer: The Markdown buffer.
+    :return: The start and end byte offsets of the content, or None if the content starts or ends with a
+        non-ASCII character, which may be whitespace that `_markdown_bounds` would skip.
+    """
+    match = _FENCE_BYTES.search(buffer)
+    if match is None:
+        start = 0
+    else:
+        start = match.end()
+        if buffer[start:start + 4] == b"json":
+            start += 4
+
+    end = len(buffer)
+    while start < end and buffer[start] in _ASCII_WHITESPACE:
+        start += 1
+    while start < end and buffer[start] == 0x60:
+        start += 1
+    while end > start and buffer[end - 1] in _ASCII_WHITESPACE:
+        end -= 1
+    while end > start and buffer[end - 1] == 0x60:
+        end -= 1
+
+    if start < end and (buffer[start] >= 0x80 or buffer[end - 1] >= 0x80):
+        return None
+    return start, end
+
+
+def _header_offset(s: str, start: int, end: int) -> int:
+    """
+    Skip leading natural language ahead of the JSON response structure.
+    :param s: The input string.
+    :param start: The start offset of the content.
+    :param end: The end offset of the content.
+    :return: The offset of the opening brace, or start if the content is an array or has no opening brace.
+    """
+    first = start
+    while first < end and s[first].isspace():
+        first += 1
+    if first < end and s[first] != "[":
+        brace = s.find("{", first, end)
+        if brace != -1:
+            return brace
+    return start
+
+
+def _parse_partial_json_range(s: str, start: int, end: int, *, strict: bool = False, as_is: bool = True) -> Any:
+    # Attempt to parse the string as-is, since most responses are already valid JSON.
+    text = s if start == 0 and end == len(s) else s[start:end]
+    if as_is:
+        try:
+            return jsonbackend.loads(text, strict=strict)
+        except json.JSONDecodeError:
+            pass
+
+    # jrandall - Fix response phrase before JSON issue in some model responses.
+    offset = _header_offset(s, start, end)
+    if offset != start:
+        try:
+            return jsonbackend.loads(s[offset:end], strict=strict)
+        except json.JSONDecodeError:
+            pass
+
+    # Scan once, normalizing quotes and control characters and recording every point at
+    # which the text can be closed up into a valid document.
+    scanner = PartialJsonScanner(strict=strict)
+    scanner.feed(s, offset, end)
+
+    # Mismatched closing character; the input is malformed.
+    if scanner.mismatched:
+        return None
+
+    repaired = scanner.repaired()
+    if repaired is not None:
+        try:
+            return jsonbackend.loads(repaired, strict=strict)
+        except json.JSONDecodeError:
+            pass
+
+    # If we got here, no prefix of the string could be repaired into a JSON document,
+    # so return the parse error for the original string.
+    return json.loads(text, strict=strict)
+
+
 # Adapted from https://github.com/KillianLucas/open-interpreter/blob/5b6080fae1f8c68938a1e4fa8667e3744084ee21/interpreter/utils/parse_partial_json.py
 # MIT License
-def parse_partial_json(s: str, *, strict: bool = False) -> Any:
+def parse_partial_json(s: Union[str, bytes, bytearray, memoryview], *, strict: bool = False) -> Any:
     """Parse a JSON string that may be missing closing braces.
 
     Args:
-        s: The JSON string to parse.
+        s: The JSON string to parse, or its UTF-8 encoding as a bytes-like object.
         strict: Whether to use strict parsing. Defaults to False.
 
     Returns:
         The parsed JSON object as a Python dictionary.
     """
-    # jrandall - Fix response phrase before JSON issue in some model responses.
-    s = fix_remove_output_header(s)
-    # jrandall - Fix single-quote JSON issue in some model responses.
-    s = fix_single_quote_strings(s)
+    if isinstance(s, _BUFFER_TYPES):
+        return _parse_partial_json_buffer(_as_byte_view(s), strict=strict)
+    return _parse_partial_json_range(s, 0, len(s), strict=strict)
 
-    # Attempt to parse the string as-is.
+
+def _parse_partial_json_buffer(buffer: memoryview, *, strict: bool = False) -> Any:
+    # Valid documents are decoded straight from the buffer, and only documents that need repair are decoded
+    # to text for the scanner.
     try:
-        return json.loads(s, strict=strict)
+        return jsonbackend.loads(buffer, strict=strict)
     except json.JSONDecodeError:
         pass
-
-    # Initialize variables.
-    new_s = ""
-    stack = []
-    is_inside_string = False
-    escaped = False
-
-    # Process each character in the string one at a time.
-    for char in s:
-        if is_inside_string:
-            if char == '"' and not escaped:
-                is_inside_string = False
-            elif char == "\n" and not escaped:
-                char = "\\n"  # Replace the newline character with the escape sequence.
-            elif char == "\\":
-                escaped = not escaped
-            else:
-                escaped = False
-        else:
-            if char == '"':
-                is_inside_string = True
-                escaped = False
-            elif char == "{":
-                stack.append("}")
-            elif char == "[":
-                stack.append("]")
-            elif char == "}" or char == "]":
-                if stack and stack[-1] == char:
-                    stack.pop()
-                else:
-                    # Mismatched closing character; the input is malformed.
-                    return None
-
-        # Append the processed character to the new string.
-        new_s += char
-
-    # If we're still inside a string at the end of processing,
-    # we need to close the string.
-    if is_inside_string:
-        new_s += '"'
-
-    # Try to parse mods of string until we succeed or run out of characters.
-    while new_s:
-        final_s = new_s
-
-        # Close any remaining open structures in the reverse
-        # order that they were opened.
-        for closing_char in reversed(stack):
-            final_s += closing_char
-
-        # Attempt to parse the modified string as JSON.
-        try:
-            return json.loads(final_s, strict=strict)
-        except json.JSONDecodeError:
-            # If we still can't parse the string as JSON,
-            # try removing the last character
-            new_s = new_s[:-1]
-
-    # If we got here, we ran out of characters to remove
-    # and still couldn't parse the string as JSON, so return the parse error
-    # for the original string.
-    return json.loads(s, strict=strict)
+    text = str(buffer, "utf-8")
+    return _parse_partial_json_range(text, 0, len(text), strict=strict, as_is=False)
 
 
 def parse_json_markdown(
-    json_string: str, *, parser: Callable[[str], Any] = parse_partial_json
+    json_string: Union[str, bytes, bytearray, memoryview],
+    *,
+    parser: Callable[[str], Any] = parse_partial_json,
+    cache: Optional[ParseCache] = None,
 ) -> dict:
     """
     Parse a JSON string from a Markdown string.
 
     Args:
-        json_string: The Markdown string.
+        json_string: The Markdown string, or its UTF-8 encoding as a bytes-like object.
+        parser: The function that parses the JSON content.
+        cache: An optional cache of results by raw text. Cached results are read-only.
 
     Returns:
         The parsed JSON object as a Python dictionary.
     """
-    # Try to find JSON string within triple backticks
-    match = re.search(r"```(json)?(.*)", json_string, re.DOTALL)
+    if cache is not None:
+        return cache.get_or_parse(json_string, lambda text: parse_json_markdown(text, parser=parser), namespace=parser)
 
-    # If no match found, assume the entire string is a JSON string
-    if match is None:
-        json_str = json_string
-    else:
-        # If match found, use the content within the backticks
-        json_str = match.group(2)
+    if isinstance(json_string, _BUFFER_TYPES):
+        buffer = _as_byte_view(json_string)
+        if parser is parse_partial_json:
+            bounds = _markdown_bounds_buffer(buffer)
+            if bounds is not None:
+                return _parse_partial_json_buffer(buffer[bounds[0]:bounds[1]])
+        json_string = str(buffer, "utf-8")
+
+    # Locate the content within triple backticks, or assume the entire string is a JSON string.
+    start, end = _markdown_bounds(json_string)
 
-    # Strip whitespace and newlines from the start and end
-    json_str = json_str.strip().strip("`")
+    if parser is parse_partial_json:
+        # Fence extraction, header stripping, quote fixing and escaping all happen in a single scan.
+        return _parse_partial_json_range(json_string, start, end)
 
     # handle newlines and other special characters inside the returned value
-    json_str = _custom_parser(json_str)
+    json_str = _custom_parser(json_string[start:end])
 
     # Parse the JSON string into a Python dictionary
     parsed = parser(json_str)
@@ -196,6 +285,181 @@ def parse_json_markdown(
     return parsed
 
 
+def _scan_json_markdown(json_string: str) -> PartialJsonScanner:
+    """
+    Locate the JSON content of a Markdown string and scan it.
+    :param json_string: The Markdown string.
+    :return: The scanner that has consumed the JSON content.
+    """
+    start, end = _markdown_bounds(json_string)
+    scanner = PartialJsonScanner()
+    scanner.feed(json_string, _header_offset(json_string, start, end), end)
+    return scanner
+
+
+class PartialJsonMarkdownStream:
+    """
+    Incremental equivalent of `parse_json_markdown` over a text that grows one chunk at a time.
+
+    Until the start of the JSON document is known, the accumulated text is parsed with `parse_json_markdown`.  Once
+    the opening bracket behind any fence and header has been located, only the new text of each chunk is fed through
+    a `PartialJsonScanner`, so the scanning work over a whole stream is linear in its length.  If an unfenced stream
+    later contains a fence, which moves the start of the content, the stream reverts to parsing the accumulated text
+    so the results stay identical.
+    """
+
+    def __init__(self):
+        """
+        Construct a new instance.
+        """
+        self._chunks: list[str] = []
+        self._scanner: PartialJsonScanner | None = None
+        self._held: str = ''
+        self._tail: str = ''
+        self._fenced: bool = False
+        self._cumulative: bool = False
+        self._decoder: codecs.IncrementalDecoder | None = None
+        # Whether the last parse came from the scanner with no object key repeated since the previous parse, in
+        # which case it extends the previous parse.
+        self.incremental: bool = False
+        # Whether an object key was repeated since the previous committed parse, replacing an earlier member.
+        self.rewritten: bool = False
+        self._parsed_repeats: int = 0
+        self._committed_repeats: int = 0
+
+    def text(self) -> str:
+        """
+        Get the text received so far.
+        :return: The accumulated text.
+        """
+        if len(self._chunks) > 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0] if self._chunks else ''
+
+    def feed(self, text: Union[str, bytes, bytearray, memoryview]) -> None:
+        """
+        Consume the next chunk of text.
+        :param text: The text chunk, or the next part of its UTF-8 encoding as a bytes-like object.
+        """
+        if not isinstance(text, str):
+            # A multibyte character split across chunks is held back by the decoder until it is complete.
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder("utf-8")()
+            text = self._decoder.decode(text)
+        self._chunks.append(text)
+        if self._cumulative:
+            return
+
+        if self._scanner is None:
+            self._anchor()
+            return
+
+        if not self._fenced:
+            window = self._tail + text
+            if '```' in window:
+                self._cumulative = True
+                return
+            self._tail = window[-2:]
+        self._feed_scanner(text)
+
+    def parse(self) -> Any:
+        """
+        Parse the text received so far.
+        :return: The same result `parse_json_markdown` gives for the accumulated text.
+        """
+        self.incremental = False
+        if self._scanner is None or self._cumulative:
+            return parse_json_markdown(self.text().strip())
+
+        if self._scanner.mismatched:
+            return None
+
+        repaired = self._scanner.repaired()
+        if repaired is not None:
+            try:
+                parsed = jsonbackend.loads(repaired, strict=False)
+            except JSONDecodeError:
+                pass
+            else:
+                # A repeated key changes an earlier member, so the parse does not extend the previous one.
+                repeats = self._scanner.repeated_keys
+                self.incremental = repeats == self._parsed_repeats and not self._scanner.repeated_key_open
+                self._parsed_repeats = repeats
+                return parsed
+
+        return parse_json_markdown(self.text().strip())
+
+    def committed(self) -> tuple[Any, int] | None:
+        """
+        Parse the text received so far, cut after the last complete value, so that any string, number or literal
+        still being received is left out.  While an open object repeats a key, the member being received is not
+        the last one of that object, so no parse is made until the object closes.  `rewritten` tells whether a
+        repeated key has replaced an earlier member since the previous committed parse.
+        :return: The parsed document and the number of containers still open in it, or None if no value has
+            completed yet.
+        """
+        if self._scanner is None or self._cumulative:
+            scanner = _scan_json_markdown(self.text().strip())
+        else:
+            scanner = self._scanner
+        committed = None if scanner.repeated_key_open else scanner.committed()
+        if committed is None:
+            return None
+
+        text, open_depth = committed
+        parsed = jsonbackend.loads(text, strict=False)
+        repeats = scanner.repeated_keys
+        self.rewritten = repeats != self._committed_repeats
+        self._committed_repeats = repeats
+        return parsed, open_depth
+
+    def _anchor(self) -> None:
+        text = self.text()
+        length = len(text)
+
+        start = text.find("```")
+        fenced = start != -1
+        if not fenced:
+            start = 0
+        else:
+            label = text[start + 3:start + 7]
+            if len(label) < 4 and "json".startswith(label):
+                # The fence label is incomplete, so the start of the fenced content can still move.
+                return
+            start += 7 if label == "json" else 3
+
+        while start < length and text[start].isspace():
+            start += 1
+        while start < length and text[start] == "`":
+            start += 1
+        if start == length:
+            return
+
+        first = text[start]
+        if first == '"':
+            # A top-level string may contain braces of its own, so leave it to the cumulative path.
+            self._cumulative = True
+            return
+
+        offset = _header_offset(text, start, length)
+        if offset == start and first != "[" and first != "{":
+            return
+
+        self._scanner = PartialJsonScanner()
+        self._fenced = fenced
+        self._tail = text[-2:]
+        self._feed_scanner(text[offset:])
+
+    def _feed_scanner(self, text: str) -> None:
+        # Trailing whitespace and backticks are stripped before parsing, so they are held back until
+        # more text arrives behind them.
+        text = self._held + text
+        keep = len(text.rstrip().rstrip("`"))
+        self._held = text[keep:]
+        if keep:
+            self._scanner.feed(text, 0, keep)
+
+
 def parse_and_check_json_markdown(text: str, expected_keys: List[str]) -> dict:
     """
     Parse a JSON string from a Markdown string and check that it
@@ -212,15 +476,24 @@ def parse_and_check_json_markdown(text: str, expected_keys: List[str]) -> dict:
         json_obj = parse_json_markdown(text)
     except json.JSONDecodeError as e:
         raise OutputParserException(f"Got invalid JSON object. Error: {e}")
-    for key in expected_keys:
-        if key not in json_obj:
-            raise OutputParserException(
-                f"Got invalid return object. Expected key `{key}` "
-                f"to be present, but got {json_obj}"
-            )
+    compile_schema(expected_keys=tuple(expected_keys)).check_keys(json_obj)
     return json_obj
 
 
+def _until(input: Iterator[Any], finished: list[bool]) -> Iterator[Any]:
+    for chunk in input:
+        yield chunk
+        if finished:
+            return
+
+
+async def _auntil(input: AsyncIterator[Any], finished: list[bool]) -> AsyncIterator[Any]:
+    async for chunk in input:
+        yield chunk
+        if finished:
+            return
+
+
 class BrokenJsonOutputParser(BaseCumulativeTransformOutputParser[Any]):
     """Parse the output of an LLM call to a JSON object.
 
@@ -229,11 +502,43 @@ class BrokenJsonOutputParser(BaseCumulativeTransformOutputParser[Any]):
 
     In streaming, if `diff` is set to `True`, yields JSONPatch operations
     describing the difference between the previous and the current object.
+
+    In streaming, if `element_events` is set to `True`, yields a `JsonElementEvent`
+    with the path and value of each array element or object member as soon as it
+    has been fully received, instead of partial objects.
+
+    The schema given by `pydantic_object` and `expected_keys` is compiled once and
+    shared by every parser that uses it.  Complete parses are checked for
+    `expected_keys`, and coerced into `pydantic_object` if `validate_output` is set.
+    In streaming, if `early_stop` is set, the stream stops as soon as every required
+    key has been fully received.
     """
 
     pydantic_object: Optional[Type[BaseModel]] = None
 
+    expected_keys: Optional[List[str]] = None
+    """Keys a complete parse must contain."""
+
+    validate_output: bool = False
+    """Validate complete parses against `pydantic_object` and return instances of it."""
+
+    early_stop: bool = False
+    """Stop streaming once the required keys of `pydantic_object` and `expected_keys` are complete."""
+
+    cache: Optional[ParseCache] = Field(default=None, exclude=True)
+    """Opt-in cache of complete parse results by raw text. Cached results are read-only. Not part of `dict()`,
+    since it does not change what the parser returns."""
+
+    element_events: bool = False
+    """Stream a `JsonElementEvent` for each completed array element or object member. Takes precedence over `diff`."""
+
+    class Config:
+        arbitrary_types_allowed = True
+
     def _diff(self, prev: Optional[Any], next: Any) -> Any:
+        # Imported here so jsonpatch is only loaded by parsers streaming diffs.
+        import jsonpatch  # type: ignore[import]
+
         return jsonpatch.make_patch(prev, next).patch
 
     def parse_result(self, result: List[Generation], *, partial: bool = False) -> Any:
@@ -245,15 +550,210 @@ class BrokenJsonOutputParser(BaseCumulativeTransformOutputParser[Any]):
             except JSONDecodeError:
                 return None
         else:
-            try:
-                return parse_json_markdown(text)
-            except JSONDecodeError as e:
-                msg = f"Invalid json output: {text}"
-                raise OutputParserException(msg, llm_output=text) from e
+            return self._parse_complete(text)
 
-    def parse(self, text: str) -> Any:
+    def parse(self, text: Union[str, bytes, bytearray, memoryview]) -> Any:
+        if isinstance(text, _BUFFER_TYPES):
+            return self._parse_complete(text)
         return self.parse_result([Generation(text=text)])
 
+    def _parse_complete(self, text: Union[str, bytes, bytearray, memoryview]) -> Any:
+        try:
+            parsed = parse_json_markdown(text, cache=self.cache)
+        except (JSONDecodeError, UnicodeDecodeError) as e:
+            if not isinstance(text, str):
+                text = str(text, "utf-8", "replace").strip()
+            msg = f"Invalid json output: {text}"
+            raise OutputParserException(msg, llm_output=text) from e
+
+        schema = self._schema()
+        if schema is None:
+            return parsed
+        return schema.validate(parsed, coerce=self.validate_output)
+
+    def _schema(self) -> Optional[CompiledSchema]:
+        if self.pydantic_object is None and not self.expected_keys:
+            return None
+        return compile_schema(self.pydantic_object, tuple(self.expected_keys or ()))
+
+    def transform(self,
+                  input: Iterator[Union[str, BaseMessage]],
+                  config: Optional[RunnableConfig] = None,
+                  **kwargs: Any,
+                  ) -> Iterator[Any]:
+        if not self.early_stop:
+            yield from super().transform(input, config, **kwargs)
+            return
+        # The input is read for tracing after the transform returns, so it is cut off where the transform stopped.
+        finished: list[bool] = []
+        yield from self._transform_stream_with_config(
+            _until(input, finished), partial(self._transform, finished=finished), config, run_type="parser"
+        )
+
+    async def atransform(self,
+                         input: AsyncIterator[Union[str, BaseMessage]],
+                         config: Optional[RunnableConfig] = None,
+                         **kwargs: Any,
+                         ) -> AsyncIterator[Any]:
+        if not self.early_stop:
+            async for output in super().atransform(input, config, **kwargs):
+                yield output
+            return
+        finished: list[bool] = []
+        async for output in self._atransform_stream_with_config(
+            _auntil(input, finished), partial(self._atransform, finished=finished), config, run_type="parser"
+        ):
+            yield output
+
+    def _transform(self,
+                   input: Iterator[Union[str, BaseMessage]],
+                   *,
+                   finished: Optional[list[bool]] = None,
+                   ) -> Iterator[Any]:
+        prev_parsed = None
+        stream = PartialJsonMarkdownStream()
+        schema = self._schema() if self.early_stop else None
+        if self.element_events:
+            tracker = JsonElementTracker()
+            for chunk in input:
+                self._feed(stream, chunk)
+                committed = self._committed(stream)
+                if committed is not None:
+                    yield from tracker.update(*committed, rewritten=stream.rewritten)
+                    if schema is not None and schema.is_complete(*committed):
+                        self._finish(finished)
+                        return
+            return
+
+        prev_incremental = False
+        for chunk in input:
+            self._feed(stream, chunk)
+            if schema is not None:
+                committed = self._committed(stream)
+                if committed is not None and schema.is_complete(*committed):
+                    output = self._stream_output(prev_parsed, committed[0], False)
+                    if output is not None:
+                        yield output
+                    self._finish(finished)
+                    return
+            parsed = self._parse_stream(stream)
+            append_only = prev_incremental and stream.incremental
+            output = self._stream_output(prev_parsed, parsed, append_only)
+            if output is not None:
+                yield output
+                prev_parsed = parsed
+                prev_incremental = stream.incremental
+            else:
+                # A parse in between that was not incremental, e.g. over a repeated key, breaks the chain.
+                prev_incremental = append_only
+
+    async def _atransform(self,
+                          input: AsyncIterator[Union[str, BaseMessage]],
+                          *,
+                          finished: Optional[list[bool]] = None,
+                          ) -> AsyncIterator[Any]:
+        prev_parsed = None
+        stream = PartialJsonMarkdownStream()
+        schema = self._schema() if self.early_stop else None
+        if self.element_events:
+            tracker = JsonElementTracker()
+            async for chunk in input:
+                self._feed(stream, chunk)
+                committed = self._committed(stream)
+                if committed is not None:
+                    for event in tracker.update(*committed, rewritten=stream.rewritten):
+                        yield event
+                    if schema is not None and schema.is_complete(*committed):
+                        self._finish(finished)
+                        return
+            return
+
+        prev_incremental = False
+        async for chunk in input:
+            self._feed(stream, chunk)
+            if schema is not None:
+                committed = self._committed(stream)
+                if committed is not None and schema.is_complete(*committed):
+                    output = self._stream_output(prev_parsed, committed[0], False)
+                    if output is not None:
+                        yield output
+                    self._finish(finished)
+                    return
+            parsed = self._parse_stream(stream)
+            append_only = prev_incremental and stream.incremental
+            output = self._stream_output(prev_parsed, parsed, append_only)
+            if output is not None:
+                yield output
+                prev_parsed = parsed
+                prev_incremental = stream.incremental
+            else:
+                # A parse in between that was not incremental, e.g. over a repeated key, breaks the chain.
+                prev_incremental = append_only
+
+    @classmethod
+    def _feed(cls,
+              stream: PartialJsonMarkdownStream,
+              chunk: Union[str, bytes, bytearray, memoryview, BaseMessage],
+              ) -> None:
+        try:
+            stream.feed(cls._chunk_text(chunk))
+        except UnicodeDecodeError as e:
+            msg = f"Invalid UTF-8 in streamed output: {e}"
+            raise OutputParserException(msg, llm_output=str(e.object, "utf-8", "replace")) from e
+
+    @staticmethod
+    def _chunk_text(chunk: Union[str, bytes, bytearray, memoryview, BaseMessage],
+                    ) -> Union[str, bytes, bytearray, memoryview]:
+        if isinstance(chunk, _BUFFER_TYPES):
+            return chunk
+        elif isinstance(chunk, BaseMessageChunk):
+            return ChatGenerationChunk(message=chunk).text
+        elif isinstance(chunk, BaseMessage):
+            return ChatGenerationChunk(message=BaseMessageChunk(**chunk.dict())).text
+        else:
+            return GenerationChunk(text=chunk).text
+
+    @staticmethod
+    def _parse_stream(stream: PartialJsonMarkdownStream) -> Any:
+        try:
+            return stream.parse()
+        except JSONDecodeError:
+            return None
+
+    def _stream_output(self, prev_parsed: Any, parsed: Any, append_only: bool) -> Any:
+        """
+        Get what to yield for a new partial parse of the stream.
+        :param prev_parsed: The last parse that was yielded.
+        :param parsed: The new parse.
+        :param append_only: Whether both parses came from the incremental scanner, so the new one extends the last.
+        :return: The parse or JSON Patch to yield, or None if nothing changed.
+        """
+        if parsed is None:
+            return None
+        if append_only:
+            # Only the last path through the document can have changed, so the patch is built from that path
+            # instead of comparing and diffing both documents in full.
+            patch = make_append_only_patch(prev_parsed, parsed)
+            if patch is not None:
+                if not patch:
+                    return None
+                return patch if self.diff else parsed
+        if parsed == prev_parsed:
+            return None
+        return self._diff(prev_parsed, parsed) if self.diff else parsed
+
+    @staticmethod
+    def _finish(finished: Optional[list[bool]]) -> None:
+        if finished is not None:
+            finished.append(True)
+
+    @staticmethod
+    def _committed(stream: PartialJsonMarkdownStream) -> tuple[Any, int] | None:
+        try:
+            return stream.committed()
+        except JSONDecodeError:
+            return None
+
     def get_format_instructions(self) -> str:
         if self.pydantic_object is None:
             return "Return a JSON object."
@@ -0,0 +1,107 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from functools import lru_cache
+from typing import Any, Optional, Type
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.pydantic_v1 import BaseModel, ValidationError
+
+
+class CompiledSchema:
+    """
+    Validation plan for a parser's pydantic model and expected keys, built once per schema by `compile_schema`.
+    """
+
+    __slots__ = ('model', 'expected_keys', 'required_keys', '_expected', '_required')
+
+    def __init__(self, model: Optional[Type[BaseModel]], expected_keys: tuple[str, ...]):
+        """
+        Construct a new instance.
+        :param model: The pydantic model, if any.
+        :param expected_keys: The keys the parsed object must contain.
+        """
+        self.model: Optional[Type[BaseModel]] = model
+        self.expected_keys: tuple[str, ...] = expected_keys
+        required = dict.fromkeys(expected_keys)
+        if model is not None:
+            # The model is rendered into the format instructions by alias, so the model output uses the aliases.
+            required.update(dict.fromkeys(field.alias for field in model.__fields__.values() if field.required))
+        self.required_keys: tuple[str, ...] = tuple(required)
+        self._expected: frozenset[str] = frozenset(expected_keys)
+        self._required: frozenset[str] = frozenset(required)
+
+    def check_keys(self, value: Any) -> None:
+        """
+        Check that a parsed object contains the expected keys.
+        :param value: The parsed object.
+        """
+        if isinstance(value, dict):
+            if self._expected.issubset(value.keys()):
+                return
+        for key in self.expected_keys:
+            if key not in value:
+                raise OutputParserException(
+                    f"Got invalid return object. Expected key `{key}` "
+                    f"to be present, but got {value}"
+                )
+
+    def validate(self, value: Any, *, coerce: bool = False) -> Any:
+        """
+        Validate a complete parsed object.
+        :param value: The parsed object.
+        :param coerce: Whether to return an instance of the model instead of the parsed object.
+        :return: The model instance if coercing into a model, otherwise the parsed object.
+        """
+        self.check_keys(value)
+        if not coerce or self.model is None:
+            return value
+        try:
+            return self.model.parse_obj(value)
+        except ValidationError as e:
+            msg = f"Failed to parse {self.model.__name__} from completion {value}. Got: {e}"
+            raise OutputParserException(msg, llm_output=str(value)) from e
+
+    def is_complete(self, value: Any, open_depth: int) -> bool:
+        """
+        Check whether every required key of a partially received object has been fully received.
+        :param value: The object parsed up to its last complete value.
+        :param open_depth: The number of containers still open in it.
+        :return: True if the document is complete or every required member is complete, otherwise False.
+        """
+        if open_depth == 0:
+            return True
+        if not self._required or type(value) is not dict or not self._required.issubset(value.keys()):
+            return False
+        # A member whose value is a container still being received is the last member of the object.
+        return open_depth == 1 or next(reversed(value)) not in self._required
+
+
+@lru_cache(maxsize=256)
+def compile_schema(model: Optional[Type[BaseModel]] = None, expected_keys: tuple[str, ...] = ()) -> CompiledSchema:
+    """
+    Get the compiled schema for a pydantic model and expected keys, shared by every parser that uses them.
+    :param model: The pydantic model, if any.
+    :param expected_keys: The keys the parsed object must contain.
+    :return: The compiled schema.
+    """
+    return CompiledSchema(model, expected_keys)
@@ -0,0 +1,158 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+class JsonBackend:
+    """
+    JSON decoder backed by the standard library.
+
+    Every backend must give the same results as `json.loads` for the same input and `strict` flag, and raise
+    `json.JSONDecodeError` for the same inputs.
+    """
+
+    name: str = 'json'
+
+    def loads(self, s: Union[str, bytes, bytearray, memoryview], *, strict: bool = True) -> Any:
+        """
+        Decode a JSON document.
+        :param s: The JSON document, or its UTF-8 encoding as a bytes-like object.
+        :param strict: Whether control characters are disallowed inside strings.
+        :return: The decoded value.
+        """
+        if not isinstance(s, str):
+            s = str(s, 'utf-8')
+        return json.loads(s, strict=strict)
+
+
+class OrjsonBackend(JsonBackend):
+    """
+    JSON decoder backed by orjson, falling back to the standard library where the two disagree.
+
+    orjson rejects some documents the standard library accepts (NaN and Infinity, out-of-range floats, lone
+    surrogates, and control characters when `strict` is False), so any orjson error is retried with `json.loads`,
+    which also produces the error callers see.  orjson also decodes integers outside the 64-bit range as floats, so
+    documents with a run of 19 or more digits anywhere in them are decoded with `json.loads` in the first place.
+    """
+
+    name: str = 'orjson'
+
+    def loads(self, s: Union[str, bytes, bytearray, memoryview], *, strict: bool = True) -> Any:
+        """
+        Decode a JSON document.
+        :param s: The JSON document, or its UTF-8 encoding as a bytes-like object, which orjson reads directly.
+        :param strict: Whether control characters are disallowed inside strings.
+        :return: The decoded value.
+        """
+        if _has_long_digit_run(s.encode('utf-8', 'surrogatepass') if isinstance(s, str) else bytes(s)):
+            return super().loads(s, strict=strict)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            return super().loads(s, strict=strict)
+
+
+# Maps ASCII digits to '0' and every other byte to ' '.  UTF-8 multibyte sequences never hold ASCII digit bytes.
+_DIGIT_CLASSES = bytes(0x30 if 0x30 <= byte <= 0x39 else 0x20 for byte in range(256))
+_LONG_RUN = b'0' * 19
+# Any run of 19 digits holds three bytes in a row of every 6th byte.
+_STRIDE = 6
+_SAMPLED_RUN = b'000'
+_MAX_CANDIDATES = 64
+
+
+def _has_long_digit_run(data: bytes) -> bool:
+    """
+    Check whether a document holds a run of 19 or more digits, as every integer orjson decodes as a float does:
+    those from -2^63 - 1 down and from 2^64 up.  Long runs inside strings or fractions only cost a decode with the
+    standard library.
+    :param data: The UTF-8 encoded document.
+    :return: True if the document holds a run of 19 or more ASCII digits.
+    """
+    # Only spots where three sampled bytes in a row are digits are looked at closely.  Regular expressions are
+    # several times slower here, as they try every offset.
+    sampled = data[::_STRIDE].translate(_DIGIT_CLASSES)
+    index = sampled.find(_SAMPLED_RUN)
+    for _ in range(_MAX_CANDIDATES):
+        if index == -1:
+            return False
+        start = index * _STRIDE
+        if (data[start:start + 2 * _STRIDE + 1].isdigit()
+                and _LONG_RUN in data[max(0, start - _STRIDE):start + 3 * _STRIDE + 1].translate(_DIGIT_CLASSES)):
+            return True
+        index = sampled.find(_SAMPLED_RUN, index + 1)
+    # Documents dense with long numbers are scanned in full rather than one candidate at a time.
+    return index != -1 and _LONG_RUN in data.translate(_DIGIT_CLASSES)
+
+
+def _default_backend() -> JsonBackend:
+    return OrjsonBackend() if orjson is not None else JsonBackend()
+
+
+_backend: JsonBackend = _default_backend()
+
+
+def get_json_backend() -> JsonBackend:
+    """
+    Get the JSON backend the parsers decode with.
+    :return: The JSON backend.
+    """
+    return _backend
+
+
+def set_json_backend(backend: str | JsonBackend | None = None) -> JsonBackend:
+    """
+    Set the JSON backend the parsers decode with.
+    :param backend: 'json', 'orjson', a `JsonBackend` instance, or None for the fastest installed backend.
+    :return: The JSON backend now in use.
+    """
+    global _backend
+    if backend is None:
+        _backend = _default_backend()
+    elif isinstance(backend, JsonBackend):
+        _backend = backend
+    elif backend == JsonBackend.name:
+        _backend = JsonBackend()
+    elif backend == OrjsonBackend.name:
+        if orjson is None:
+            raise ImportError("The orjson JSON backend requires the orjson package: pip install orjson")
+        _backend = OrjsonBackend()
+    else:
+        raise ValueError(f"Unknown JSON backend: {backend}")
+    return _backend
+
+
+def loads(s: Union[str, bytes, bytearray, memoryview], *, strict: bool = True) -> Any:
+    """
+    Decode a JSON document with the current backend.
+    :param s: The JSON document, or its UTF-8 encoding as a bytes-like object.
+    :param strict: Whether control characters are disallowed inside strings.
+    :return: The decoded value.
+    """
+    return _backend.loads(s, strict=strict)
@@ -0,0 +1,186 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from itertools import islice
+from typing import Any, Iterator, Union
+
+JsonPath = tuple[Union[str, int], ...]
+
+_MISSING = object()
+
+
+def escape_pointer_token(key: Union[str, int]) -> str:
+    """
+    Escape an object key or array index for use in an RFC 6901 JSON Pointer.
+    :param key: The object key or array index.
+    :return: The escaped reference token.
+    """
+    if type(key) is int:
+        return str(key)
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+class JsonElementEvent:
+    """
+    Event for an array element or object member whose value has been fully received.
+    """
+
+    __slots__ = ('path', 'value')
+
+    def __init__(self, path: JsonPath, value: Any):
+        """
+        Construct a new instance.
+        :param path: The object keys and array indexes leading to the value.
+        :param value: The completed value.
+        """
+        self.path: JsonPath = path
+        self.value: Any = value
+
+    @property
+    def pointer(self) -> str:
+        """
+        The path as an RFC 6901 JSON Pointer, e.g. "/utterances/0".
+        """
+        return ''.join('/' + escape_pointer_token(key) for key in self.path)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, JsonElementEvent):
+            return NotImplemented
+        return self.path == other.path and self.value == other.value
+
+    def __repr__(self) -> str:
+        return f"JsonElementEvent(path={self.path!r}, value={self.value!r})"
+
+
+def _members(container: Any, start: int, stop: int) -> Iterator[tuple[Union[str, int], Any]]:
+    if type(container) is dict:
+        return islice(container.items(), start, stop)
+    return zip(range(start, stop), islice(container, start, stop))
+
+
+def _is_container(value: Any) -> bool:
+    return isinstance(value, (dict, list))
+
+
+def _member(container: Any, key: Union[str, int]) -> Any:
+    if type(container) is dict:
+        return container.get(key, _MISSING)
+    if type(container) is list and type(key) is int and key < len(container):
+        return container[key]
+    return _MISSING
+
+
+class JsonElementTracker:
+    """
+    Turns successive parses of a growing JSON document into events for the elements and members that have closed.
+
+    Each update takes the document cut after its last complete value, together with the number of containers still
+    open at the cut.  Those open containers run down the last member of each level, and every other member in the
+    document is complete.  The tracker remembers how many members of each open container it has reported, so each
+    element is reported exactly once, nested values before the container that holds them.  A repeated object key
+    replaces the value of a member that may already have been reported, so after one the reported members are
+    compared with the previous document, and each one that changed is reported again with its new value.  Once a
+    document with no open containers has been reported, later updates are ignored.
+    """
+
+    def __init__(self):
+        """
+        Construct a new instance.
+        """
+        self._reported: dict[JsonPath, int] = {}
+        self._complete: bool = False
+        self._last: Any = None
+
+    def update(self, value: Any, open_depth: int, *, rewritten: bool = False) -> list[JsonElementEvent]:
+        """
+        Report the elements and members that have closed since the previous update.
+        :param value: The parsed document, cut after its last complete value.
+        :param open_depth: The number of containers still open in the document.
+        :param rewritten: Whether a repeated object key has replaced a member since the previous update.
+        :return: The events, in document order.
+        """
+        if self._complete:
+            return []
+        self._complete = open_depth == 0
+        prev = self._last if rewritten else _MISSING
+        self._last = value
+
+        events = []
+        reported = {}
+        container = value
+        path: JsonPath = ()
+        depth = 0
+        while _is_container(container):
+            depth += 1
+            count = len(container)
+            start = self._reported.pop(path, 0)
+            if depth < open_depth and count:
+                # The last member is the next open container, so everything before it is complete.
+                self._report(container, path, start, count - 1, events, prev)
+                reported[path] = count - 1
+                if type(container) is dict:
+                    key, container = next(reversed(container.items()))
+                else:
+                    key, container = count - 1, container[-1]
+                path = path + (key,)
+                if prev is not _MISSING:
+                    prev = _member(prev, key)
+            else:
+                self._report(container, path, start, count, events, prev)
+                if depth <= open_depth:
+                    reported[path] = count
+                break
+        self._reported = reported
+        return events
+
+    def _report(self,
+                container: Any,
+                path: JsonPath,
+                start: int,
+                stop: int,
+                events: list[JsonElementEvent],
+                prev: Any = _MISSING,
+                ) -> None:
+        if prev is not _MISSING:
+            # The container as of the previous update is given after a repeated key, so the members reported
+            # then are compared with their current values.
+            for key, member in _members(container, 0, start):
+                self._replace(_member(prev, key), member, path + (key,), events)
+        for key, member in _members(container, start, stop):
+            member_path = path + (key,)
+            if _is_container(member):
+                # A container that was open at the previous update has already reported some of its members.
+                reported = self._reported.pop(member_path, 0)
+                self._report(member, member_path, reported, len(member), events,
+                             _member(prev, key) if prev is not _MISSING and reported else _MISSING)
+            events.append(JsonElementEvent(member_path, member))
+
+    def _replace(self, prev: Any, member: Any, path: JsonPath, events: list[JsonElementEvent]) -> None:
+        if type(prev) is type(member) and prev == member:
+            return
+        if _is_container(member):
+            if type(prev) is type(member):
+                for key, value in _members(member, 0, len(member)):
+                    self._replace(_member(prev, key), value, path + (key,), events)
+            else:
+                self._report(member, path, 0, len(member), events)
+        events.append(JsonElementEvent(path, member))
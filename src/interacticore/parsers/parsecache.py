@@ -0,0 +1,180 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Union
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - depends on the environment
+    xxhash = None
+
+
+def _readonly(*args, **kwargs):
+    raise TypeError("Cached parse results are read-only; copy the result to modify it")
+
+
+class FrozenDict(dict):
+    """Read-only dict returned for cached parse results."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    """Read-only list returned for cached parse results."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def freeze(value: Any) -> Any:
+    """
+    Convert a parsed JSON value into a read-only equivalent.
+    :param value: The parsed value.
+    :return: The value with every dict and list replaced by a `FrozenDict` or `FrozenList`.
+    """
+    kind = type(value)
+    if kind is dict:
+        return FrozenDict({key: freeze(item) for key, item in value.items()})
+    if kind is list:
+        return FrozenList([freeze(item) for item in value])
+    return value
+
+
+def _digest(data: Union[bytes, memoryview]) -> bytes:
+    if xxhash is not None:
+        return xxhash.xxh3_128_digest(data)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+_MISSING = object()
+
+
+class ParseCache:
+    """
+    Bounded, thread-safe LRU cache of parse results, keyed by a 128-bit hash of the raw text.
+
+    Results are stored as read-only `FrozenDict`/`FrozenList` structures, so every caller can share them without
+    copying.  Each entry is charged the UTF-8 size of its raw text against `max_bytes`.  Parse errors are not cached.
+    """
+
+    def __init__(self,
+                 *,
+                 max_entries: int = 1024,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 ):
+        """
+        Construct a new instance.
+        :param max_entries: The maximum number of cached results.
+        :param max_bytes: The maximum total size of the raw texts behind the cached results.
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive: {max_entries}")
+        if max_bytes < 1:
+            raise ValueError(f"max_bytes must be positive: {max_bytes}")
+        self.max_entries: int = max_entries
+        self.max_bytes: int = max_bytes
+        self._entries: OrderedDict[tuple, tuple[Any, int]] = OrderedDict()
+        self._bytes: int = 0
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        """The total size of the raw texts behind the cached results."""
+        return self._bytes
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups that were served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_or_parse(self,
+                     text: Union[str, bytes, bytearray, memoryview],
+                     parse: Callable[[Any], Any],
+                     *,
+                     namespace: Hashable = None,
+                     ) -> Any:
+        """
+        Get the cached result for a text, parsing and caching it on a miss.
+        :param text: The raw text, or its UTF-8 encoding as a bytes-like object, which is hashed in place.
+        :param parse: The function that parses the text.
+        :param namespace: Distinguishes results of different parse functions for the same text.
+        :return: The read-only parse result.
+        """
+        data = text.encode('utf-8', 'surrogatepass') if isinstance(text, str) else memoryview(text).cast('B')
+        key = (namespace, len(data), _digest(data))
+
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Parse outside the lock, so a slow parse does not block hits on other threads.
+        result = freeze(parse(text))
+        size = len(data)
+        if size > self.max_bytes:
+            return result
+
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key][0]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return result
+
+    def clear(self) -> None:
+        """
+        Remove every cached result and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
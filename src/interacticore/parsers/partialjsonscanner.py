@@ -0,0 +1,589 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import re
+from json.decoder import scanstring
+
+# Grammar states for the innermost open container (or the top level).
+_EXPECT_VALUE = 0
+_EXPECT_VALUE_OR_END = 1
+_EXPECT_KEY = 2
+_EXPECT_KEY_OR_END = 3
+_EXPECT_COLON = 4
+_EXPECT_COMMA_OR_END = 5
+
+_VALUE_STATES = (_EXPECT_VALUE, _EXPECT_VALUE_OR_END)
+_KEY_STATES = (_EXPECT_KEY, _EXPECT_KEY_OR_END)
+
+_WHITESPACE = ' \t\n\r'
+_AFTER_SINGLE_QUOTE = ',:]}'
+
+_WHITESPACE_RUN = re.compile(r'[ \t\n\r]*')
+_TOKEN_RUN = re.compile(r'[^ \t\n\r"\'{}\[\],:]*')
+_STRING_RUNS = {
+    ('"', False): re.compile(r'[^"\\\n\r\t]*'),
+    ('"', True): re.compile(r'[^"\\\x00-\x1f]*'),
+    ("'", False): re.compile(r'[^\'"\\\n\r\t]*'),
+    ("'", True): re.compile(r'[^\'"\\\x00-\x1f]*'),
+}
+_BROKEN_STRING_RUNS = {
+    '"': re.compile(r'[^"\\]*'),
+    "'": re.compile(r"[^'\\]*"),
+}
+_BROKEN_RUN = re.compile(r'[^"{}\[\]]*')
+_SIMPLE_STRING = re.compile(r'"[^"\\\x00-\x1f]*"')
+_SIMPLE_SINGLE_QUOTED_STRING = re.compile(r"'([^'\"\\\x00-\x1f]*)'(?=[ \t\n\r]*[,:\]}])")
+
+_TOKEN = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null|NaN|-?Infinity')
+_ESCAPES = frozenset('"\\/bfnrt')
+_HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+_CONTROL_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+_CONTROL_TRANSLATION = str.maketrans(_CONTROL_ESCAPES)
+
+
+class PartialJsonScanner:
+    """
+    Resumable single-pass scanner for repairing JSON documents that may be truncated or malformed.
+
+    The scanner tracks the open bracket stack, string and escape state, and a small JSON grammar while it consumes
+    input.  Every position at which the text seen so far can be completed into a valid document by appending closing
+    brackets is recorded as a cut point, keyed by the bracket stack at that position.  The repaired document is the
+    longest prefix whose bracket stack matches the final stack, closed up in reverse order, which is exactly what the
+    old truncate-and-retry loop converged to, but found without re-decoding the text once per character.
+
+    While scanning, the output is normalized in the same pass: single-quoted strings are rewritten as double-quoted
+    strings, and unescaped newlines, carriage returns and tabs inside strings are escaped.
+
+    The keys of every open object are remembered, so a key that repeats an earlier key of its object, which replaces
+    that member's value in place when decoded, is counted in `repeated_keys`.
+    """
+
+    def __init__(self, *, strict: bool = False):
+        """
+        Construct a new instance.
+        :param strict: Whether the repaired document will be decoded with strict parsing.
+        """
+        self.strict: bool = strict
+        self._chunks: list[str] = []
+        self._length: int = 0
+        self._stack: str = ''
+        self._state: int = _EXPECT_VALUE
+        self._in_string: bool = False
+        self._string_is_key: bool = False
+        self._quote: str = '"'
+        self._closing: str | None = None
+        self._escape: str = ''
+        self._token: str = ''
+        self._cuts: dict[str, int] = {}
+        self._broken: bool = False
+        self._broken_stack: str = ''
+        self._mismatched: bool = False
+        # The keys of each open container, or None for arrays, and the depths of open objects that repeat a key.
+        self._keys: list[set[str] | None] = []
+        self._key_start: int = 0
+        self._repeated_keys: int = 0
+        self._open_repeats: set[int] = set()
+
+    @property
+    def mismatched(self) -> bool:
+        """
+        Whether a closing bracket that does not match the open bracket stack has been seen.
+        :return: True if the input can never be repaired, otherwise False.
+        """
+        return self._mismatched
+
+    @property
+    def repeated_keys(self) -> int:
+        """
+        The number of object keys seen so far that repeat an earlier key of the same object.
+        :return: The count of repeated keys.
+        """
+        return self._repeated_keys
+
+    @property
+    def repeated_key_open(self) -> bool:
+        """
+        Whether an object that is still open repeats one of its keys.  While it is, the last member of that object in
+        the decoded document need not be the member being received.
+        :return: True if an open object repeats a key, otherwise False.
+        """
+        return bool(self._open_repeats)
+
+    def feed(self, text: str, start: int = 0, end: int | None = None) -> None:
+        """
+        Consume the next chunk of input.
+        :param text: The input chunk.
+        :param start: The offset in text to start scanning from.
+        :param end: The offset in text to stop scanning at.  Defaults to the end of text.
+        """
+        pos = start
+        if end is None:
+            end = len(text)
+        while pos < end and not self._mismatched:
+            if self._broken:
+                pos = self._skip_broken(text, pos, end)
+            elif self._closing is not None:
+                pos = self._scan_closing(text, pos, end)
+            elif self._escape:
+                pos = self._scan_escape(text, pos)
+            else:
+                pos = self._scan(text, pos, end)
+
+    def repaired(self) -> str | None:
+        """
+        Build the best repaired document for the input consumed so far.  This does not alter the scanner state, so
+        more input may be fed afterward.
+        :return: The repaired JSON text, or None if no prefix of the input can be repaired.
+        """
+        if self._mismatched:
+            return None
+
+        cut = self._cuts.get(self._stack)
+        tail = ''
+        if not self._broken:
+            if self._in_string:
+                if not self._string_is_key:
+                    # Any pending partial escape sequence has not been emitted, so it is dropped here,
+                    # and a pending single quote is taken as the end of the string.
+                    cut = self._length
+                    tail = '"'
+            elif self._token:
+                token_cut = self._token_cut()
+                if token_cut is not None:
+                    cut = token_cut
+
+        if cut is None:
+            return None
+
+        return self._text()[:cut] + tail + self._stack[::-1]
+
+    def committed(self) -> tuple[str, int] | None:
+        """
+        Build the document for the input consumed so far, cut after the last complete value.  Unlike `repaired`,
+        this leaves out any open string, number or literal, so every member of the innermost open container in the
+        document is complete.  This does not alter the scanner state, so more input may be fed afterward.
+        :return: The JSON text and the number of containers still open at the cut, or None if there is no cut.
+        """
+        if self._mismatched:
+            return None
+
+        # After a grammar break, the bracket stack keeps moving but no more cut points are recorded.
+        stack = self._broken_stack if self._broken else self._stack
+        cut = self._cuts.get(stack)
+        if cut is None:
+            return None
+
+        return self._text()[:cut] + stack[::-1], len(stack)
+
+    def _text(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0] if self._chunks else ''
+
+    def _emit(self, text: str) -> None:
+        self._chunks.append(text)
+        self._length += len(text)
+
+    def _complete_value(self) -> None:
+        self._state = _EXPECT_COMMA_OR_END
+        self._cuts[self._stack] = self._length
+
+    def _close_string(self) -> None:
+        if self._string_is_key:
+            self._add_key(self._output_tail(self._chunks, self._length, self._key_start))
+        self._emit('"')
+        self._in_string = False
+        if self._string_is_key:
+            self._state = _EXPECT_COLON
+        else:
+            self._complete_value()
+
+    @staticmethod
+    def _output_tail(chunks: list[str], length: int, start: int) -> str:
+        # The output from start up to length, the output length of chunks, read from the last chunks backward.
+        parts = []
+        for chunk in reversed(chunks):
+            if length <= start:
+                break
+            length -= len(chunk)
+            parts.append(chunk[max(0, start - length):])
+        return ''.join(reversed(parts))
+
+    def _add_key(self, key: str) -> None:
+        if '\\' in key:
+            # Different escapes of the same key are the same key.
+            try:
+                key = scanstring(key + '"', 0)[0]
+            except ValueError:
+                pass
+        keys = self._keys[-1] if self._keys else None
+        if keys is None:
+            return
+        if key in keys:
+            self._repeated_keys += 1
+            self._open_repeats.add(len(self._keys))
+        else:
+            keys.add(key)
+
+    def _token_cut(self) -> int | None:
+        # The longest prefix of the pending number or literal that is itself a valid token.
+        match = _TOKEN.match(self._token)
+        if match is None:
+            return None
+        return self._length - len(self._token) + match.end()
+
+    def _break(self) -> None:
+        self._broken = True
+        self._broken_stack = self._stack
+        self._escape = ''
+        self._closing = None
+
+    def _scan(self, text: str, pos: int, end: int) -> int:
+        # Text that needs no rewriting is copied to the output in verbatim spans, so the output length at
+        # any position in this chunk is offset + pos until the next substitution.
+        chunks = self._chunks
+        cuts = self._cuts
+        stack = self._stack
+        keys = self._keys
+        state = self._state
+        in_string = self._in_string
+        is_key = self._string_is_key
+        quote = self._quote
+        token = self._token
+        string_runs = _STRING_RUNS
+        strict = self.strict
+        span = pos
+        offset = self._length - pos
+        broken = False
+
+        if token:
+            # Continue the number or literal left pending by the previous chunk.
+            token_end = _TOKEN_RUN.match(text, pos, end).end()
+            token += text[pos:token_end]
+            pos = token_end
+            if pos < end:
+                if _TOKEN.fullmatch(token) is not None:
+                    state = _EXPECT_COMMA_OR_END
+                    cuts[stack] = offset + pos
+                else:
+                    match = _TOKEN.match(token)
+                    if match is not None:
+                        cuts[stack] = offset + pos - len(token) + match.end()
+                    broken = True
+                token = ''
+
+        while pos < end and not broken:
+            char = text[pos]
+
+            if in_string:
+                pos = string_runs[quote, strict].match(text, pos, end).end()
+                if pos == end:
+                    break
+                char = text[pos]
+                if char == quote:
+                    if quote == "'":
+                        # A single quote may just be an apostrophe, so look at what follows it first.
+                        after = _WHITESPACE_RUN.match(text, pos + 1, end).end()
+                        if after == end:
+                            chunks.append(text[span:pos])
+                            self._closing = text[pos + 1:end]
+                            offset -= end - pos
+                            span = pos = end
+                            break
+                        if text[after] not in _AFTER_SINGLE_QUOTE:
+                            pos += 1
+                            continue
+                        chunks.append(text[span:pos])
+                        chunks.append('"')
+                        span = pos + 1
+                    pos += 1
+                    in_string = False
+                    if is_key:
+                        stop = offset + pos - 1
+                        head = offset + span
+                        key = self._output_tail(chunks, head, self._key_start)
+                        if stop < head:
+                            key = key[:stop - head]
+                        else:
+                            key += text[max(span, self._key_start - offset):pos - 1]
+                        self._add_key(key)
+                        state = _EXPECT_COLON
+                    else:
+                        state = _EXPECT_COMMA_OR_END
+                        cuts[stack] = offset + pos
+                elif char == '\\':
+                    escape_end = pos + 2
+                    if escape_end > end:
+                        chunks.append(text[span:pos])
+                        offset -= end - pos
+                        self._escape = '\\'
+                        span = pos = end
+                        break
+                    char = text[pos + 1]
+                    if char in _ESCAPES:
+                        pos = escape_end
+                    elif char == "'":
+                        chunks.append(text[span:pos])
+                        chunks.append(char)
+                        offset -= 1
+                        span = pos = escape_end
+                    elif char == 'u':
+                        hex_end = escape_end
+                        while hex_end < end and hex_end < pos + 6 and text[hex_end] in _HEX_DIGITS:
+                            hex_end += 1
+                        if hex_end == pos + 6:
+                            pos = hex_end
+                        elif hex_end == end:
+                            chunks.append(text[span:pos])
+                            offset -= end - pos
+                            self._escape = text[pos:end]
+                            span = pos = end
+                            break
+                        else:
+                            pos = hex_end
+                            broken = True
+                    else:
+                        pos += 1
+                        broken = True
+                elif char == '"':
+                    chunks.append(text[span:pos])
+                    chunks.append('\\"')
+                    offset += 1
+                    pos += 1
+                    span = pos
+                elif char in _CONTROL_ESCAPES:
+                    # Replace the control character with the escape sequence.
+                    chunks.append(text[span:pos])
+                    chunks.append(_CONTROL_ESCAPES[char])
+                    offset += 1
+                    pos += 1
+                    span = pos
+                else:
+                    # Other unescaped control characters are rejected by strict parsing.
+                    pos += 1
+                    broken = True
+                continue
+
+            if char in _WHITESPACE:
+                pos = _WHITESPACE_RUN.match(text, pos, end).end()
+                continue
+
+            if char == '"' or char == "'":
+                if state in _VALUE_STATES:
+                    is_key = False
+                elif state in _KEY_STATES:
+                    is_key = True
+                else:
+                    in_string = True
+                    quote = char
+                    pos += 1
+                    broken = True
+                    continue
+
+                # Fast path for a complete string without escapes or control characters.
+                if char == '"':
+                    match = _SIMPLE_STRING.match(text, pos, end)
+                    if match is not None:
+                        pos = match.end()
+                        if is_key:
+                            self._add_key(text[match.start() + 1:pos - 1])
+                            state = _EXPECT_COLON
+                        else:
+                            state = _EXPECT_COMMA_OR_END
+                            cuts[stack] = offset + pos
+                        continue
+                else:
+                    match = _SIMPLE_SINGLE_QUOTED_STRING.match(text, pos, end)
+                    if match is not None:
+                        chunks.append(text[span:pos])
+                        chunks.append('"' + match.group(1) + '"')
+                        pos = span = match.end()
+                        if is_key:
+                            self._add_key(match.group(1))
+                            state = _EXPECT_COLON
+                        else:
+                            state = _EXPECT_COMMA_OR_END
+                            cuts[stack] = offset + pos
+                        continue
+                    chunks.append(text[span:pos])
+                    chunks.append('"')
+                    span = pos + 1
+
+                in_string = True
+                quote = char
+                pos += 1
+                if is_key:
+                    self._key_start = offset + pos
+                continue
+
+            if char == '{' or char == '[':
+                stack += '}' if char == '{' else ']'
+                keys.append(set() if char == '{' else None)
+                pos += 1
+                if state not in _VALUE_STATES:
+                    broken = True
+                    continue
+                state = _EXPECT_KEY_OR_END if char == '{' else _EXPECT_VALUE_OR_END
+                cuts[stack] = offset + pos
+                continue
+
+            if char == '}' or char == ']':
+                if not stack or stack[-1] != char:
+                    self._mismatched = True
+                    break
+                stack = stack[:-1]
+                self._open_repeats.discard(len(keys))
+                keys.pop()
+                if state != _EXPECT_COMMA_OR_END and state != (
+                        _EXPECT_KEY_OR_END if char == '}' else _EXPECT_VALUE_OR_END):
+                    pos += 1
+                    broken = True
+                    continue
+                pos += 1
+                state = _EXPECT_COMMA_OR_END
+                cuts[stack] = offset + pos
+                continue
+
+            if char == ',':
+                if state != _EXPECT_COMMA_OR_END or not stack:
+                    broken = True
+                    continue
+                state = _EXPECT_KEY if stack[-1] == '}' else _EXPECT_VALUE
+                pos = _WHITESPACE_RUN.match(text, pos + 1, end).end()
+                continue
+
+            if char == ':':
+                if state != _EXPECT_COLON:
+                    broken = True
+                    continue
+                state = _EXPECT_VALUE
+                pos = _WHITESPACE_RUN.match(text, pos + 1, end).end()
+                continue
+
+            # Start of a number or literal.
+            if state not in _VALUE_STATES:
+                broken = True
+                continue
+            token_end = _TOKEN_RUN.match(text, pos, end).end()
+            if token_end == end:
+                token = text[pos:end]
+                pos = end
+                break
+            match = _TOKEN.match(text, pos, token_end)
+            if match is not None and match.end() == token_end:
+                state = _EXPECT_COMMA_OR_END
+                cuts[stack] = offset + token_end
+                pos = token_end
+                continue
+            if match is not None:
+                cuts[stack] = offset + match.end()
+            pos = token_end
+            broken = True
+
+        chunks.append(text[span:pos])
+        self._length = offset + pos
+        self._stack = stack
+        self._state = state
+        self._in_string = in_string
+        self._string_is_key = is_key
+        self._quote = quote
+        self._token = token
+        if broken:
+            self._break()
+        return pos
+
+    def _scan_closing(self, text: str, pos: int, end: int) -> int:
+        run_end = _WHITESPACE_RUN.match(text, pos, end).end()
+        self._closing += text[pos:run_end]
+        if run_end == end:
+            return run_end
+
+        whitespace = self._closing
+        self._closing = None
+        if text[run_end] in _AFTER_SINGLE_QUOTE:
+            self._close_string()
+            if whitespace:
+                self._emit(whitespace)
+        else:
+            self._emit("'" + whitespace.translate(_CONTROL_TRANSLATION))
+        return run_end
+
+    def _scan_escape(self, text: str, pos: int) -> int:
+        char = text[pos]
+        escape = self._escape
+        if escape == '\\':
+            if char in _ESCAPES:
+                self._emit(escape + char)
+                self._escape = ''
+            elif char == "'":
+                self._emit(char)
+                self._escape = ''
+            elif char == 'u':
+                self._escape = '\\u'
+            else:
+                self._break()
+                return pos
+        elif char in _HEX_DIGITS:
+            escape += char
+            if len(escape) == 6:
+                self._emit(escape)
+                self._escape = ''
+            else:
+                self._escape = escape
+        else:
+            self._break()
+            return pos
+        return pos + 1
+
+    def _skip_broken(self, text: str, pos: int, end: int) -> int:
+        # Once the grammar is broken no further cut points can be recorded, so only the string
+        # and bracket state that decides the final stack needs to be followed.
+        if self._in_string:
+            if self._escape:
+                self._escape = ''
+                return pos + 1
+            pos = _BROKEN_STRING_RUNS[self._quote].match(text, pos, end).end()
+            if pos == end:
+                return pos
+            if text[pos] == '\\':
+                self._escape = '\\'
+            else:
+                self._in_string = False
+            return pos + 1
+
+        pos = _BROKEN_RUN.match(text, pos, end).end()
+        if pos == end:
+            return pos
+
+        char = text[pos]
+        if char == '"':
+            self._in_string = True
+            self._quote = char
+        elif char == '{':
+            self._stack += '}'
+        elif char == '[':
+            self._stack += ']'
+        elif self._stack and self._stack[-1] == char:
+            self._stack = self._stack[:-1]
+        else:
+            self._mismatched = True
+        return pos + 1
@@ -0,0 +1,294 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator
+
+
+class RateLimitError(Exception):
+    """
+    Raised when a provider throttles a call made under a `RateLimiter`.
+    """
+
+    def __init__(self, message: str, *, retry_after: float | None = None):
+        """
+        Construct a new instance.
+        :param message: The error message.
+        :param retry_after: The delay the provider asked for, in seconds, if any.
+        """
+        super().__init__(message)
+        self.retry_after: float | None = retry_after
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """
+    Check whether an exception is a provider throttling signal, such as an HTTP 429 response.
+    :param error: The exception.
+    :return: True if the exception signals throttling, otherwise False.
+    """
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status_code == 429 or 'RateLimit' in type(error).__name__
+
+
+def retry_after(error: BaseException) -> float | None:
+    """
+    Get the delay a throttling error asks callers to wait, from its Retry-After response header.
+    :param error: The exception.
+    :return: The delay in seconds, or None if the error carries no usable delay.
+    """
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if headers is None:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at a constant rate.  Not thread-safe by itself; `RateLimiter` serializes access.
+    """
+
+    __slots__ = ('rate', 'capacity', '_level', '_updated')
+
+    def __init__(self, per_minute: float, *, capacity: float | None = None):
+        """
+        Construct a new instance.
+        :param per_minute: The number of tokens added per minute.
+        :param capacity: The maximum number of tokens held, which bounds bursts.  Defaults to one minute of tokens.
+        """
+        if per_minute <= 0:
+            raise ValueError(f"per_minute must be positive: {per_minute}")
+        self.rate: float = per_minute / 60
+        self.capacity: float = per_minute if capacity is None else capacity
+        self._level: float = self.capacity
+        self._updated: float = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Take tokens from the bucket, going into debt if it holds too few.
+        :param amount: The number of tokens.
+        :param now: The current monotonic time.
+        :return: The number of seconds until the debt is repaid and the tokens may be used.
+        """
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+        self._level -= amount
+        return -self._level / self.rate if self._level < 0 else 0.0
+
+
+class RateLimiter:
+    """
+    Request and token budgets for one model, shared by every thread and coroutine that calls it.
+
+    Each call reserves one request and its estimated tokens from per-minute token buckets and waits until the
+    budgets cover them.  With `max_concurrency` set, the number of calls in flight is also limited, and the limit
+    adapts: it halves when the provider throttles a call and grows by one after each run of successful calls as long
+    as the current limit.  A throttled call also pauses new calls for the provider's Retry-After delay, or for
+    `cooldown` seconds if it gives none.
+    """
+
+    def __init__(self,
+                 *,
+                 requests_per_minute: float | None = None,
+                 tokens_per_minute: float | None = None,
+                 max_concurrency: int | None = None,
+                 min_concurrency: int = 1,
+                 expected_output_tokens: int = 0,
+                 cooldown: float = 1.0,
+                 ):
+        """
+        Construct a new instance.
+        :param requests_per_minute: The request budget, or None for no request budget.
+        :param tokens_per_minute: The token budget, or None for no token budget.
+        :param max_concurrency: The maximum number of calls in flight, or None for no concurrency limit.
+        :param min_concurrency: The lowest the concurrency limit adapts down to.
+        :param expected_output_tokens: Tokens reserved for each call's output on top of its prompt estimate.
+        :param cooldown: Seconds to pause new calls after throttling without a Retry-After delay.
+        """
+        if max_concurrency is not None and not 1 <= min_concurrency <= max_concurrency:
+            raise ValueError(f"min_concurrency must be between 1 and max_concurrency: {min_concurrency}")
+        self._requests: TokenBucket | None = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens: TokenBucket | None = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency: int | None = max_concurrency
+        self.min_concurrency: int = min_concurrency
+        self.concurrency: int | None = max_concurrency
+        self.expected_output_tokens: int = expected_output_tokens
+        self.cooldown: float = cooldown
+        self.in_flight: int = 0
+        self.throttles: int = 0
+        self._successes: int = 0
+        self._paused_until: float = 0.0
+        self._waiters: deque[Callable[[], None]] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        Wait for a concurrency slot and for the budgets to cover a call, blocking the thread.
+        :param tokens: The estimated prompt tokens of the call.
+        """
+        if self.concurrency is not None:
+            with self._lock:
+                event = None if self._take_slot_locked() else threading.Event()
+                if event is not None:
+                    self._waiters.append(event.set)
+            if event is not None:
+                event.wait()
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        """
+        Wait for a concurrency slot and for the budgets to cover a call, without blocking the event loop.
+        :param tokens: The estimated prompt tokens of the call.
+        """
+        if self.concurrency is not None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+
+            def wake():
+                loop.call_soon_threadsafe(_resolve, future)
+
+            with self._lock:
+                queued = not self._take_slot_locked()
+                if queued:
+                    self._waiters.append(wake)
+            if queued:
+                try:
+                    await future
+                except asyncio.CancelledError:
+                    with self._lock:
+                        try:
+                            self._waiters.remove(wake)
+                        except ValueError:
+                            # The slot was handed over before the cancellation, so give it back.
+                            self._release_slot_locked()
+                    raise
+        try:
+            delay = self._reserve(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if self.concurrency is not None:
+                with self._lock:
+                    self._release_slot_locked()
+            raise
+
+    def release(self, *, throttled: bool = False, retry_after: float | None = None) -> None:
+        """
+        Return the concurrency slot of a finished call and adapt the concurrency limit to its outcome.
+        :param throttled: Whether the provider throttled the call.
+        :param retry_after: The delay the provider asked for, in seconds, if any.
+        """
+        with self._lock:
+            if throttled:
+                self.throttles += 1
+                self._successes = 0
+                pause = self.cooldown if retry_after is None else retry_after
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                if self.concurrency is not None:
+                    self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+            elif self.concurrency is not None:
+                self._successes += 1
+                if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._successes = 0
+            self._release_slot_locked()
+
+    @contextmanager
+    def limit(self, tokens: int = 0) -> Iterator[None]:
+        """
+        Hold a slot and budget for the duration of a call.  Throttling errors raised by the call are reported to the
+        limiter and re-raised as `RateLimitError`.
+        :param tokens: The estimated prompt tokens of the call.
+        """
+        self.acquire(tokens)
+        try:
+            yield
+        except BaseException as e:
+            self._release_error(e)
+        else:
+            self.release()
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int = 0) -> AsyncIterator[None]:
+        """
+        Hold a slot and budget for the duration of a call, without blocking the event loop.  Throttling errors raised
+        by the call are reported to the limiter and re-raised as `RateLimitError`.
+        :param tokens: The estimated prompt tokens of the call.
+        """
+        await self.aacquire(tokens)
+        try:
+            yield
+        except BaseException as e:
+            self._release_error(e)
+        else:
+            self.release()
+
+    def _release_error(self, error: BaseException) -> None:
+        if isinstance(error, Exception) and is_throttling_error(error):
+            delay = getattr(error, 'retry_after', None)
+            if delay is None:
+                delay = retry_after(error)
+            self.release(throttled=True, retry_after=delay)
+            if isinstance(error, RateLimitError):
+                raise error
+            raise RateLimitError(f"Throttled by provider: {error}", retry_after=delay) from error
+        self.release()
+        raise error
+
+    def _take_slot_locked(self) -> bool:
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    def _release_slot_locked(self) -> None:
+        if self.concurrency is None:
+            return
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < self.concurrency:
+            self.in_flight += 1
+            self._waiters.popleft()()
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._paused_until - now
+            if self._requests is not None:
+                delay = max(delay, self._requests.reserve(1, now))
+            if self._tokens is not None:
+                delay = max(delay, self._tokens.reserve(tokens + self.expected_output_tokens, now))
+            return delay
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
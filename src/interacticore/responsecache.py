@@ -0,0 +1,241 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+# Create a logger with the module name
+log = logging.getLogger(__name__)
+
+_DEFAULT_TTL = object()
+
+
+class ResponseCache(ABC):
+    """
+    Abstract cache of command results by response cache key.
+
+    Results are stored as JSON, so every hit returns a fresh copy that callers may modify, and a cache file written
+    by someone else can at worst return wrong results, never run code.  Results that are not JSON values are not
+    cached, and tuples come back as lists.  Entries that do not decode count as misses.
+    """
+
+    def __init__(self, *, ttl: float | None = None):
+        """
+        Construct a new instance.
+        :param ttl: The default time to live of cached results, in seconds, or None for results that do not expire.
+        """
+        self.ttl: float | None = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups that were served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def lookup(self, key: str) -> tuple[bool, Any]:
+        """
+        Look up a cached result.
+        :param key: The response cache key.
+        :return: Whether the result was found, and the result.
+        """
+        data = self._get(key, time.time())
+        value = None
+        if data is not None:
+            try:
+                value = json.loads(data)
+            except ValueError as e:
+                log.debug("Ignoring undecodable cache entry: %s", e)
+                data = None
+        with self._stats_lock:
+            if data is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+        return True, value
+
+    def store(self, key: str, value: Any, *, ttl: float | None = _DEFAULT_TTL) -> None:
+        """
+        Cache a result.
+        :param key: The response cache key.
+        :param value: The result.
+        :param ttl: The time to live in seconds, None for no expiry, or the cache's default if not given.
+        """
+        try:
+            data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        except (TypeError, ValueError) as e:
+            log.debug("Not caching a result that is not JSON: %s", e)
+            return
+        ttl = self.ttl if ttl is _DEFAULT_TTL else ttl
+        self._set(key, data, None if ttl is None else time.time() + ttl)
+
+    async def alookup(self, key: str) -> tuple[bool, Any]:
+        """
+        Look up a cached result without blocking the event loop.
+        :param key: The response cache key.
+        :return: Whether the result was found, and the result.
+        """
+        return self.lookup(key)
+
+    async def astore(self, key: str, value: Any, *, ttl: float | None = _DEFAULT_TTL) -> None:
+        """
+        Cache a result without blocking the event loop.
+        :param key: The response cache key.
+        :param value: The result.
+        :param ttl: The time to live in seconds, None for no expiry, or the cache's default if not given.
+        """
+        self.store(key, value, ttl=ttl)
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Remove every cached result.
+        """
+        pass
+
+    @abstractmethod
+    def _get(self, key: str, now: float) -> bytes | None:
+        pass
+
+    @abstractmethod
+    def _set(self, key: str, data: bytes, expires: float | None) -> None:
+        pass
+
+
+class MemoryResponseCache(ResponseCache):
+    """
+    Bounded in-memory LRU response cache, shared by every thread that uses it.
+    """
+
+    def __init__(self, *, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl: float | None = None):
+        """
+        Construct a new instance.
+        :param max_entries: The maximum number of cached results.
+        :param max_bytes: The maximum total size of the cached results as JSON.
+        :param ttl: The default time to live of cached results, in seconds, or None for results that do not expire.
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive: {max_entries}")
+        super().__init__(ttl=ttl)
+        self.max_entries: int = max_entries
+        self.max_bytes: int = max_bytes
+        self._entries: OrderedDict[str, tuple[bytes, float | None]] = OrderedDict()
+        self._bytes: int = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _get(self, key: str, now: float) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires = entry
+            if expires is not None and expires <= now:
+                del self._entries[key]
+                self._bytes -= len(data)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def _set(self, key: str, data: bytes, expires: float | None) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = (data, expires)
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    Persistent response cache in a SQLite database file, which survives reruns of a pipeline.
+    """
+
+    def __init__(self, path: str, *, ttl: float | None = None):
+        """
+        Construct a new instance.
+        :param path: The database file path, or ':memory:'.
+        :param ttl: The default time to live of cached results, in seconds, or None for results that do not expire.
+        """
+        super().__init__(ttl=ttl)
+        self.path: str = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS responses '
+                               '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+            self._conn.execute('DELETE FROM responses WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+
+    async def alookup(self, key: str) -> tuple[bool, Any]:
+        return await asyncio.to_thread(self.lookup, key)
+
+    async def astore(self, key: str, value: Any, *, ttl: float | None = _DEFAULT_TTL) -> None:
+        await asyncio.to_thread(self.store, key, value, ttl=ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+
+    def _get(self, key: str, now: float) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= now:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                return None
+            return row[0]
+
+    def _set(self, key: str, data: bytes, expires: float | None) -> None:
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)',
+                               (key, data, expires))
@@ -0,0 +1,342 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import functools
+import inspect
+import logging
+import random
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable
+
+from langchain_core.exceptions import OutputParserException
+
+from .ratelimit import RateLimitError, is_throttling_error, retry_after
+
+# Create a logger with the module name
+log = logging.getLogger(__name__)
+
+_RETRYABLE_STATUS_CODES = frozenset((408, 500, 502, 503, 504))
+_THROTTLED_STATUS_CODES = frozenset((429, 529))
+_RETRYABLE_ERROR_NAMES = frozenset(('APIConnectionError', 'APITimeoutError', 'InternalServerError',
+                                    'ServiceUnavailableError'))
+
+
+class ErrorClass(Enum):
+    """
+    How a retry policy treats an exception.
+    """
+    RETRYABLE = 'retryable'
+    """Transient failure, retried after a backoff delay."""
+    THROTTLED = 'throttled'
+    """Provider throttling, retried after at least the delay the provider asked for."""
+    FATAL = 'fatal'
+    """Permanent failure, raised immediately."""
+
+
+class RetryError(Exception):
+    """
+    Raised when a call is given up on after retryable failures.  The last failure is chained as the cause.
+    """
+
+    def __init__(self, message: str, *, attempts: int):
+        """
+        Construct a new instance.
+        :param message: The reason the call was given up on.
+        :param attempts: The number of attempts made.
+        """
+        super().__init__(message)
+        self.attempts: int = attempts
+
+
+def _status_code(error: BaseException) -> int | None:
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def classify_error(error: BaseException) -> ErrorClass:
+    """
+    Classify an exception for retrying: throttling signals, output parsing failures, timeouts, connection failures
+    and 5xx responses are retried, and anything else is fatal.
+    :param error: The exception.
+    :return: The error class.
+    """
+    if isinstance(error, RateLimitError) or is_throttling_error(error) or _status_code(error) in _THROTTLED_STATUS_CODES:
+        return ErrorClass.THROTTLED
+    if isinstance(error, (OutputParserException, TimeoutError, ConnectionError)):
+        return ErrorClass.RETRYABLE
+    if _status_code(error) in _RETRYABLE_STATUS_CODES or type(error).__name__ in _RETRYABLE_ERROR_NAMES:
+        return ErrorClass.RETRYABLE
+    return ErrorClass.FATAL
+
+
+def classify_by_types(errors: tuple[type[BaseException], ...]) -> Callable[[BaseException], ErrorClass]:
+    """
+    Get a classifier that retries only the given exception types.
+    :param errors: The exception types that are retried.
+    :return: The classifier.
+    """
+    def classify(error: BaseException) -> ErrorClass:
+        if not isinstance(error, errors):
+            return ErrorClass.FATAL
+        return ErrorClass.THROTTLED if classify_error(error) is ErrorClass.THROTTLED else ErrorClass.RETRYABLE
+    return classify
+
+
+class RetryBudget:
+    """
+    Process-wide cap on retries, so that a provider incident does not multiply the load on the provider.
+
+    Every call deposits `ratio` of a retry and every retry withdraws one, so retries stay within that fraction of
+    calls.  The budget also refills at `min_per_second` retries per second, so services with little traffic can
+    still retry, and holds at most `capacity` retries.
+    """
+
+    def __init__(self, *, ratio: float = 0.2, min_per_second: float = 10.0, capacity: float = 100.0):
+        """
+        Construct a new instance.
+        :param ratio: The retries allowed per call.
+        :param min_per_second: The retries allowed per second regardless of the number of calls.
+        :param capacity: The maximum number of retries saved up.
+        """
+        self.ratio: float = ratio
+        self.min_per_second: float = min_per_second
+        self.capacity: float = capacity
+        self._balance: float = capacity
+        self._updated: float = time.monotonic()
+        self._lock = threading.Lock()
+        self.exhausted: int = 0
+
+    @property
+    def balance(self) -> float:
+        """The number of retries currently allowed."""
+        with self._lock:
+            self._refill()
+            return self._balance
+
+    def deposit(self) -> None:
+        """
+        Record a call.
+        """
+        with self._lock:
+            self._refill()
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        Take one retry from the budget.
+        :return: True if the retry is allowed, otherwise False.
+        """
+        with self._lock:
+            self._refill()
+            if self._balance < 1:
+                self.exhausted += 1
+                return False
+            self._balance -= 1
+            return True
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._balance = min(self.capacity, self._balance + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+
+_retry_budget: RetryBudget = RetryBudget()
+
+
+def get_retry_budget() -> RetryBudget:
+    """
+    Get the process-wide retry budget.
+    :return: The retry budget.
+    """
+    return _retry_budget
+
+
+def set_retry_budget(budget: RetryBudget) -> RetryBudget:
+    """
+    Set the process-wide retry budget.
+    :param budget: The retry budget.
+    :return: The retry budget now in use.
+    """
+    global _retry_budget
+    _retry_budget = budget
+    return _retry_budget
+
+
+class RetryPolicy:
+    """
+    Retry engine with exponential backoff, jitter, error classification, an overall deadline and a retry budget.
+
+    The first retry waits about `initial_delay`, and each following retry waits `multiplier` times longer, up to
+    `max_delay`.  'full' jitter draws each delay uniformly between zero and that bound, and 'decorrelated' jitter
+    draws it between `initial_delay` and three times the previous delay.  Throttled calls wait at least as long as
+    the provider asked.  A retry that would end past the deadline, or that the retry budget does not allow, is not
+    made, and the call fails with a `RetryError` chained to the last failure.  Fatal errors are raised unchanged.
+    """
+
+    def __init__(self,
+                 *,
+                 max_retries: int = 3,
+                 initial_delay: float = 0.5,
+                 max_delay: float = 20.0,
+                 multiplier: float = 2.0,
+                 jitter: str = 'full',
+                 deadline: float | None = None,
+                 classify: Callable[[BaseException], ErrorClass] = classify_error,
+                 budget: RetryBudget | bool = True,
+                 ):
+        """
+        Construct a new instance.
+        :param max_retries: The maximum number of retries after the first attempt.
+        :param initial_delay: The delay before the first retry, in seconds.
+        :param max_delay: The longest delay between attempts, in seconds.
+        :param multiplier: The factor the delay grows by on each retry.
+        :param jitter: 'full', 'decorrelated', or 'none'.
+        :param deadline: The time allowed for a call including all of its retries, in seconds, or None for no limit.
+            Async calls are cancelled at the deadline; sync calls are only given up on between attempts.
+        :param classify: The function that classifies the exceptions of failed attempts.
+        :param budget: A retry budget, True for the process-wide budget, or False for no budget.
+        """
+        if jitter not in ('full', 'decorrelated', 'none'):
+            raise ValueError(f"Unknown jitter: {jitter}")
+        self.max_retries: int = max_retries
+        self.initial_delay: float = initial_delay
+        self.max_delay: float = max_delay
+        self.multiplier: float = multiplier
+        self.jitter: str = jitter
+        self.deadline: float | None = deadline
+        self.classify: Callable[[BaseException], ErrorClass] = classify
+        self.budget: RetryBudget | bool = budget
+
+    def __call__(self, func: Callable) -> Callable:
+        """
+        Decorate a function or coroutine function so that every call goes through this policy.
+        :param func: The function or coroutine function.
+        :return: The wrapped function.
+        """
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await self.acall(func, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return wrapper
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call a function, retrying failed attempts.
+        :param func: The function.
+        :param args: The positional arguments.
+        :param kwargs: The keyword arguments.
+        :return: The return value of the first successful attempt.
+        """
+        deadline = self._deadline()
+        budget = self._budget()
+        delay = None
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(e, attempts, delay, deadline, budget)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    async def acall(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call a coroutine function, retrying failed attempts without blocking the event loop.
+        :param func: The coroutine function.
+        :param args: The positional arguments.
+        :param kwargs: The keyword arguments.
+        :return: The return value of the first successful attempt.
+        """
+        deadline = self._deadline()
+        budget = self._budget()
+        delay = None
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                if deadline is None:
+                    return await func(*args, **kwargs)
+                return await asyncio.wait_for(func(*args, **kwargs), max(0.0, deadline - time.monotonic()))
+            except Exception as e:
+                if deadline is not None and isinstance(e, TimeoutError) and time.monotonic() >= deadline:
+                    raise RetryError(f"Deadline of {self.deadline}s exceeded.", attempts=attempts) from e
+                delay = self._next_delay(e, attempts, delay, deadline, budget)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def _deadline(self) -> float | None:
+        return None if self.deadline is None else time.monotonic() + self.deadline
+
+    def _budget(self) -> RetryBudget | None:
+        budget = get_retry_budget() if self.budget is True else self.budget or None
+        if budget is not None:
+            budget.deposit()
+        return budget
+
+    def _next_delay(self,
+                    error: Exception,
+                    attempts: int,
+                    prev_delay: float | None,
+                    deadline: float | None,
+                    budget: RetryBudget | None,
+                    ) -> float | None:
+        # Get the delay before the next attempt, None if the error is fatal, or raise if the call is given up on.
+        error_class = self.classify(error)
+        if error_class is ErrorClass.FATAL:
+            return None
+        if attempts > self.max_retries:
+            raise RetryError(f"Maximum number of retries ({self.max_retries}) exceeded.", attempts=attempts) from error
+
+        if self.jitter == 'decorrelated':
+            upper = self.initial_delay if prev_delay is None else prev_delay * 3
+            delay = random.uniform(self.initial_delay, max(self.initial_delay, upper))
+        else:
+            delay = self.initial_delay * self.multiplier ** (attempts - 1)
+            if self.jitter == 'full':
+                delay = random.uniform(0, min(self.max_delay, delay))
+        delay = min(self.max_delay, delay)
+        if error_class is ErrorClass.THROTTLED:
+            requested = getattr(error, 'retry_after', None)
+            if requested is None:
+                requested = retry_after(error)
+            if requested is not None:
+                delay = max(delay, requested)
+
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            raise RetryError(f"Deadline of {self.deadline}s exceeded.", attempts=attempts) from error
+        if budget is not None and not budget.withdraw():
+            raise RetryError("Retry budget exhausted.", attempts=attempts) from error
+        log.warning("Retrying in %.2fs after %s error: %s", delay, error_class.value, error)
+        return delay
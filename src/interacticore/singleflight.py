@@ -0,0 +1,122 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable
+
+# Handed to waiting callers when the call they share is abandoned without an outcome, so that one of them retries it.
+_ABANDONED = object()
+
+
+class SingleFlight:
+    """
+    Thread-safe coalescing of identical in-flight calls.
+
+    The first caller for a key runs the call, and callers that arrive with the same key before it finishes wait for
+    its outcome instead of repeating it.  Sync and async callers share calls.  If the running call is cancelled or
+    interrupted, a waiting caller runs it again.
+    """
+
+    def __init__(self):
+        """
+        Construct a new instance.
+        """
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls: int = 0
+        self.shared: int = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Run a call, or wait for the identical call already in flight.
+        :param key: The key identical calls share.
+        :param fn: The call.
+        :return: The value of the call, and whether it came from another caller's call.
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                return self._lead(key, future, fn), False
+            value = future.result()
+            if value is not _ABANDONED:
+                return value, True
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """
+        Run a call on the running event loop, or wait for the identical call already in flight.
+        :param key: The key identical calls share.
+        :param fn: The coroutine function of the call.
+        :return: The value of the call, and whether it came from another caller's call.
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                try:
+                    value = await fn()
+                except Exception as e:
+                    self._finish(key, future, error=e)
+                    raise
+                except BaseException:
+                    self._finish(key, future, _ABANDONED)
+                    raise
+                self._finish(key, future, value)
+                return value, False
+            # Shielded, so that a waiting caller that is cancelled does not cancel the call for the others.
+            value = await asyncio.shield(asyncio.wrap_future(future))
+            if value is not _ABANDONED:
+                return value, True
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.calls += 1
+            return future, True
+
+    def _lead(self, key: Hashable, future: Future, fn: Callable[[], Any]) -> Any:
+        try:
+            value = fn()
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            self._finish(key, future, _ABANDONED)
+            raise
+        self._finish(key, future, value)
+        return value
+
+    def _finish(self, key: Hashable, future: Future, value: Any = None, *, error: BaseException = None) -> None:
+        # Forget the call before publishing its outcome, so callers that arrive afterwards start a fresh call.
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
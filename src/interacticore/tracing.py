@@ -0,0 +1,80 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import zlib
+
+
+class TraceSampler:
+    """
+    Head-based sampling of LangSmith tracing for LangChainWrap calls.
+
+    Whether a call is traced is decided from a hash of its session ID, so the retries, hedges and failovers of a call
+    are traced together, and a sampled session is traced across all of its commands whose rate admits it.  Calls
+    that are not sampled skip tracing setup entirely.
+    """
+
+    def __init__(self, *, rate: float = 1.0, rates: dict[str, float] = None, project: str = None):
+        """
+        Construct a new instance.
+        :param rate: The fraction of calls traced, between 0 and 1, for command names without their own rate.
+        :param rates: The fraction of calls traced by command name.
+        :param project: The LangSmith project of sampled calls that do not name one with `lc_project`, or None for
+            the default project.
+        """
+        rates = rates or {}
+        for cmd_name, cmd_rate in [('*', rate), *rates.items()]:
+            if not 0 <= cmd_rate <= 1:
+                raise ValueError(f"rate must be between 0 and 1: {cmd_name}={cmd_rate}")
+        self.rate: float = rate
+        self.rates: dict[str, float] = rates
+        self.project: str | None = project
+
+    def rate_for(self, cmd_name: str) -> float:
+        """
+        Get the sampling rate of a command name.
+        :param cmd_name: The command name.
+        :return: The fraction of calls traced.
+        """
+        return self.rates.get(cmd_name, self.rate)
+
+    def sampled(self, session_id: str, cmd_name: str) -> bool:
+        """
+        Decide whether a call is traced.
+        :param session_id: The session ID of the call.
+        :param cmd_name: The command name of the call.
+        :return: True if the call is traced, otherwise False.
+        """
+        rate = self.rates.get(cmd_name, self.rate)
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        return zlib.crc32(str(session_id).encode('utf-8')) < rate * 0x100000000
+
+    def __str__(self):
+        return (f"TraceSampler(rate={self.rate}" +
+                f", rates={self.rates}" +
+                f", project={self.project}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
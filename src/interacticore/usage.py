@@ -0,0 +1,354 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import threading
+from typing import Any
+
+
+class ModelPrice:
+    """
+    Price of a model's tokens.
+    """
+
+    __slots__ = ('prompt', 'completion')
+
+    def __init__(self, prompt: float, completion: float):
+        """
+        Construct a new instance.
+        :param prompt: The price of a million prompt tokens.
+        :param completion: The price of a million completion tokens.
+        """
+        self.prompt: float = prompt
+        self.completion: float = completion
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """
+        Get the cost of a call.
+        :param prompt_tokens: The number of prompt tokens.
+        :param completion_tokens: The number of completion tokens.
+        :return: The cost.
+        """
+        return (prompt_tokens * self.prompt + completion_tokens * self.completion) / 1_000_000
+
+    def __str__(self):
+        return (f"ModelPrice(prompt={self.prompt}" +
+                f", completion={self.completion}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class Usage:
+    """
+    Token usage and cost of a set of model calls.
+    """
+
+    __slots__ = ('calls', 'prompt_tokens', 'completion_tokens', 'cost')
+
+    def __init__(self):
+        """
+        Construct a new instance.
+        """
+        self.calls: int = 0
+        self.prompt_tokens: int = 0
+        self.completion_tokens: int = 0
+        self.cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        """The number of prompt and completion tokens."""
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, other: 'Usage') -> None:
+        """
+        Add the usage of other calls to this usage.
+        :param other: The other usage.
+        """
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost += other.cost
+
+    def copy(self) -> 'Usage':
+        """
+        Get a copy of this usage.
+        :return: The copy.
+        """
+        usage = Usage()
+        usage.add(self)
+        return usage
+
+    def __str__(self):
+        return (f"Usage(calls={self.calls}" +
+                f", prompt_tokens={self.prompt_tokens}" +
+                f", completion_tokens={self.completion_tokens}" +
+                f", cost={self.cost}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class UsageBudget:
+    """
+    Limit on the token usage or cost of a session.
+    """
+
+    def __init__(self, *, max_tokens: int = None, max_cost: float = None, downgrade: dict[str, Any] = None):
+        """
+        Construct a new instance.
+        :param max_tokens: The most prompt and completion tokens a session may use, or None for no limit.
+        :param max_cost: The most a session may cost, or None for no limit.
+        :param downgrade: The models that calls of a session over budget run on instead, by model, 'chat' or 'llm'.
+            Calls on a model without a downgrade are rejected.
+        """
+        self.max_tokens: int | None = max_tokens
+        self.max_cost: float | None = max_cost
+        self.downgrade: dict[str, Any] = downgrade or {}
+
+    def exceeded(self, usage: Usage) -> bool:
+        """
+        Check whether usage has reached the budget.
+        :param usage: The usage of a session.
+        :return: True if the session is over budget, otherwise False.
+        """
+        return ((self.max_tokens is not None and usage.total_tokens >= self.max_tokens) or
+                (self.max_cost is not None and usage.cost >= self.max_cost))
+
+    def __str__(self):
+        return (f"UsageBudget(max_tokens={self.max_tokens}" +
+                f", max_cost={self.max_cost}" +
+                f", downgrade={list(self.downgrade)}" +
+                ")")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class BudgetExceededError(Exception):
+    """
+    Raised when a call is rejected because its session is over budget.
+    """
+
+    def __init__(self, message: str, *, session_id: str, usage: Usage, budget: UsageBudget):
+        """
+        Construct a new instance.
+        :param message: The error message.
+        :param session_id: The session ID.
+        :param usage: The usage of the session.
+        :param budget: The budget the session is over.
+        """
+        super().__init__(message)
+        self.session_id: str = session_id
+        self.usage: Usage = usage
+        self.budget: UsageBudget = budget
+
+
+class _Stripe:
+    __slots__ = ('lock', 'sessions', 'commands')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions: dict[str, Usage] = {}
+        self.commands: dict[tuple[str, str], Usage] = {}
+
+
+class UsageLedger:
+    """
+    Thread-safe accounting of the tokens and cost of model calls by session and command name, with optional
+    per-session budgets.
+
+    Sessions are spread over independently locked stripes, so calls of different sessions rarely wait on each other
+    and a session's budget is checked under a single lock.  Totals across sessions are summed when read.
+    """
+
+    def __init__(self,
+                 *,
+                 prices: dict[str, ModelPrice] = None,
+                 budget: UsageBudget = None,
+                 stripes: int = 16,
+                 ):
+        """
+        Construct a new instance.
+        :param prices: The prices of model tokens by model name.  Calls on models without a price cost nothing.
+        :param budget: The budget of sessions without their own, or None for no limit.
+        :param stripes: The number of independently locked partitions of the sessions.
+        """
+        if stripes < 1:
+            raise ValueError(f"stripes must be positive: {stripes}")
+        self.prices: dict[str, ModelPrice] = prices or {}
+        self.budget: UsageBudget | None = budget
+        self._budgets: dict[str, UsageBudget] = {}
+        self._stripes: tuple[_Stripe, ...] = tuple(_Stripe() for _ in range(stripes))
+
+    def set_budget(self, session_id: str, budget: UsageBudget | None) -> None:
+        """
+        Set the budget of a session.
+        :param session_id: The session ID.
+        :param budget: The budget, or None to use the ledger's budget.
+        """
+        if budget is None:
+            self._budgets.pop(session_id, None)
+        else:
+            self._budgets[session_id] = budget
+
+    def budget_for(self, session_id: str) -> UsageBudget | None:
+        """
+        Get the budget of a session.
+        :param session_id: The session ID.
+        :return: The budget, or None if the session has no limit.
+        """
+        return self._budgets.get(session_id, self.budget)
+
+    def over_budget(self, session_id: str) -> UsageBudget | None:
+        """
+        Check whether a session has reached its budget.
+        :param session_id: The session ID.
+        :return: The budget the session is over, or None if it may make more calls.
+        """
+        budget = self._budgets.get(session_id, self.budget)
+        if budget is None:
+            return None
+        stripe = self._stripe(session_id)
+        with stripe.lock:
+            usage = stripe.sessions.get(session_id)
+            return budget if usage is not None and budget.exceeded(usage) else None
+
+    def record(self, session_id: str, cmd_name: str, model: str | None, prompt_tokens: int,
+               completion_tokens: int) -> float:
+        """
+        Record the usage of a model call.
+        :param session_id: The session ID.
+        :param cmd_name: The command name.
+        :param model: The model name, which selects its price.
+        :param prompt_tokens: The number of prompt tokens.
+        :param completion_tokens: The number of completion tokens.
+        :return: The cost of the call.
+        """
+        price = self.prices.get(model) if model is not None else None
+        cost = price.cost(prompt_tokens, completion_tokens) if price is not None else 0.0
+        stripe = self._stripe(session_id)
+        with stripe.lock:
+            session_usage = self._usage(stripe.sessions, session_id)
+            for usage in (session_usage, self._usage(stripe.commands, (session_id, cmd_name))):
+                usage.calls += 1
+                usage.prompt_tokens += prompt_tokens
+                usage.completion_tokens += completion_tokens
+                usage.cost += cost
+        return cost
+
+    def usage(self, session_id: str = None, cmd_name: str = None) -> Usage:
+        """
+        Get a snapshot of usage, for one session, one command name, one command name in one session, or everything.
+        :param session_id: The session ID, or None for all sessions.
+        :param cmd_name: The command name, or None for all command names.
+        :return: The usage.
+        """
+        total = Usage()
+        stripes = self._stripes if session_id is None else (self._stripe(session_id),)
+        for stripe in stripes:
+            with stripe.lock:
+                if cmd_name is None and session_id is not None:
+                    usage = stripe.sessions.get(session_id)
+                    if usage is not None:
+                        total.add(usage)
+                    continue
+                for (usage_session_id, usage_cmd_name), usage in stripe.commands.items():
+                    if (session_id is None or usage_session_id == session_id) and (
+                            cmd_name is None or usage_cmd_name == cmd_name):
+                        total.add(usage)
+        return total
+
+    def sessions(self) -> dict[str, Usage]:
+        """
+        Get a snapshot of the usage of every session.
+        :return: The usage by session ID.
+        """
+        sessions = {}
+        for stripe in self._stripes:
+            with stripe.lock:
+                sessions.update((session_id, usage.copy()) for session_id, usage in stripe.sessions.items())
+        return sessions
+
+    def forget(self, session_id: str) -> Usage:
+        """
+        Drop the usage and budget of a finished session.
+        :param session_id: The session ID.
+        :return: The final usage of the session.
+        """
+        self._budgets.pop(session_id, None)
+        stripe = self._stripe(session_id)
+        with stripe.lock:
+            usage = stripe.sessions.pop(session_id, None) or Usage()
+            for key in [key for key in stripe.commands if key[0] == session_id]:
+                del stripe.commands[key]
+        return usage
+
+    def _stripe(self, session_id: str) -> _Stripe:
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
+    @staticmethod
+    def _usage(usages: dict, key) -> Usage:
+        usage = usages.get(key)
+        if usage is None:
+            usage = usages[key] = Usage()
+        return usage
+
+
+def token_usage(response: Any) -> tuple[int, int] | None:
+    """
+    Get the token usage a model reported for a call, from message usage metadata, message response metadata, or the
+    model's output, whichever is present.
+    :param response: The LLMResult of the call.
+    :return: The prompt and completion tokens, or None if the model reported no usage.
+    """
+    prompt_tokens = completion_tokens = 0
+    found = False
+    for generations in getattr(response, 'generations', None) or []:
+        for generation in generations:
+            message = getattr(generation, 'message', None)
+            usage = getattr(message, 'usage_metadata', None)
+            if not usage:
+                metadata = getattr(message, 'response_metadata', None) or {}
+                usage = metadata.get('token_usage') or metadata.get('usage')
+            tokens = _tokens(usage)
+            if tokens is not None:
+                prompt_tokens += tokens[0]
+                completion_tokens += tokens[1]
+                found = True
+    if found:
+        return prompt_tokens, completion_tokens
+    output = getattr(response, 'llm_output', None) or {}
+    return _tokens(output.get('token_usage') or output.get('usage'))
+
+
+def _tokens(usage: Any) -> tuple[int, int] | None:
+    if not usage:
+        return None
+    if not isinstance(usage, dict):
+        usage = vars(usage) if hasattr(usage, '__dict__') else {}
+    prompt_tokens = usage.get('prompt_tokens', usage.get('input_tokens'))
+    completion_tokens = usage.get('completion_tokens', usage.get('output_tokens'))
+    if prompt_tokens is None and completion_tokens is None:
+        return None
+    return int(prompt_tokens or 0), int(completion_tokens or 0)
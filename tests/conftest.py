@@ -0,0 +1,43 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from typing import Callable
+
+import pytest
+
+from interacticore.commands import ChatCommand
+from interacticore.parsers import BrokenJsonOutputParser
+
+
+@pytest.fixture
+def make_command() -> Callable[..., ChatCommand]:
+    """
+    Factory for the utterance-generating command the client tests execute.
+    Keyword arguments override the ChatCommand defaults; a fresh parser is used unless output_parser is given.
+    """
+    def make(amount: int = 2, **kwargs) -> ChatCommand:
+        kwargs.setdefault("cmd_name", "gen_utterances")
+        kwargs.setdefault("sys_prompt", "You generate utterances.")
+        if "output_parser" not in kwargs:
+            kwargs["output_parser"] = BrokenJsonOutputParser()
+        return ChatCommand(user_prompt_tmpl="Generate {amount} utterances.", inputs={"amount": amount}, **kwargs)
+    return make
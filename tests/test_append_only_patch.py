@@ -0,0 +1,95 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import jsonpatch
+import pytest
+
+from interacticore.parsers import BrokenJsonOutputParser
+from interacticore.parsers.appendonlypatch import make_append_only_patch
+
+
+@pytest.mark.parametrize("test_name, prev, next, expected", [
+    ("First parse", None, {"a": 1},
+     [{"op": "replace", "path": "", "value": {"a": 1}}]),
+    ("Unchanged", {"utterances": ["Thanks!"]}, {"utterances": ["Thanks!"]},
+     []),
+    ("String grows", {"utterances": ["Tha"]}, {"utterances": ["Thanks!"]},
+     [{"op": "replace", "path": "/utterances/0", "value": "Thanks!"}]),
+    ("Array items added", {"utterances": ["Thanks!"]}, {"utterances": ["Thanks!", "Cheers.", "Ta"]},
+     [{"op": "add", "path": "/utterances/1", "value": "Cheers."},
+      {"op": "add", "path": "/utterances/2", "value": "Ta"}]),
+    ("Keys added", {"a": 1}, {"a": 12, "b/c": [], "d~": None},
+     [{"op": "replace", "path": "/a", "value": 12},
+      {"op": "add", "path": "/b~1c", "value": []},
+      {"op": "add", "path": "/d~0", "value": None}]),
+    ("Number becomes float", [1], [1.5],
+     [{"op": "replace", "path": "/0", "value": 1.5}]),
+    ("Nested", {"a": [{"b": "x"}]}, {"a": [{"b": "xy", "c": 1}, {}]},
+     [{"op": "replace", "path": "/a/0/b", "value": "xy"},
+      {"op": "add", "path": "/a/0/c", "value": 1},
+      {"op": "add", "path": "/a/1", "value": {}}]),
+])
+def test_make_append_only_patch(test_name: str, prev, next, expected):
+    result = make_append_only_patch(prev, next)
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+    if prev is not None:
+        assert jsonpatch.apply_patch(prev, result) == next
+
+
+@pytest.mark.parametrize("test_name, prev, next", [
+    ("Array shrinks", [1, 2], [1]),
+    ("Key replaced", {"a": 1}, {"b": 1}),
+    ("Nested object shrinks", {"a": {"b": 1, "c": 2}}, {"a": {"b": 1}}),
+])
+def test_make_append_only_patch_not_extension(test_name: str, prev, next):
+    result = make_append_only_patch(prev, next)
+    if result is not None:
+        print(f"{test_name}: result: {result}")
+    assert result is None
+
+
+@pytest.mark.parametrize("test_name, in_str", [
+    ("Repeated key", '{"a": 1, "b": 2, "a": 3, "c": 4}'),
+    ("Repeated key with open value", '{"a": [1], "b": 2, "a": [3, {"d": "xyz"}], "c": 4}'),
+    ("Nested repeated key", '{"x": {"a": "1", "b": 2, "a": "345"}, "y": [1, 2]}'),
+    ("Repeated single-quoted key", "{'a': 1, \"b\": 2, 'a': 3}"),
+    ("Repeated escaped key", '{"a\\nb": 1, "c": 2, "a\\u000ab": 3, "d": 4}'),
+    ("Same key in another object", '{"a": {"a": 1}, "b": {"a": 2}}'),
+])
+@pytest.mark.parametrize("size", [1, 3, 7])
+@pytest.mark.parametrize("diff", [False, True])
+def test_stream_repeated_key(test_name: str, in_str: str, size: int, diff: bool):
+    chunks = [in_str[i:i + size] for i in range(0, len(in_str), size)]
+    parser = BrokenJsonOutputParser(diff=diff)
+    outputs = list(parser.transform(iter(chunks)))
+    if diff:
+        document = None
+        for patch in outputs:
+            document = jsonpatch.apply_patch(document, patch)
+    else:
+        document = outputs[-1]
+    expected = parser.parse(in_str)
+    if document != expected:
+        print(f"{test_name}: result: {document}")
+    assert document == expected
@@ -82,3 +82,65 @@ def test_parse_json_markdown(test_name: str, in_str: str):
     json_result = parse_json_markdown(in_str)
     print(f"test_name: {test_name}, json_result: {json_result}")
     assert True
+
+
+@pytest.mark.parametrize("test_name, in_str, expected", [
+    ("Valid",
+     """{"utterances": ["I said 'thanks' twice", "Cheers."]}""",
+     {"utterances": ["I said 'thanks' twice", "Cheers."]}),
+    ("Top-level array",
+     """[{"utterance": "Thanks!"}, {"utterance": "Cheers."}]""",
+     [{"utterance": "Thanks!"}, {"utterance": "Cheers."}]),
+    ("Fenced with header",
+     """Here you go:
+```json
+{"utterances": ["Thanks!"]}
+```""",
+     {"utterances": ["Thanks!"]}),
+    ("Single quotes",
+     """```json
+{'utterances': ['Thanks!', 'That was weally he'pful.', 'He said "cheers"']}
+```""",
+     {"utterances": ["Thanks!", "That was weally he'pful.", 'He said "cheers"']}),
+    ("Unescaped action_input",
+     """{"action": "Final Answer", "action_input": "line 1
+line 2\tcolumn"}""",
+     {"action": "Final Answer", "action_input": "line 1\nline 2\tcolumn"}),
+    ("Truncated",
+     """```json
+{"utterances": ["Thanks!", 'Chee""",
+     {"utterances": ["Thanks!", "Chee"]}),
+])
+def test_parse_json_markdown_result(test_name: str, in_str: str, expected):
+    json_result = parse_json_markdown(in_str)
+    if json_result != expected:
+        print(f"{test_name}: json_result: {json_result}")
+    assert json_result == expected
+
+
+@pytest.mark.parametrize("test_name, in_str, expected", [
+    ("Plain",
+     """{"utterances": ["Thanks!", "Merci beaucoup ✨"]}""",
+     {"utterances": ["Thanks!", "Merci beaucoup ✨"]}),
+    ("Fenced with header",
+     """Voilà:
+```json
+{"utterances": ["Danke schön!"]}
+```""",
+     {"utterances": ["Danke schön!"]}),
+    ("Single quotes",
+     """```json
+{'utterances': ['Thanks!', 'That was weally he'pful.']}
+```""",
+     {"utterances": ["Thanks!", "That was weally he'pful."]}),
+    ("Truncated",
+     """```json
+{"utterances": ["Thanks!", 'Grazie mil""",
+     {"utterances": ["Thanks!", "Grazie mil"]}),
+])
+@pytest.mark.parametrize("buffer_type", [bytes, bytearray, memoryview])
+def test_parse_json_markdown_buffer(test_name: str, in_str: str, expected, buffer_type):
+    json_result = parse_json_markdown(buffer_type(in_str.encode("utf-8")))
+    if json_result != expected:
+        print(f"{test_name}: json_result: {json_result}")
+    assert json_result == expected
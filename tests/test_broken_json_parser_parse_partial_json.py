@@ -0,0 +1,58 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+
+import pytest
+
+from interacticore.parsers.brokenjsonparser import parse_partial_json
+
+
+@pytest.mark.parametrize("test_name, in_str, expected", [
+    ("Complete", '{"utterances": ["Thanks!", "Cheers."]}', {"utterances": ["Thanks!", "Cheers."]}),
+    ("Open string", '{"utterances": ["Thanks!", "Chee', {"utterances": ["Thanks!", "Chee"]}),
+    ("Open key", '{"utterances": ["Thanks!"], "ot', {"utterances": ["Thanks!"]}),
+    ("Dangling colon", '{"a": 1, "b":', {"a": 1}),
+    ("Dangling comma", '{"a": [1, 2,', {"a": [1, 2]}),
+    ("Partial literal", '{"a": [1, 2, tru', {"a": [1, 2]}),
+    ("Partial number", '{"a": [1, 2.', {"a": [1, 2]}),
+    ("Nested", '{"a": [1, {"b": 2}, {"c', {"a": [1, {"b": 2}, {}]}),
+    ("Raw newline", '{"a": "line 1\nline 2', {"a": "line 1\nline 2"}),
+    ("Dangling escape", '{"a": "quote \\', {"a": "quote "}),
+    ("Partial unicode escape", '{"a": "caf\\u00', {"a": "caf"}),
+    ("Trailing text", '{"a": 1} and that is all', {"a": 1}),
+    ("Missing comma", '{"a": 1, "b": [1, 2 3', {"a": 1, "b": [1, 2]}),
+])
+def test_parse_partial_json(test_name: str, in_str: str, expected):
+    result = parse_partial_json(in_str)
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+
+
+def test_parse_partial_json_mismatched():
+    assert parse_partial_json('{"a": [1, 2}') is None
+
+
+def test_parse_partial_json_unrepairable():
+    with pytest.raises(json.JSONDecodeError):
+        parse_partial_json('{"a": 1, "b": [1, 2 3]}')
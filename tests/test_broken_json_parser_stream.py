@@ -0,0 +1,193 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import pytest
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers.transform import BaseCumulativeTransformOutputParser
+
+from interacticore.parsers.brokenjsonparser import BrokenJsonOutputParser
+
+
+def _chunked(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("test_name, in_str", [
+    ("Plain",
+     """{"utterances": ["Thanks a ton, you rock!", "Really appreciate the help.", "You're the best!"]}"""),
+    ("Fenced",
+     """```json
+{
+  "utterances": [
+    "Thanks a ton, you rock!",
+    "Really appreciate the \\"help\\".",
+    "Couldn't have done it without ya, thanks!"
+  ]
+}
+```"""),
+    ("Header",
+     """Here is the response formatted as the specified JSON schema:
+
+{
+  "utterances": [
+    "Thanks a ton, you rock!",
+    "Really appreciate the help.   ",
+    "Couldn't have done it without ya, thanks!"
+  ]
+}"""),
+    ("Single quotes",
+     """```json
+{"utterances": [
+    "Fank you, bot!",
+    'I weally appweeciate youw help.',
+    'That was weally he'pful.'
+]}
+```"""),
+    ("Fence inside value",
+     """{"utterances": ["Use ```json fences", "Thanks!"]}"""),
+])
+@pytest.mark.parametrize("size", [1, 3, 16])
+def test_stream_matches_cumulative(test_name: str, in_str: str, size: int):
+    parser = BrokenJsonOutputParser()
+    chunks = _chunked(in_str, size)
+    expected = list(BaseCumulativeTransformOutputParser._transform(parser, iter(chunks)))
+    result = list(parser.transform(iter(chunks)))
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+
+
+def test_stream_diff():
+    parser = BrokenJsonOutputParser(diff=True)
+    chunks = _chunked('{"utterances": ["Thanks!", "Cheers."]}', 4)
+    expected = list(BaseCumulativeTransformOutputParser._transform(parser, iter(chunks)))
+    assert list(parser.transform(iter(chunks))) == expected
+
+
+@pytest.mark.parametrize("test_name, in_str, expected", [
+    ("Array elements",
+     '{"utterances": ["Thanks!", \'That was he\'pful.\']}',
+     [(("utterances", 0), "Thanks!"),
+      (("utterances", 1), "That was he'pful."),
+      (("utterances",), ["Thanks!", "That was he'pful."])]),
+    ("Nested members",
+     '```json\n{"a": {"b": [1, true]}, "c": null}\n```',
+     [(("a", "b", 0), 1),
+      (("a", "b", 1), True),
+      (("a", "b"), [1, True]),
+      (("a",), {"b": [1, True]}),
+      (("c",), None)]),
+    ("Truncated",
+     '{"utterances": ["Thanks!", "Chee',
+     [(("utterances", 0), "Thanks!")]),
+])
+@pytest.mark.parametrize("size", [1, 5, 64])
+def test_stream_element_events(test_name: str, in_str: str, expected, size: int):
+    parser = BrokenJsonOutputParser(element_events=True)
+    result = [(event.path, event.value) for event in parser.transform(iter(_chunked(in_str, size)))]
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+
+
+def _paths(value, path=()):
+    if isinstance(value, dict):
+        members = value.items()
+    elif isinstance(value, list):
+        members = enumerate(value)
+    else:
+        return
+    for key, member in members:
+        yield from _paths(member, path + (key,))
+        yield path + (key,), member
+
+
+@pytest.mark.parametrize("test_name, in_str", [
+    ("Repeated key", '{"c": 1, "c": 2, "d": [1,2]}'),
+    ("Repeated key with container", '{"c": [1, {"e": 2}], "d": 3, "c": [1, {"e": 4}, 5]}'),
+    ("Repeated key in open container", '{"a": {"b": 1, "c": 2, "b": 3}, "d": [4]}'),
+    ("Repeated key in array", '{"a": [{"b": 1, "b": true}, {"b": 2}]}'),
+    ("Repeated key of another type", '{"a": {"b": 1}, "a": [1], "a": "x"}'),
+])
+@pytest.mark.parametrize("size", [1, 4, 64])
+def test_stream_element_events_repeated_key(test_name: str, in_str: str, size: int):
+    parser = BrokenJsonOutputParser(element_events=True)
+    latest = {}
+    for event in parser.transform(iter(_chunked(in_str, size))):
+        latest[event.path] = event.value
+    expected = dict(_paths(parser.parse(in_str)))
+    # A replaced member is reported again, so the last event for each path holds the final value.
+    result = {path: latest.get(path) for path in expected}
+    if result != expected:
+        print(f"{test_name}: result: {latest}")
+    assert result == expected
+
+
+def test_stream_element_events_arrive_early():
+    parser = BrokenJsonOutputParser(element_events=True)
+    received = []
+
+    def chunks():
+        for chunk in _chunked('{"utterances": ["Thanks!", "Cheers.", "Much obliged."]}', 4):
+            received.append(chunk)
+            yield chunk
+
+    first = next(iter(parser.transform(chunks())))
+    assert first.pointer == "/utterances/0"
+    assert first.value == "Thanks!"
+    assert "Cheers." not in "".join(received)
+
+
+@pytest.mark.parametrize("size", [1, 2, 7])
+def test_stream_byte_chunks(size: int):
+    in_str = '```json\n{"utterances": ["Merci ✨", "Danke schön!"]}\n```'
+    parser = BrokenJsonOutputParser()
+    result = list(parser.transform(iter(_chunked(in_str.encode("utf-8"), size))))
+    assert result[-1] == {"utterances": ["Merci ✨", "Danke schön!"]}
+    assert all("\ufffd" not in value for parsed in result for value in parsed.get("utterances", []))
+
+
+def test_parse_buffer():
+    parser = BrokenJsonOutputParser()
+    assert parser.parse(memoryview(b'{"utterances": ["Gr\xc3\xbc\xc3\x9fe"]}')) == {"utterances": ["Grüße"]}
+    with pytest.raises(OutputParserException):
+        parser.parse(b"not json")
+
+
+@pytest.mark.parametrize("test_name, in_bytes", [
+    ("Valid JSON", b'{"utterances": ["Gr\xfc\xdfe"]}'),
+    ("Fenced", b'```json\n{"utterances": ["Gr\xfc\xdfe"]}\n```'),
+    ("Needs repair", b"{'utterances': ['Gr\xfc\xdfe'"),
+])
+def test_parse_invalid_utf8(test_name: str, in_bytes: bytes):
+    parser = BrokenJsonOutputParser()
+    with pytest.raises(OutputParserException) as error:
+        parser.parse(in_bytes)
+    assert "Gr\ufffd\ufffde" in error.value.llm_output, f"{test_name}: result: {error.value.llm_output}"
+
+
+def test_stream_invalid_utf8():
+    parser = BrokenJsonOutputParser()
+    with pytest.raises(OutputParserException):
+        list(parser.transform(iter([b'{"utterances": ["Gr', b'\xfc\xdfe"]}'])))
@@ -0,0 +1,66 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from interacticore import ChainCache, get_chain_cache, set_chain_cache
+from interacticore.parsers import BrokenJsonOutputParser
+
+
+@pytest.fixture
+def chain_cache():
+    previous = get_chain_cache()
+    cache = set_chain_cache(ChainCache(max_entries=2))
+    yield cache
+    set_chain_cache(previous)
+
+
+def test_chain_shared_across_commands(chain_cache: ChainCache, make_command):
+    model = FakeListChatModel(responses=['{"utterances": []}'])
+    parser = BrokenJsonOutputParser()
+    chain = make_command(output_parser=parser).get_chain(model)
+    assert make_command(output_parser=parser).get_chain(model) is chain
+    assert (chain_cache.hits, chain_cache.misses) == (1, 1)
+
+
+def test_chain_keyed_by_prompt_model_and_parser(chain_cache: ChainCache, make_command):
+    model = FakeListChatModel(responses=['{"utterances": []}'])
+    parser = BrokenJsonOutputParser()
+    chain = make_command(output_parser=parser).get_chain(model)
+    assert make_command(output_parser=parser, sys_prompt="Other").get_chain(model) is not chain
+    assert make_command(output_parser=BrokenJsonOutputParser()).get_chain(model) is not chain
+    assert make_command(output_parser=parser).get_chain(FakeListChatModel(responses=[])) is not chain
+    assert len(chain_cache) == 2
+    assert chain_cache.evictions == 2
+
+
+def test_chain_cache_disabled(make_command):
+    previous = get_chain_cache()
+    set_chain_cache(None)
+    try:
+        model = FakeListChatModel(responses=['{"utterances": []}'])
+        parser = BrokenJsonOutputParser()
+        assert make_command(output_parser=parser).get_chain(model) is not make_command(parser).get_chain(model)
+    finally:
+        set_chain_cache(previous)
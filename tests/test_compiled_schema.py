@@ -0,0 +1,120 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+import pytest
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.pydantic_v1 import BaseModel, Field
+
+from interacticore.parsers.brokenjsonparser import BrokenJsonOutputParser, parse_and_check_json_markdown
+from interacticore.parsers.compiledschema import compile_schema
+
+
+class Utterances(BaseModel):
+    intent: str = Field(alias="intentName")
+    utterances: list[str]
+    count: int = 0
+
+
+def _chunked(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_compile_schema_shared():
+    assert compile_schema(Utterances, ("extra",)) is compile_schema(Utterances, ("extra",))
+    assert compile_schema(Utterances, ("extra",)).required_keys == ("extra", "intentName", "utterances")
+
+
+@pytest.mark.parametrize("test_name, in_obj, open_depth, expected", [
+    ("Complete document", {"intentName": "thanks"}, 0, True),
+    ("Missing key", {"intentName": "thanks"}, 1, False),
+    ("All keys", {"intentName": "thanks", "utterances": ["Thanks!"]}, 1, True),
+    ("Last key still open", {"intentName": "thanks", "utterances": ["Thanks!"]}, 2, False),
+    ("Other key still open", {"utterances": ["Thanks!"], "intentName": "thanks", "notes": []}, 2, True),
+    ("Top-level array", [{"intentName": "thanks"}], 1, False),
+])
+def test_is_complete(test_name: str, in_obj, open_depth: int, expected: bool):
+    result = compile_schema(Utterances).is_complete(in_obj, open_depth)
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+
+
+def test_parse_and_check_json_markdown():
+    assert parse_and_check_json_markdown('{"a": 1, "b": 2}', ["a", "b"]) == {"a": 1, "b": 2}
+    with pytest.raises(OutputParserException, match="Expected key `b`"):
+        parse_and_check_json_markdown('```json\n{"a": 1}\n```', ["a", "b"])
+
+
+def test_parse_validate_output():
+    parser = BrokenJsonOutputParser(pydantic_object=Utterances, validate_output=True)
+    result = parser.parse('```json\n{"intentName": "thanks", "utterances": [\'Ta!\']}\n```')
+    assert result == Utterances(intentName="thanks", utterances=["Ta!"])
+    with pytest.raises(OutputParserException, match="Failed to parse Utterances"):
+        parser.parse('{"intentName": "thanks", "utterances": "Ta!"}')
+
+
+def test_parse_expected_keys():
+    parser = BrokenJsonOutputParser(expected_keys=["utterances"])
+    assert parser.parse('{"utterances": []}') == {"utterances": []}
+    with pytest.raises(OutputParserException, match="Expected key `utterances`"):
+        parser.parse('{"intent": "thanks"}')
+
+
+@pytest.mark.parametrize("element_events", [False, True])
+@pytest.mark.parametrize("size", [1, 4, 16])
+def test_stream_early_stop(element_events: bool, size: int):
+    text = '{"intentName": "thanks", "utterances": ["Thanks!", "Cheers."], "notes": "Never needed"}'
+    parser = BrokenJsonOutputParser(pydantic_object=Utterances, early_stop=True, element_events=element_events)
+    received = []
+
+    def chunks():
+        for chunk in _chunked(text, size):
+            received.append(chunk)
+            yield chunk
+
+    result = list(parser.transform(chunks()))
+    assert "Never" not in "".join(received)
+    if element_events:
+        assert result[-1].path == ("utterances",)
+    else:
+        assert result[-1] == {"intentName": "thanks", "utterances": ["Thanks!", "Cheers."]}
+
+
+def test_astream_early_stop():
+    text = '```json\n{"utterances": ["Thanks!"], "intentName": "thanks", "notes": "Never needed"}\n```'
+    parser = BrokenJsonOutputParser(pydantic_object=Utterances, early_stop=True)
+    received = []
+
+    async def chunks():
+        for chunk in _chunked(text, 3):
+            received.append(chunk)
+            yield chunk
+
+    async def collect():
+        return [output async for output in parser.atransform(chunks())]
+
+    result = asyncio.run(collect())
+    assert "Never" not in "".join(received)
+    assert result[-1] == {"utterances": ["Thanks!"], "intentName": "thanks"}
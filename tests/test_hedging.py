@@ -0,0 +1,135 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from interacticore import HedgePolicy, LangChainWrap
+from interacticore.commands import ChatCommand
+
+
+class _StragglerCommand(ChatCommand):
+    """Command whose first request straggles, or whose requests to the slow client do."""
+
+    def __init__(self, slow_client: LangChainWrap = None):
+        super().__init__(cmd_name="thanks", sys_prompt="", user_prompt_tmpl="Go", inputs={})
+        self.slow_client = slow_client
+        self.requests = []
+        self.cancelled = []
+
+    def _delay(self, client: LangChainWrap) -> float:
+        self.requests.append(client)
+        if self.slow_client is not None:
+            return 1.0 if client is self.slow_client else 0.0
+        return 1.0 if len(self.requests) == 1 else 0.0
+
+    def run(self, client: LangChainWrap, **kwargs):
+        delay = self._delay(client)
+        time.sleep(delay)
+        self.result = "straggler" if delay else "hedge"
+        return self
+
+    async def arun(self, client: LangChainWrap, **kwargs):
+        delay = self._delay(client)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(client)
+            raise
+        self.result = "straggler" if delay else "hedge"
+        return self
+
+
+def _policy(**kwargs) -> HedgePolicy:
+    policy = HedgePolicy(percentile=0.5, max_hedge_rate=1, min_samples=1, **kwargs)
+    policy.record("thanks", 0.02)
+    return policy
+
+
+def test_execute_hedged():
+    policy = _policy()
+    client = LangChainWrap(chat=FakeListChatModel(responses=[]), hedge_policy=policy)
+    cmd = _StragglerCommand()
+    start = time.monotonic()
+    assert client.execute(cmd) is cmd
+    assert time.monotonic() - start < 0.5
+    assert cmd.result == "hedge"
+    assert (policy.stats.calls, policy.stats.hedges, policy.stats.wins) == (1, 1, 1)
+    assert policy.stats_for("thanks").win_rate == 1.0
+
+
+def test_aexecute_hedged_to_secondary():
+    secondary = LangChainWrap(chat=FakeListChatModel(responses=[]))
+    policy = _policy(secondary=secondary)
+    client = LangChainWrap(chat=FakeListChatModel(responses=[]), hedge_policy=policy)
+    cmd = _StragglerCommand(slow_client=client)
+    assert asyncio.run(client.aexecute(cmd)).result == "hedge"
+    assert cmd.requests == [client, secondary]
+    assert cmd.cancelled == [client]
+    assert policy.stats.wins == 1
+
+
+def test_hedge_rate_cap():
+    policy = _policy()
+    policy.max_hedge_rate = 0
+    client = LangChainWrap(chat=FakeListChatModel(responses=[]), hedge_policy=policy)
+    cmd = _StragglerCommand()
+    assert asyncio.run(client.aexecute(cmd)).result == "straggler"
+    assert len(cmd.requests) == 1
+    assert policy.stats.hedges == 0
+
+
+def test_no_hedge_without_samples():
+    policy = HedgePolicy(min_samples=3)
+    assert policy.delay_for("thanks") is None
+    for latency in (0.3, 0.1, 0.2):
+        policy.record("thanks", latency)
+    assert policy.delay_for("thanks") == 0.3
+    assert policy.stats.calls == 2
+
+
+def test_abandoned_primary_is_recorded():
+    # With a window of two, the 0.99 percentile is the slower of the seeded latency and the one recorded.
+    policy = HedgePolicy(percentile=0.99, max_hedge_rate=1, min_samples=1, window=2)
+    policy.record("thanks", 0.02)
+    client = LangChainWrap(chat=FakeListChatModel(responses=[]), hedge_policy=policy)
+    cmd = client.execute(_StragglerCommand())
+    assert cmd.result == "hedge"
+    assert cmd.exec_time >= 0.02
+    deadline = time.monotonic() + 5
+    while policy.delay_for("thanks") < 1.0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert policy.delay_for("thanks") >= 1.0
+
+
+def test_cancelled_primary_is_recorded():
+    # With a window of two, the 0.5 percentile is the faster of the seeded latency and the one recorded.
+    policy = HedgePolicy(percentile=0.5, max_hedge_rate=1, min_samples=1, window=2)
+    policy.record("thanks", 0.05)
+    client = LangChainWrap(chat=FakeListChatModel(responses=[]), hedge_policy=policy)
+    cmd = _StragglerCommand()
+    assert asyncio.run(client.aexecute(cmd)).result == "hedge"
+    assert cmd.cancelled
+    assert cmd.exec_time >= 0.05
+    assert 0.05 <= policy.delay_for("thanks") < 1.0
@@ -0,0 +1,103 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import math
+
+import pytest
+
+from interacticore.parsers import jsonbackend
+from interacticore.parsers.jsonbackend import JsonBackend, OrjsonBackend, get_json_backend, set_json_backend
+
+orjson = pytest.importorskip("orjson")
+
+
+@pytest.mark.parametrize("test_name, in_str, strict", [
+    ("Object", '{"utterances": ["Thanks!", "Cheers."]}', True),
+    ("Numbers", '[1, -2.5, 1e+16, 0.1, -0.0]', True),
+    ("Big integer", '[18446744073709551616, -9223372036854775809]', True),
+    ("Big integer in string", '["1e+20", 18446744073709551616]', True),
+    ("Big float", '{"a": 1e+300}', True),
+    ("Top-level big integer", '-9223372036854775809', True),
+    ("Long digit run in string", '{"id": "12345678901234567890123"}', True),
+    ("Overflowing float", '[1e400]', True),
+    ("NaN and Infinity", '[NaN, Infinity, -Infinity]', True),
+    ("Raw newline, lenient", '{"a": "line 1\nline 2"}', False),
+    ("Lone surrogate escape", '"\\ud800"', True),
+    ("Deep nesting", '[' * 300 + ']' * 300, True),
+])
+def test_orjson_backend_loads(test_name: str, in_str: str, strict: bool):
+    result = OrjsonBackend().loads(in_str, strict=strict)
+    expected = json.loads(in_str, strict=strict)
+    if repr(result) != repr(expected):
+        print(f"{test_name}: result: {result}")
+    assert repr(result) == repr(expected)
+
+
+@pytest.mark.parametrize("test_name, in_str, strict", [
+    ("Truncated", '{"a": [1, 2', True),
+    ("Raw newline, strict", '{"a": "line 1\nline 2"}', True),
+    ("Trailing comma", '[1, 2,]', False),
+    ("Empty", '', False),
+])
+def test_orjson_backend_errors(test_name: str, in_str: str, strict: bool):
+    with pytest.raises(json.JSONDecodeError) as expected:
+        json.loads(in_str, strict=strict)
+    with pytest.raises(json.JSONDecodeError) as result:
+        OrjsonBackend().loads(in_str, strict=strict)
+    if type(result.value) is not type(expected.value) or str(result.value) != str(expected.value):
+        print(f"{test_name}: result: {result.value!r}")
+    assert type(result.value) is type(expected.value)
+    assert str(result.value) == str(expected.value)
+
+
+@pytest.mark.parametrize("test_name, in_str, expected", [
+    ("Plus signs", '{"phone": "+1 555 0100", "formula": "a+b"}', "orjson"),
+    ("Big float", '[1e+300]', "orjson"),
+    ("19-digit integer", '[9223372036854775807]', "json"),
+    ("Big integer", '{"a": 18446744073709551616}', "json"),
+])
+def test_orjson_backend_big_integer_fallback(test_name: str, in_str: str, expected: str, monkeypatch):
+    calls = []
+    monkeypatch.setattr(JsonBackend, "loads", lambda self, s, *, strict=True: calls.append("json") or json.loads(s))
+    for document in (in_str, in_str.encode("utf-8")):
+        calls.clear()
+        assert OrjsonBackend().loads(document) == json.loads(in_str)
+        result = calls[0] if calls else "orjson"
+        if result != expected:
+            print(f"{test_name}: result: {result}")
+        assert result == expected
+
+
+def test_set_json_backend():
+    try:
+        assert set_json_backend("json").name == "json"
+        assert get_json_backend().name == "json"
+        assert math.isnan(jsonbackend.loads("NaN"))
+        assert set_json_backend("orjson").name == "orjson"
+        assert set_json_backend().name == "orjson"
+        backend = JsonBackend()
+        assert set_json_backend(backend) is backend
+        with pytest.raises(ValueError):
+            set_json_backend("simplejson")
+    finally:
+        set_json_backend()
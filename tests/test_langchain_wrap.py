@@ -0,0 +1,183 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from interacticore import LangChainWrap
+from interacticore.commands import ChatCommand
+from interacticore.interacticore import _shared_prompts
+
+
+def test_execute(make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": ["Thanks!", "Cheers."]}']))
+    cmd = client.execute(make_command())
+    assert cmd.result == {"utterances": ["Thanks!", "Cheers."]}
+    assert cmd.exec_time is not None
+
+
+def test_aexecute(make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=['```json\n{"utterances": ["Thanks!"]}\n```']))
+
+    async def run_all():
+        return await asyncio.gather(*(client.aexecute(make_command()) for _ in range(8)))
+
+    for cmd in asyncio.run(run_all()):
+        assert cmd.result == {"utterances": ["Thanks!"]}
+        assert cmd.exec_time is not None
+
+
+def test_aexecute_retries_without_blocking(monkeypatch, make_command):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    client = LangChainWrap(chat=FakeListChatModel(responses=["Not JSON", '{"utterances": []}']))
+    cmd = asyncio.run(client.aexecute(make_command()))
+    assert cmd.result == {"utterances": []}
+    assert len(delays) == 1
+
+
+def test_aexecute_max_retries(monkeypatch, make_command):
+    async def sleep(delay):
+        pass
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    client = LangChainWrap(chat=FakeListChatModel(responses=["Not JSON"]))
+    with pytest.raises(Exception, match="Maximum number of retries"):
+        asyncio.run(client.aexecute(make_command()))
+
+
+class _FailingCommand(ChatCommand):
+    def run(self, client: LangChainWrap, **kwargs):
+        raise ValueError("boom")
+
+    async def arun(self, client: LangChainWrap, **kwargs):
+        raise ValueError("boom")
+
+
+def _commands(make_command) -> list[ChatCommand]:
+    cmds = [make_command() for _ in range(10)]
+    cmds[3] = _FailingCommand(cmd_name="fails", sys_prompt="", user_prompt_tmpl="", inputs={})
+    return cmds
+
+
+def test_execute_many(make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": ["Thanks!"]}']))
+    cmds = _commands(make_command)
+    outcomes = client.execute_many(iter(cmds), max_concurrency=4)
+    assert [outcome.index for outcome in outcomes] == list(range(10))
+    assert [outcome.cmd for outcome in outcomes] == cmds
+    assert [outcome.ok for outcome in outcomes] == [index != 3 for index in range(10)]
+    assert isinstance(outcomes[3].error, ValueError)
+    assert outcomes[3].result is None
+    assert outcomes[0].result == {"utterances": ["Thanks!"]}
+
+
+def test_aexecute_many(make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": ["Thanks!"]}']))
+    cmds = _commands(make_command)
+    outcomes = asyncio.run(client.aexecute_many(cmds, max_concurrency=4))
+    assert [outcome.cmd for outcome in outcomes] == cmds
+    assert [outcome.ok for outcome in outcomes] == [index != 3 for index in range(10)]
+    assert outcomes[9].result == {"utterances": ["Thanks!"]}
+
+
+def test_aexecute_as_completed_bounded():
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": []}']))
+    running = 0
+    peak = 0
+
+    class SlowCommand(ChatCommand):
+        async def arun(self, client: LangChainWrap, **kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01 * (5 - int(self.cmd_name)))
+            running -= 1
+            return await super().arun(client, **kwargs)
+
+    def commands():
+        for index in range(5):
+            yield SlowCommand(cmd_name=str(index), sys_prompt="", user_prompt_tmpl="Go", inputs={})
+
+    async def collect():
+        return [outcome.index async for outcome in client.aexecute_as_completed(commands(), max_concurrency=2)]
+
+    order = asyncio.run(collect())
+    assert sorted(order) == list(range(5))
+    assert order[0] == 1
+    assert peak == 2
+
+
+def test_execute_many_max_concurrency(make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": []}']))
+    with pytest.raises(ValueError):
+        client.execute_many([make_command()], max_concurrency=0)
+
+
+def test_commands_are_slotted(make_command):
+    first = make_command()
+    second = ChatCommand(cmd_name="gen_utterances", sys_prompt="".join(["You generate ", "utterances."]),
+                         user_prompt_tmpl="Generate {amount} utterances.", inputs={"amount": 2})
+    assert not hasattr(first, "__dict__")
+    assert first.sys_prompt is second.sys_prompt
+    assert first.user_prompt_tmpl is second.user_prompt_tmpl
+
+
+def test_distinct_prompts_are_not_kept():
+    for index in range(100):
+        ChatCommand(cmd_name="distinct_prompts", sys_prompt=f"You are assistant {index}.", user_prompt_tmpl="Go",
+                    inputs={})
+    prompts = list(_shared_prompts["distinct_prompts"])
+    assert len(prompts) == 8
+    assert "You are assistant 0." not in prompts
+    assert "You are assistant 99." in prompts
+
+
+@pytest.mark.parametrize("test_name, release_inputs, expected", [
+    ("Kept", False, ("You generate utterances.", "Generate {amount} utterances.", {"amount": 2})),
+    ("Released", True, (None, None, None)),
+])
+def test_execute_release_inputs(test_name: str, release_inputs: bool, expected, make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": ["Thanks!"]}']))
+    cmd = make_command()
+    cmd.release_inputs = release_inputs
+    cmd = client.execute(cmd)
+    result = (cmd.sys_prompt, cmd.user_prompt_tmpl, cmd.inputs)
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+    assert cmd.result == {"utterances": ["Thanks!"]}
+
+
+def test_failed_command_keeps_inputs():
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{}']))
+    cmd = _FailingCommand(cmd_name="fail", sys_prompt="", user_prompt_tmpl="Go", inputs={"a": 1}, release_inputs=True)
+    with pytest.raises(Exception):
+        client.execute(cmd)
+    assert cmd.inputs == {"a": 1}
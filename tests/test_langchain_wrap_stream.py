@@ -0,0 +1,74 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from interacticore import LangChainWrap, MemoryResponseCache
+from interacticore.commands import ChatCommand
+
+RESPONSE = '```json\n{"utterances": ["Thanks!", "Cheers."]}\n```'
+
+
+def _check_timings(cmd: ChatCommand):
+    assert cmd.result == {"utterances": ["Thanks!", "Cheers."]}
+    assert 0 <= cmd.time_to_first_token <= cmd.time_to_first_result <= cmd.exec_time
+
+
+def test_stream(make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=[RESPONSE]))
+    cmd = make_command()
+    outputs = list(client.stream(cmd))
+    assert len(outputs) > 2
+    assert outputs[0] == {}
+    assert outputs[-1] == {"utterances": ["Thanks!", "Cheers."]}
+    _check_timings(cmd)
+
+
+def test_astream(make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=[RESPONSE]))
+    cmd = make_command()
+
+    async def collect():
+        return [output async for output in client.astream(cmd)]
+
+    outputs = asyncio.run(collect())
+    assert {"utterances": ["Thanks!"]} in outputs
+    _check_timings(cmd)
+
+
+def test_stream_cache_hit(make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=[RESPONSE]), response_cache=MemoryResponseCache())
+    list(client.stream(make_command()))
+    cmd = make_command()
+    assert list(client.stream(cmd)) == [{"utterances": ["Thanks!", "Cheers."]}]
+    assert cmd.cache_hit is True
+
+
+def test_stream_release_inputs(make_command):
+    client = LangChainWrap(chat=FakeListChatModel(responses=[RESPONSE]))
+    cmd = make_command()
+    cmd.release_inputs = True
+    list(client.stream(cmd))
+    assert cmd.result == {"utterances": ["Thanks!", "Cheers."]}
+    assert (cmd.sys_prompt, cmd.user_prompt_tmpl, cmd.inputs) == (None, None, None)
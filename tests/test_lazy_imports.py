@@ -0,0 +1,102 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import interacticore
+import interacticore.commands
+import interacticore.parsers
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def _run(code: str) -> str:
+    # A fresh interpreter, so nothing the tests imported already is loaded.
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    completed = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    return completed.stdout.strip()
+
+
+def _loaded_after(statement: str, modules: list[str]) -> list[str]:
+    return _run(f"import sys\n{statement}\nprint(' '.join(m for m in {modules!r} if m in sys.modules))").split()
+
+
+@pytest.mark.parametrize("test_name, statement, expected", [
+    ("Package", "import interacticore", []),
+    ("Parsers", "import interacticore.parsers", []),
+    ("Commands", "import interacticore.commands", []),
+    ("Parse cache", "from interacticore.parsers import ParseCache", []),
+    ("Usage ledger", "from interacticore import UsageLedger", []),
+    ("Parser", "from interacticore.parsers import BrokenJsonOutputParser", ['langchain_core', 'pydantic']),
+])
+def test_import_is_lazy(test_name: str, statement: str, expected: list[str]):
+    result = _loaded_after(statement, ['langchain_core', 'pydantic', 'interacticore.interacticore'])
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+
+
+@pytest.mark.parametrize("module", [interacticore, interacticore.parsers, interacticore.commands])
+def test_all_names_resolve(module):
+    for name in module.__all__:
+        assert getattr(module, name) is not None
+    assert set(module.__all__) <= set(dir(module))
+
+
+def test_unknown_name():
+    with pytest.raises(AttributeError):
+        interacticore.NoSuchThing
+    with pytest.raises(ImportError):
+        from interacticore.parsers import NoSuchThing  # noqa: F401
+    with pytest.raises(AttributeError):
+        interacticore.commands.no_such_module
+
+
+def test_same_objects():
+    from interacticore.commands.chatcommand import ChatCommand
+    from interacticore.parsers.brokenjsonparser import BrokenJsonOutputParser
+
+    assert interacticore.ChatCommand is ChatCommand is interacticore.commands.ChatCommand
+    assert interacticore.BrokenJsonOutputParser is BrokenJsonOutputParser
+    assert interacticore.parsers.BrokenJsonOutputParser is BrokenJsonOutputParser
+
+
+@pytest.mark.parametrize("test_name, path, expected", [
+    ("Parsers", "interacticore.parsers", "interacticore.parsers"),
+    ("Commands", "interacticore.commands", "interacticore.commands"),
+    ("Utils", "interacticore.utils", "interacticore.utils"),
+    ("Core", "interacticore.interacticore", "interacticore.interacticore"),
+    ("Retry", "interacticore.retry", "interacticore.retry"),
+    ("Parser module", "interacticore.brokenjsonparser", "interacticore.parsers.brokenjsonparser"),
+    ("Command module", "interacticore.chatcommand", "interacticore.commands.chatcommand"),
+    ("Nested parser module", "interacticore.parsers.brokenjsonparser", "interacticore.parsers.brokenjsonparser"),
+    ("Nested command module", "interacticore.commands.llmcommand", "interacticore.commands.llmcommand"),
+])
+def test_submodule_attributes(test_name: str, path: str, expected: str):
+    result = _run(f"import interacticore\nprint({path}.__name__)")
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
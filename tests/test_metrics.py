@@ -0,0 +1,147 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import interacticore.interacticore as core
+from interacticore import (BudgetExceededError, CallbackMetricsSink, Histogram, HistogramMetricsSink, LangChainWrap,
+                           MemoryResponseCache, RetryPolicy, UsageBudget, UsageLedger)
+
+
+@pytest.fixture
+def make_command(make_command):
+    # Retry quickly and without jitter.
+    def make(**kwargs):
+        return make_command(retry_policy=RetryPolicy(initial_delay=0.01, jitter="none", budget=False), **kwargs)
+    return make
+
+
+def test_execute_phases(make_command):
+    sink = HistogramMetricsSink()
+    client = LangChainWrap(chat=FakeListChatModel(responses=["Not JSON", '{"utterances": []}']), metrics_sink=sink)
+    cmd = client.execute(make_command())
+    assert cmd.result == {"utterances": []}
+    assert cmd.attempts == 2
+    assert cmd.model_name == "FakeListChatModel"
+    assert set(cmd.timings) == {"queue", "prompt", "model", "parse", "backoff", "total"}
+    assert cmd.timings["backoff"] >= 0.01
+    assert cmd.timings["total"] >= sum(seconds for phase, seconds in cmd.timings.items() if phase != "total")
+    assert sink.commands("gen_utterances", "FakeListChatModel") == 1
+    assert sink.attempts("gen_utterances", "FakeListChatModel") == 2
+    assert sink.histogram("gen_utterances", "FakeListChatModel", "model").count == 1
+
+
+def test_aexecute_outcomes(make_command):
+    received = []
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": ["Thanks!"]}']),
+                           response_cache=MemoryResponseCache(),
+                           metrics_sink=CallbackMetricsSink(received.append))
+
+    async def run_all():
+        for _ in range(2):
+            await client.aexecute(make_command())
+
+    asyncio.run(run_all())
+    assert [metrics.outcome for metrics in received] == ["ok", "cache_hit"]
+    assert received[0].timings.keys() >= {"queue", "prompt", "model", "parse", "total"}
+    assert list(received[1].timings) == ["total"]
+    assert received[1].attempts == 0
+
+
+def test_errors_are_recorded(make_command):
+    received = []
+
+    def record(metrics):
+        received.append(metrics)
+        raise RuntimeError("sink down")
+
+    client = LangChainWrap(chat=FakeListChatModel(responses=["Not JSON"]), metrics_sink=CallbackMetricsSink(record))
+    cmd = make_command()
+    cmd.retry_policy = RetryPolicy(max_retries=0)
+    with pytest.raises(Exception):
+        client.execute(cmd)
+    assert received[0].outcome == "error"
+    assert received[0].attempts == 1
+    assert received[0].error is not None
+
+
+def test_stream_phases(make_command):
+    sink = HistogramMetricsSink()
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": ["Thanks!"]}']), metrics_sink=sink)
+    cmd = make_command()
+    list(client.stream(cmd))
+    assert cmd.timings.keys() >= {"queue", "prompt", "model", "parse", "total"}
+    assert sink.commands("gen_utterances", "FakeListChatModel") == 1
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_stream_rejection_is_recorded(asynchronous: bool, make_command):
+    received = []
+    ledger = UsageLedger(budget=UsageBudget(max_tokens=1))
+    ledger.record("s1", "gen_utterances", None, 10, 5)
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": []}']), usage_ledger=ledger,
+                           metrics_sink=CallbackMetricsSink(received.append))
+    cmd = make_command(session_id="s1")
+
+    async def consume():
+        return [output async for output in client.astream(cmd)]
+
+    with pytest.raises(BudgetExceededError):
+        if asynchronous:
+            asyncio.run(consume())
+        else:
+            list(client.stream(cmd))
+    assert [metrics.outcome for metrics in received] == ["error"]
+    assert isinstance(received[0].error, BudgetExceededError)
+    assert "total" in received[0].timings
+
+
+@pytest.mark.parametrize("test_name, values, q, expected", [
+    ("Empty", [], 0.5, None),
+    ("Median", [0.1, 0.2, 0.3, 0.4], 0.5, 0.2),
+    ("Interpolated", [0.05, 0.05, 0.15, 0.15], 0.75, 0.15),
+    ("Overflow", [100.0], 0.99, 1.0),
+])
+def test_histogram_quantile(test_name: str, values, q: float, expected):
+    histogram = Histogram((0.1, 0.2, 0.5, 1.0))
+    for value in values:
+        histogram.observe(value)
+    result = histogram.quantile(q)
+    if result != pytest.approx(expected):
+        print(f"{test_name}: result: {result}")
+    assert result == pytest.approx(expected)
+
+
+def test_exposition():
+    sink = HistogramMetricsSink(buckets=(0.1, 1.0))
+    sink.record(core.CommandMetrics('say "hi"', "gpt", "s1", "ok", {"model": 0.5}, 1))
+    text = sink.exposition()
+    assert '# TYPE interacticore_phase_seconds histogram' in text
+    assert 'interacticore_phase_seconds_bucket{cmd_name="say \\"hi\\"",model="gpt",phase="model",le="0.1"} 0' in text
+    assert 'interacticore_phase_seconds_bucket{cmd_name="say \\"hi\\"",model="gpt",phase="model",le="+Inf"} 1' in text
+    assert 'interacticore_phase_seconds_sum{cmd_name="say \\"hi\\"",model="gpt",phase="model"} 0.5' in text
+    assert 'interacticore_commands_total{cmd_name="say \\"hi\\"",model="gpt",outcome="ok"} 1' in text
+    assert 'interacticore_attempts_total{cmd_name="say \\"hi\\"",model="gpt"} 1' in text
@@ -0,0 +1,170 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import threading
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import interacticore.interacticore as core
+import interacticore.modelpool as modelpool
+from interacticore import LangChainWrap, ModelPool, RetryPolicy
+from interacticore.commands import ChatCommand
+from interacticore.parsers import BrokenJsonOutputParser
+
+
+@pytest.fixture
+def make_command(make_command):
+    # Leave failover to the pool.
+    def make(**kwargs):
+        return make_command(retry_policy=RetryPolicy(max_retries=0), **kwargs)
+    return make
+
+
+def _record(pool: ModelPool, name: str, latency: float, failed: bool = False, times: int = 1):
+    member = next(member for member in pool.members if member.name == name)
+    for _ in range(times):
+        pool.release(member, pool.acquire(member) - latency, failed)
+
+
+def _routed_share(pool: ModelPool, name: str, calls: int = 400) -> float:
+    return sum(pool.candidates()[0].name == name for _ in range(calls)) / calls
+
+
+@pytest.mark.parametrize("test_name, history, expected", [
+    ("Faster", [("a", 0.1, False), ("b", 0.5, False)], "a"),
+    ("Healthier", [("a", 0.1, True), ("b", 0.2, False)], "b"),
+    ("Untried", [("a", 0.1, False)], "b"),
+])
+def test_routes_to_best(test_name: str, history, expected):
+    pool = ModelPool({"a": object(), "b": object()})
+    for name, latency, failed in history:
+        _record(pool, name, latency, failed, times=5)
+    # Two equally weighted models are drawn as a pair half the time, and the pair goes to the better model.
+    result = _routed_share(pool, expected)
+    if not 0.6 < result < 0.9:
+        print(f"{test_name}: result: {result}")
+    assert 0.6 < result < 0.9
+
+
+def test_weights():
+    pool = ModelPool({"a": object(), "b": object()}, weights={"b": 9})
+    assert 0.05 < _routed_share(pool, "a") < 0.2
+    pool.set_weight("b", 0)
+    assert [member.name for member in pool.candidates()] == ["a"]
+    pool.set_weight("a", 0)
+    with pytest.raises(RuntimeError):
+        pool.candidates()
+    with pytest.raises(ValueError):
+        ModelPool({"a": object()}, weights={"c": 1})
+
+
+def test_error_rate_recovers(monkeypatch):
+    pool = ModelPool({"a": object()}, recovery=10)
+    _record(pool, "a", 0.1, failed=True, times=3)
+    stats = pool.stats_for("a")
+    assert (stats.calls, stats.errors, stats.in_flight) == (3, 3, 0)
+    now = modelpool.time.monotonic()
+    monkeypatch.setattr(core.time, "monotonic", lambda: now + 10)
+    _record(pool, "a", 0.1)
+    assert pool.stats_for("a").error_rate < stats.error_rate / 2
+
+
+def test_execute_fails_over(make_command):
+    bad = FakeListChatModel(responses=["Not JSON"])
+    good = FakeListChatModel(responses=['{"utterances": ["Thanks!"]}'])
+    pool = ModelPool({"bad": bad, "good": good}, weights={"good": 1e-9})
+    client = LangChainWrap(chat=pool)
+    for _ in range(3):
+        assert client.execute(make_command()).result == {"utterances": ["Thanks!"]}
+    stats = pool.stats()
+    assert stats["good"].errors == 0 and stats["good"].calls == 3
+    assert stats["bad"].errors == stats["bad"].calls >= 1
+    assert client.chat is pool
+
+
+def test_execute_fatal_error_does_not_fail_over():
+    pool = ModelPool({"a": FakeListChatModel(responses=["{}"]), "b": FakeListChatModel(responses=["{}"])})
+    client = LangChainWrap(chat=pool)
+    cmd = ChatCommand(cmd_name="broken", sys_prompt="", user_prompt_tmpl="{missing}", inputs={},
+                      output_parser=BrokenJsonOutputParser(), retry_policy=RetryPolicy(max_retries=0))
+    with pytest.raises(KeyError):
+        client.execute(cmd)
+    assert all(stats.calls == 0 and stats.in_flight == 0 for stats in pool.stats().values())
+
+
+def test_aexecute_fails_over_on_timeout():
+    slow = FakeListChatModel(responses=['{"utterances": ["Slow"]}'])
+    fast = FakeListChatModel(responses=['{"utterances": ["Fast"]}'])
+
+    class _SlowCommand(ChatCommand):
+        async def arun(self, client: LangChainWrap, **kwargs):
+            if client.chat is slow:
+                await asyncio.sleep(1)
+            return await super().arun(client, **kwargs)
+
+    pool = ModelPool({"slow": slow, "fast": fast}, weights={"fast": 1e-9}, timeout=0.05)
+    client = LangChainWrap(chat=pool)
+    cmd = _SlowCommand(cmd_name="thanks", sys_prompt="", user_prompt_tmpl="Go", inputs={},
+                       output_parser=BrokenJsonOutputParser(), retry_policy=RetryPolicy(max_retries=0))
+    assert asyncio.run(client.aexecute(cmd)).result == {"utterances": ["Fast"]}
+    assert pool.stats_for("slow").errors == 1
+
+
+def test_execute_fails_over_on_timeout():
+    slow = FakeListChatModel(responses=['{"utterances": ["Slow"]}'])
+    fast = FakeListChatModel(responses=['{"utterances": ["Fast"]}'])
+    release = threading.Event()
+    finished = threading.Event()
+
+    class _SlowCommand(ChatCommand):
+        def run(self, client: LangChainWrap, **kwargs):
+            if client.chat is not slow:
+                return super().run(client, **kwargs)
+            release.wait(5)
+            try:
+                return super().run(client, **kwargs)
+            finally:
+                finished.set()
+
+    pool = ModelPool({"slow": slow, "fast": fast}, weights={"fast": 1e-9}, timeout=0.05)
+    client = LangChainWrap(chat=pool)
+    cmd = _SlowCommand(cmd_name="thanks", sys_prompt="", user_prompt_tmpl="Go", inputs={},
+                       output_parser=BrokenJsonOutputParser(), retry_policy=RetryPolicy(max_retries=0))
+    assert client.execute(cmd).result == {"utterances": ["Fast"]}
+    assert pool.stats_for("slow").errors == 1
+    # The abandoned call finishes on its own copy of the command.
+    release.set()
+    assert finished.wait(5)
+    assert (cmd.result, cmd.model_name) == ({"utterances": ["Fast"]}, "fast")
+
+
+def test_stream_routes_to_pool(make_command):
+    pool = ModelPool({"a": FakeListChatModel(responses=['{"utterances": ["Thanks!"]}'])})
+    client = LangChainWrap(chat=pool)
+    cmd = make_command()
+    assert list(client.stream(cmd))[-1] == {"utterances": ["Thanks!"]}
+    stats = pool.stats_for("a")
+    assert (stats.calls, stats.errors, stats.in_flight) == (1, 0, 0)
+    assert stats.latency is not None
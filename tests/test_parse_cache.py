@@ -0,0 +1,125 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import copy
+import json
+import threading
+
+import pytest
+
+from interacticore.parsers import BrokenJsonOutputParser
+from interacticore.parsers.brokenjsonparser import parse_json_markdown
+from interacticore.parsers.parsecache import FrozenDict, FrozenList, ParseCache
+
+
+def test_parse_cache_hits_and_misses():
+    cache = ParseCache()
+    text = '```json\n{"utterances": [\'Thanks!\', \'Cheers.\']}\n```'
+    first = parse_json_markdown(text, cache=cache)
+    second = parse_json_markdown(text, cache=cache)
+    assert first == {"utterances": ["Thanks!", "Cheers."]}
+    assert second is first
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+    assert cache.hit_rate == 0.5
+
+
+@pytest.mark.parametrize("test_name, mutate", [
+    ("Set item", lambda result: result.__setitem__("a", 1)),
+    ("Delete item", lambda result: result.__delitem__("utterances")),
+    ("Update", lambda result: result.update(a=1)),
+    ("Nested append", lambda result: result["utterances"].append("Bye.")),
+    ("Nested sort", lambda result: result["utterances"].sort()),
+])
+def test_parse_cache_results_are_read_only(test_name: str, mutate):
+    cache = ParseCache()
+    result = parse_json_markdown('{"utterances": ["Thanks!", "Cheers."]}', cache=cache)
+    with pytest.raises(TypeError):
+        mutate(result)
+    print(f"{test_name}: result: {result}")
+    assert result == {"utterances": ["Thanks!", "Cheers."]}
+
+
+def test_parse_cache_results_copy_and_serialize():
+    result = parse_json_markdown('{"a": [1, {"b": 2}]}', cache=ParseCache())
+    assert isinstance(result, FrozenDict) and isinstance(result["a"], FrozenList)
+    assert json.loads(json.dumps(result)) == result
+    assert copy.deepcopy(result) == result
+    mutable = json.loads(json.dumps(result))
+    mutable["a"].append(3)
+    assert mutable == {"a": [1, {"b": 2}, 3]}
+
+
+def test_parse_cache_evicts_least_recently_used():
+    cache = ParseCache(max_entries=2)
+    parse_json_markdown('{"a": 1}', cache=cache)
+    parse_json_markdown('{"b": 2}', cache=cache)
+    parse_json_markdown('{"a": 1}', cache=cache)
+    parse_json_markdown('{"c": 3}', cache=cache)
+    assert cache.evictions == 1
+    parse_json_markdown('{"a": 1}', cache=cache)
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_parse_cache_bounds_bytes():
+    cache = ParseCache(max_bytes=20)
+    parse_json_markdown('{"a": "0123456789"}', cache=cache)
+    parse_json_markdown('{"b": "0123456789"}', cache=cache)
+    assert len(cache) == 1 and cache.size_bytes <= 20
+    parse_json_markdown('{"c": "this text is larger than the cache"}', cache=cache)
+    assert len(cache) == 1 and cache.size_bytes <= 20
+
+
+def test_parse_cache_does_not_cache_errors():
+    cache = ParseCache()
+    for _ in range(2):
+        with pytest.raises(json.JSONDecodeError):
+            parse_json_markdown('{"a": 1, "b": [1, 2 3]}', cache=cache)
+    assert (cache.misses, len(cache)) == (2, 0)
+
+
+def test_parse_cache_is_thread_safe():
+    cache = ParseCache(max_entries=8)
+    texts = [f'{{"n": {i}}}' for i in range(16)]
+    errors = []
+
+    def work():
+        for _ in range(50):
+            for i, text in enumerate(texts):
+                if parse_json_markdown(text, cache=cache) != {"n": i}:
+                    errors.append(text)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(cache) <= 8
+    assert cache.hits + cache.misses == 8 * 50 * 16
+
+
+def test_broken_json_output_parser_cache():
+    cache = ParseCache()
+    parser = BrokenJsonOutputParser(cache=cache)
+    assert parser.parse('{"a": 1}') == {"a": 1}
+    assert BrokenJsonOutputParser(cache=cache).parse('{"a": 1}') == {"a": 1}
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,182 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import interacticore.interacticore as core
+from interacticore import LangChainWrap, RateLimiter, RateLimitError
+from interacticore.commands import ChatCommand
+from interacticore.parsers import BrokenJsonOutputParser
+from interacticore.ratelimit import TokenBucket, is_throttling_error
+
+
+class _Throttled(Exception):
+    status_code = 429
+
+
+class _Response:
+    status_code = 429
+    headers = {"retry-after": "0"}
+
+
+class _ThrottledWithResponse(Exception):
+    response = _Response()
+
+
+def test_token_bucket():
+    bucket = TokenBucket(60, capacity=2)
+    assert bucket.reserve(2, bucket._updated) == 0.0
+    assert bucket.reserve(1, bucket._updated) == pytest.approx(1.0)
+    assert bucket.reserve(1, bucket._updated + 1) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("test_name, error, expected", [
+    ("Status code", _Throttled(), True),
+    ("Response status code", _ThrottledWithResponse(), True),
+    ("Class name", type("RateLimitError", (Exception,), {})(), True),
+    ("Other", ValueError("boom"), False),
+])
+def test_is_throttling_error(test_name: str, error: Exception, expected: bool):
+    result = is_throttling_error(error)
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+
+
+def test_adaptive_concurrency():
+    limiter = RateLimiter(max_concurrency=8, min_concurrency=2, cooldown=0)
+    with pytest.raises(RateLimitError):
+        with limiter.limit():
+            raise _Throttled()
+    assert (limiter.concurrency, limiter.throttles, limiter.in_flight) == (4, 1, 0)
+    with pytest.raises(RateLimitError):
+        with limiter.limit():
+            raise _ThrottledWithResponse()
+    assert limiter.concurrency == 2
+    with pytest.raises(RateLimitError):
+        with limiter.limit():
+            raise _Throttled()
+    assert limiter.concurrency == 2
+
+    for _ in range(2 + 3):
+        with limiter.limit():
+            pass
+    assert limiter.concurrency == 4
+    with pytest.raises(ValueError):
+        with limiter.limit():
+            raise ValueError("boom")
+    assert limiter.in_flight == 0
+
+
+def test_concurrency_shared_by_threads_and_coroutines():
+    limiter = RateLimiter(max_concurrency=3)
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def enter():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+
+    def leave():
+        nonlocal running
+        with lock:
+            running -= 1
+
+    def call():
+        with limiter.limit():
+            enter()
+            time.sleep(0.01)
+            leave()
+
+    async def acall():
+        async with limiter.alimit():
+            enter()
+            await asyncio.sleep(0.01)
+            leave()
+
+    async def run_all():
+        await asyncio.gather(*(acall() for _ in range(12)))
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    asyncio.run(run_all())
+    for thread in threads:
+        thread.join()
+    assert peak == 3
+    assert limiter.in_flight == 0
+
+
+def test_alimit_cancelled_while_queued():
+    limiter = RateLimiter(max_concurrency=1)
+
+    async def run():
+        await limiter.aacquire()
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        async with limiter.alimit():
+            pass
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+
+
+def test_request_budget():
+    limiter = RateLimiter(requests_per_minute=600)
+    limiter._requests.capacity = limiter._requests._level = 1
+    start = time.monotonic()
+    for _ in range(3):
+        with limiter.limit():
+            pass
+    assert time.monotonic() - start >= 0.19
+
+
+def test_execute_retries_throttled_calls(monkeypatch):
+    monkeypatch.setattr(core.time, "sleep", lambda delay: None)
+    attempts = []
+
+    class ThrottledOnceCommand(ChatCommand):
+        def run(self, client: LangChainWrap, **kwargs):
+            attempts.append(client.rate_limiter(self).concurrency)
+            if len(attempts) == 1:
+                raise _Throttled()
+            return super().run(client, **kwargs)
+
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=10 ** 6, max_concurrency=4, cooldown=0)
+    client = LangChainWrap(chat=FakeListChatModel(responses=['{"utterances": []}']), rate_limiters={"chat": limiter})
+    cmd = client.execute(ThrottledOnceCommand(cmd_name="thanks", sys_prompt="", user_prompt_tmpl="Go",
+                                              output_parser=BrokenJsonOutputParser(), inputs={}))
+    assert cmd.result == {"utterances": []}
+    assert attempts == [4, 2]
@@ -0,0 +1,118 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import pickle
+import sqlite3
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from interacticore import LangChainWrap, MemoryResponseCache, SQLiteResponseCache
+from interacticore.parsers import BrokenJsonOutputParser
+from interacticore.parsers.parsecache import ParseCache
+
+
+def _client(cache) -> LangChainWrap:
+    responses = ['{"utterances": ["Thanks!"]}', '{"utterances": ["Cheers."]}', '{"utterances": ["Ta."]}']
+    return LangChainWrap(chat=FakeListChatModel(responses=responses), response_cache=cache)
+
+
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryResponseCache(max_entries=2)
+    cache.store("a", {"utterances": ["Thanks!"]})
+    cache.store("b", None)
+    assert cache.lookup("a") == (True, {"utterances": ["Thanks!"]})
+    cache.store("c", 3)
+    assert cache.lookup("b") == (False, None)
+    assert cache.lookup("a")[0] and cache.lookup("c")[0]
+    cache.store("d", 4, ttl=-1)
+    assert cache.lookup("d") == (False, None)
+    assert (cache.hits, cache.misses) == (3, 2)
+
+
+def test_memory_cache_returns_copies():
+    cache = MemoryResponseCache()
+    cache.store("a", {"utterances": ["Thanks!"]})
+    cache.lookup("a")[1]["utterances"].append("Cheers.")
+    assert cache.lookup("a") == (True, {"utterances": ["Thanks!"]})
+
+
+def test_sqlite_cache_persists(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = SQLiteResponseCache(path)
+    cache.store("a", {"utterances": ["Thanks!"]})
+    cache.store("b", 2, ttl=-1)
+    cache.close()
+
+    cache = SQLiteResponseCache(path)
+    assert cache.lookup("a") == (True, {"utterances": ["Thanks!"]})
+    assert cache.lookup("b") == (False, None)
+    cache.clear()
+    assert cache.lookup("a") == (False, None)
+
+
+def test_cache_stores_json_only(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = SQLiteResponseCache(path)
+    cache.store("a", {"utterances": {"Thanks!"}})
+    assert cache.lookup("a") == (False, None)
+    cache.store("b", ("Thanks!", "Cheers."))
+    assert cache.lookup("b") == (True, ["Thanks!", "Cheers."])
+    # A pickle written into the file by someone else is never unpickled.
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO responses (key, value, expires) VALUES (?, ?, NULL)",
+                     ("c", pickle.dumps({"utterances": ["Thanks!"]})))
+    assert cache.lookup("c") == (False, None)
+    cache.close()
+
+
+def test_cache_key_includes_parser_config(make_command):
+    model = FakeListChatModel(responses=[])
+    key = make_command().response_cache_key(model)
+    cached = BrokenJsonOutputParser(cache=ParseCache())
+    assert make_command(output_parser=cached).response_cache_key(model) == key
+    checked = BrokenJsonOutputParser(expected_keys=["utterances"])
+    assert make_command(output_parser=checked).response_cache_key(model) != key
+
+
+def test_execute_cache_hit(make_command):
+    client = _client(MemoryResponseCache())
+    first = client.execute(make_command())
+    assert (first.result, first.cache_hit) == ({"utterances": ["Thanks!"]}, False)
+    second = client.execute(make_command())
+    assert (second.result, second.cache_hit) == ({"utterances": ["Thanks!"]}, True)
+    assert second.exec_time is not None
+    assert second.output_key()["cache_hit"] is True
+    assert client.execute(make_command(amount=3)).result == {"utterances": ["Cheers."]}
+    assert client.execute(make_command(use_cache=False)).result == {"utterances": ["Ta."]}
+
+
+def test_aexecute_sqlite_cache_hit(tmp_path, make_command):
+    client = _client(SQLiteResponseCache(str(tmp_path / "responses.sqlite3"), ttl=3600))
+
+    async def run():
+        return await client.aexecute(make_command()), await client.aexecute(make_command())
+
+    first, second = asyncio.run(run())
+    assert first.cache_hit is False
+    assert (second.result, second.cache_hit) == ({"utterances": ["Thanks!"]}, True)
+    assert client.response_cache.hit_rate == 0.5
@@ -0,0 +1,161 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+import pytest
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import interacticore.retry as retry
+from interacticore import ErrorClass, LangChainWrap, RateLimitError, RetryBudget, RetryError, RetryPolicy
+from interacticore import classify_error
+from interacticore.commands import ChatCommand
+from interacticore.parsers import BrokenJsonOutputParser
+
+
+class _Failing:
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "done"
+
+
+class _ServerError(Exception):
+    status_code = 503
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def asleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(retry.time, "sleep", delays.append)
+    monkeypatch.setattr(retry.asyncio, "sleep", asleep)
+    return delays
+
+
+@pytest.mark.parametrize("test_name, error, expected", [
+    ("Parser", OutputParserException("bad"), ErrorClass.RETRYABLE),
+    ("Timeout", TimeoutError(), ErrorClass.RETRYABLE),
+    ("Server error", _ServerError(), ErrorClass.RETRYABLE),
+    ("Rate limit", RateLimitError("slow down"), ErrorClass.THROTTLED),
+    ("Other", ValueError("bad"), ErrorClass.FATAL),
+])
+def test_classify_error(test_name: str, error: Exception, expected: ErrorClass):
+    result = classify_error(error)
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+
+
+def test_backoff_starts_at_initial_delay(sleeps):
+    policy = RetryPolicy(initial_delay=0.5, multiplier=2, max_delay=1.5, jitter="none", budget=False)
+    func = _Failing(*(OutputParserException("bad") for _ in range(3)))
+    assert policy.call(func) == "done"
+    assert sleeps == [0.5, 1.0, 1.5]
+
+
+def test_full_and_decorrelated_jitter(sleeps):
+    for _ in range(20):
+        RetryPolicy(initial_delay=1, jitter="full", budget=False).call(_Failing(TimeoutError(), TimeoutError()))
+        RetryPolicy(initial_delay=1, jitter="decorrelated", budget=False).call(_Failing(TimeoutError(), TimeoutError()))
+    full = sleeps[0::4] + sleeps[1::4]
+    decorrelated = sleeps[2::4] + sleeps[3::4]
+    assert all(0 <= delay <= 2 for delay in full)
+    assert all(1 <= delay <= 3 for delay in decorrelated)
+
+
+def test_max_retries_keeps_cause(sleeps):
+    error = OutputParserException("bad")
+    with pytest.raises(RetryError, match=r"Maximum number of retries \(1\) exceeded.") as info:
+        RetryPolicy(max_retries=1, budget=False).call(_Failing(error, error))
+    assert info.value.__cause__ is error
+    assert info.value.attempts == 2
+
+
+def test_fatal_error_raised_unchanged(sleeps):
+    func = _Failing(ValueError("bad"))
+    with pytest.raises(ValueError, match="bad"):
+        RetryPolicy(budget=False).call(func)
+    assert func.calls == 1
+    assert sleeps == []
+
+
+def test_throttled_waits_for_retry_after(sleeps):
+    policy = RetryPolicy(initial_delay=0.1, jitter="none", budget=False)
+    assert policy.call(_Failing(RateLimitError("slow down", retry_after=7))) == "done"
+    assert sleeps == [7]
+
+
+def test_deadline(sleeps):
+    policy = RetryPolicy(initial_delay=5, jitter="none", deadline=1, budget=False)
+    with pytest.raises(RetryError, match="Deadline"):
+        policy.call(_Failing(TimeoutError()))
+
+
+def test_async_deadline_cancels_attempt():
+    attempts = []
+
+    @RetryPolicy(deadline=0.05, budget=False)
+    async def slow():
+        attempts.append(1)
+        await asyncio.sleep(10)
+
+    with pytest.raises(RetryError, match="Deadline"):
+        asyncio.run(slow())
+    assert len(attempts) == 1
+
+
+def test_retry_budget(sleeps):
+    budget = RetryBudget(ratio=0.5, min_per_second=0, capacity=1)
+    policy = RetryPolicy(jitter="none", budget=budget)
+    assert policy.call(_Failing(TimeoutError())) == "done"
+    assert policy.call(_Failing()) == "done"
+    with pytest.raises(RetryError, match="budget"):
+        policy.call(_Failing(TimeoutError(), TimeoutError()))
+    assert budget.exhausted == 1
+
+
+def test_command_policy_overrides_client(sleeps):
+    class FailingCommand(ChatCommand):
+        calls = 0
+
+        def run(self, client: LangChainWrap, **kwargs):
+            FailingCommand.calls += 1
+            raise OutputParserException("bad")
+
+    client = LangChainWrap(chat=FakeListChatModel(responses=["{}"]), retry_policy=RetryPolicy(max_retries=5))
+    cmd = FailingCommand(cmd_name="fails", sys_prompt="", user_prompt_tmpl="Go",
+                         output_parser=BrokenJsonOutputParser(), inputs={},
+                         retry_policy=RetryPolicy(max_retries=1, budget=False))
+    with pytest.raises(RetryError):
+        client.execute(cmd)
+    assert FailingCommand.calls == 2
@@ -0,0 +1,142 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from interacticore import LangChainWrap, SingleFlight
+from interacticore.commands import ChatCommand
+
+
+class _SlowCommand(ChatCommand):
+    """Command that counts its runs and takes a while to finish."""
+
+    runs = 0
+
+    def __init__(self, session_id: str = "", amount: int = 2, use_cache: bool = True):
+        super().__init__(session_id=session_id, cmd_name="gen_utterances", sys_prompt="You generate utterances.",
+                         user_prompt_tmpl="Generate {amount} utterances.", inputs={"amount": amount},
+                         use_cache=use_cache)
+
+    def run(self, client: LangChainWrap, **kwargs):
+        type(self).runs += 1
+        time.sleep(0.1)
+        self.result = {"utterances": ["Thanks!"] * self.inputs["amount"]}
+        return self
+
+    async def arun(self, client: LangChainWrap, **kwargs):
+        type(self).runs += 1
+        await asyncio.sleep(0.1)
+        self.result = {"utterances": ["Thanks!"] * self.inputs["amount"]}
+        return self
+
+
+@pytest.fixture(autouse=True)
+def reset_runs():
+    _SlowCommand.runs = 0
+
+
+def _client() -> LangChainWrap:
+    return LangChainWrap(chat=FakeListChatModel(responses=[]), single_flight=SingleFlight())
+
+
+def test_execute_coalesces():
+    client = _client()
+    cmds = [_SlowCommand(session_id=f"session-{i}") for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(client.execute, cmds))
+    assert _SlowCommand.runs == 1
+    assert results == cmds
+    assert [cmd.session_id for cmd in results] == [f"session-{i}" for i in range(8)]
+    assert all(cmd.result == {"utterances": ["Thanks!", "Thanks!"]} for cmd in results)
+    assert len({id(cmd.result) for cmd in results}) == 8
+    assert (client.single_flight.calls, client.single_flight.shared, len(client.single_flight)) == (1, 7, 0)
+
+
+@pytest.mark.parametrize("test_name, cmds, expected", [
+    ("Identical", [_SlowCommand(), _SlowCommand()], 1),
+    ("Different inputs", [_SlowCommand(amount=1), _SlowCommand(amount=2)], 2),
+    ("Opted out", [_SlowCommand(use_cache=False), _SlowCommand(use_cache=False)], 2),
+])
+def test_aexecute_coalesces(test_name: str, cmds, expected: int):
+    client = _client()
+
+    async def run_all():
+        return await asyncio.gather(*(client.aexecute(cmd) for cmd in cmds))
+
+    asyncio.run(run_all())
+    result = _SlowCommand.runs
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+
+
+def test_errors_are_shared():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait()
+        raise ValueError("provider down")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "key", fail)
+        started.wait()
+        follower = executor.submit(flight.do, "key", lambda: "unused")
+        while flight.shared == 0:
+            time.sleep(0.001)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+    assert flight.do("key", lambda: "fresh") == ("fresh", False)
+
+
+def test_abandoned_call_is_retried():
+    flight = SingleFlight()
+
+    async def run_all():
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(1)
+
+        async def fast():
+            return "retried"
+
+        leader = asyncio.ensure_future(flight.ado("key", slow))
+        await started.wait()
+        follower = asyncio.ensure_future(flight.ado("key", fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run_all()) == ("retried", False)
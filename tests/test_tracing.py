@@ -0,0 +1,92 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import contextlib
+import logging
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import interacticore.interacticore as core
+from interacticore import LangChainWrap, TraceSampler
+from interacticore.commands import ChatCommand
+
+
+class _EchoCommand(ChatCommand):
+    """Command that returns its payload without calling a model."""
+
+    def __init__(self, session_id: str, payload=None):
+        super().__init__(session_id=session_id, cmd_name="echo", sys_prompt="", user_prompt_tmpl="",
+                         inputs={"payload": payload})
+
+    def run(self, client: LangChainWrap, **kwargs):
+        self.result = self.inputs["payload"]
+        return self
+
+
+@pytest.fixture
+def traced(monkeypatch) -> list:
+    projects = []
+
+    def tracing_v2_enabled(project_name=None):
+        projects.append(project_name)
+        return contextlib.nullcontext()
+
+    monkeypatch.setattr(core, "tracing_v2_enabled", tracing_v2_enabled)
+    return projects
+
+
+@pytest.mark.parametrize("test_name, sampler, lc_project, expected", [
+    ("No sampler", None, None, []),
+    ("No sampler with project", None, "demo", ["demo"]),
+    ("Sampled", TraceSampler(project="default"), None, ["default"]),
+    ("Sampled with project", TraceSampler(project="default"), "demo", ["demo"]),
+    ("Sampled out", TraceSampler(rate=0, project="default"), "demo", []),
+    ("Command rate", TraceSampler(rate=0, rates={"echo": 1}), None, [None]),
+])
+def test_execute_tracing(traced: list, test_name: str, sampler, lc_project, expected):
+    client = LangChainWrap(chat=FakeListChatModel(responses=[]), trace_sampler=sampler)
+    kwargs = {} if lc_project is None else {"lc_project": lc_project}
+    client.execute(_EchoCommand("session-1"), **kwargs)
+    if traced != expected:
+        print(f"{test_name}: result: {traced}")
+    assert traced == expected
+
+
+def test_sampling_is_per_session():
+    sampler = TraceSampler(rate=0.25)
+    decisions = [sampler.sampled(f"session-{i}", "echo") for i in range(2000)]
+    assert 0.2 < sum(decisions) / len(decisions) < 0.3
+    assert decisions == [sampler.sampled(f"session-{i}", "echo") for i in range(2000)]
+    with pytest.raises(ValueError):
+        TraceSampler(rates={"echo": 1.5})
+
+
+def test_debug_log_truncates_result(traced: list, caplog):
+    client = LangChainWrap(chat=FakeListChatModel(responses=[]))
+    with caplog.at_level(logging.DEBUG, logger="interacticore.interacticore"):
+        client.execute(_EchoCommand("session-1", payload={"utterances": ["Thanks a ton, you rock!"] * 10_000}))
+    response = [record.getMessage() for record in caplog.records if "Response" in record.getMessage()]
+    assert len(response) == 1
+    assert response[0].startswith("session-1 | echo | Response: _EchoCommand(session_id=session-1")
+    assert len(response[0]) < 1000
@@ -0,0 +1,159 @@
+# MIT License
+#
+# Copyright (c) 2024, Justin Randall, Smart Interactive Transformations Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from interacticore import (BudgetExceededError, LangChainWrap, MemoryResponseCache, ModelPrice, SingleFlight,
+                           UsageBudget, UsageLedger)
+from interacticore.commands import ChatCommand
+from interacticore.usage import token_usage
+
+
+class _MeteredChatModel(FakeListChatModel):
+    """Fake chat model that reports 10 prompt and 5 completion tokens per call."""
+
+    def _generate(self, *args, **kwargs):
+        result = super()._generate(*args, **kwargs)
+        result.llm_output = {"token_usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}}
+        return result
+
+
+@pytest.mark.parametrize("test_name, response, expected", [
+    ("OpenAI output",
+     LLMResult(generations=[], llm_output={"token_usage": {"prompt_tokens": 3, "completion_tokens": 4}}),
+     (3, 4)),
+    ("Anthropic output",
+     LLMResult(generations=[], llm_output={"usage": {"input_tokens": 3, "output_tokens": 4}}),
+     (3, 4)),
+    ("Message metadata",
+     LLMResult(generations=[[ChatGeneration(message=AIMessage(
+         content="Hi", response_metadata={"token_usage": {"prompt_tokens": 1, "completion_tokens": 2}}))] * 2]),
+     (2, 4)),
+    ("Not reported", LLMResult(generations=[], llm_output={"model_name": "gpt"}), None),
+])
+def test_token_usage(test_name: str, response, expected):
+    result = token_usage(response)
+    if result != expected:
+        print(f"{test_name}: result: {result}")
+    assert result == expected
+
+
+def test_execute_records_usage(make_command):
+    ledger = UsageLedger(prices={"_MeteredChatModel": ModelPrice(prompt=1.0, completion=2.0)})
+    client = LangChainWrap(chat=_MeteredChatModel(responses=['{"utterances": []}']), usage_ledger=ledger)
+    cmd = client.execute(make_command(session_id="s1"))
+    assert (cmd.prompt_tokens, cmd.completion_tokens) == (10, 5)
+    assert cmd.cost == pytest.approx(20 / 1_000_000)
+    asyncio.run(client.aexecute(make_command(session_id="s1", cmd_name="other")))
+    client.execute(make_command(session_id="s2"))
+
+    session = ledger.usage("s1")
+    assert (session.calls, session.total_tokens) == (2, 30)
+    assert session.cost == pytest.approx(40 / 1_000_000)
+    assert ledger.usage(cmd_name="gen_utterances").calls == 2
+    assert ledger.usage("s1", "other").calls == 1
+    assert ledger.usage().total_tokens == 45
+    assert set(ledger.sessions()) == {"s1", "s2"}
+    assert ledger.forget("s1").calls == 2
+    assert ledger.usage("s1").calls == 0
+
+
+def test_budget_rejects(make_command):
+    ledger = UsageLedger(budget=UsageBudget(max_tokens=15))
+    client = LangChainWrap(chat=_MeteredChatModel(responses=['{"utterances": []}']), usage_ledger=ledger)
+    client.execute(make_command(session_id="s1"))
+    with pytest.raises(BudgetExceededError) as error:
+        client.execute(make_command(session_id="s1"))
+    assert error.value.usage.total_tokens == 15
+    assert ledger.usage("s1").calls == 1
+    client.execute(make_command(session_id="s2"))
+    ledger.set_budget("s1", UsageBudget(max_tokens=100))
+    client.execute(make_command(session_id="s1"))
+
+
+def test_budget_downgrades(make_command):
+    cheap = FakeListChatModel(responses=['{"utterances": ["Cheap"]}'])
+    ledger = UsageLedger(prices={"_MeteredChatModel": ModelPrice(prompt=1000.0, completion=1000.0)},
+                         budget=UsageBudget(max_cost=0.01, downgrade={"chat": cheap}))
+    client = LangChainWrap(chat=_MeteredChatModel(responses=['{"utterances": ["Premium"]}']), usage_ledger=ledger,
+                           response_cache=MemoryResponseCache())
+    assert client.execute(make_command(session_id="s1")).result == {"utterances": ["Premium"]}
+    assert client.execute(make_command(session_id="s1")).cache_hit
+    cmd = client.execute(make_command(session_id="s1", amount=3))
+    assert cmd.result == {"utterances": ["Cheap"]}
+    assert cmd.downgraded
+    assert cmd.model_name == "FakeListChatModel"
+    # Downgraded results are not cached for sessions within budget.
+    cmd = client.execute(make_command(session_id="s2", amount=3))
+    assert cmd.result == {"utterances": ["Premium"]}
+    assert not cmd.cache_hit and not cmd.downgraded
+
+
+class _ModelNameCommand(ChatCommand):
+    """Command that takes a while and returns the name of the model it ran on."""
+
+    def run(self, client: LangChainWrap, **kwargs):
+        time.sleep(0.1)
+        self.result = {"model": client.chat.responses[0]}
+        return self
+
+
+def test_downgraded_calls_are_not_coalesced():
+    cheap = FakeListChatModel(responses=["cheap"])
+    ledger = UsageLedger()
+    ledger.set_budget("broke", UsageBudget(max_tokens=1, downgrade={"chat": cheap}))
+    ledger.record("broke", "gen_utterances", None, 10, 5)
+    client = LangChainWrap(chat=FakeListChatModel(responses=["premium"]), usage_ledger=ledger,
+                           single_flight=SingleFlight())
+
+    def command(session_id: str) -> ChatCommand:
+        return _ModelNameCommand(session_id=session_id, cmd_name="gen_utterances", sys_prompt="You generate.",
+                                 user_prompt_tmpl="Generate {amount}.", inputs={"amount": 2})
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        broke = executor.submit(client.execute, command("broke"))
+        time.sleep(0.02)
+        healthy = executor.submit(client.execute, command("healthy"))
+        broke, healthy = broke.result(), healthy.result()
+    assert (broke.result, broke.downgraded) == ({"model": "cheap"}, True)
+    assert (healthy.result, healthy.downgraded) == ({"model": "premium"}, False)
+
+
+def test_ledger_is_thread_safe():
+    ledger = UsageLedger(stripes=4)
+
+    def record(index: int):
+        for _ in range(500):
+            ledger.record(f"session-{index % 8}", "gen_utterances", None, 2, 1)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(record, range(16)))
+    assert ledger.usage().calls == 8000
+    assert ledger.usage("session-3").total_tokens == 3000